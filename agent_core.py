@@ -12,9 +12,10 @@ import unicodedata
 from typing import List, Optional, Tuple
 
 from models import LexRef, WordDetermination
-from tools import SEARCH_WORD_FORMS_TOOL, SEARCH_DICTIONARIES_TOOL, get_entry
+from tools import SEARCH_WORD_FORMS_TOOL, SEARCH_DICTIONARIES_TOOL, get_entry, render_entries
 from util import prune_lexicon_entry, split_hebrew_text
 import config
+import morphology
 
 # NB: the LexRef schema is inlined (no JSON-schema $ref/$defs) because these params
 # are persisted in Mongo, which rejects keys beginning with `$`.
@@ -48,12 +49,19 @@ WORD_DETERMINATION_TOOL = {
             "entries_to_keep": {"type": "array", "items": _LEXREF_SCHEMA},
             "entries_to_remove": {"type": "array", "items": _LEXREF_SCHEMA},
             "entries_to_add": {"type": "array", "items": _LEXREF_SCHEMA},
+            "confidence": {
+                "type": "string",
+                "enum": ["high", "medium", "low"],
+                "description": "How confident you are that these entries define the word as used here",
+            },
         },
         "required": ["word", "reasoning", "entries_to_keep", "entries_to_remove", "entries_to_add"],
     },
 }
 
 DETERMINATION_TOOLS = [SEARCH_WORD_FORMS_TOOL, SEARCH_DICTIONARIES_TOOL, WORD_DETERMINATION_TOOL]
+DETERMINATION_TOOL_CHOICE = {"type": "any"}   # any tool: look up or conclude
+FORCED_TOOL_CHOICE = {"type": "tool", "name": "WordDetermination"}
 
 
 # --- Phrase extraction -------------------------------------------------------
@@ -128,18 +136,20 @@ def build_vetting_candidates(cached_associations) -> List[dict]:
     Convert cached LexiconAssociations into vet-able candidate dicts.
     Returns a list of {"lexrefs": [...] , "contents": [...] } or
     {"lexrefs": [], "reasoning": str} for cached empty determinations.
-    Candidates whose entries no longer exist in the DB are dropped.
+    Candidates whose entries no longer exist in the DB are dropped. Associations imported
+    from existing WordForms follow the determined ones and carry their "source".
     """
     candidates = []
-    for assoc in cached_associations:
+    for assoc in sorted(cached_associations, key=lambda a: a.source is not None):
         if assoc.lexrefs:
             entries = [get_entry(lexref) for lexref in assoc.lexrefs]
             if not all(entries):
                 continue
-            contents = [prune_lexicon_entry(entry.contents()) for entry in entries]
+            contents = render_entries([prune_lexicon_entry(entry.contents()) for entry in entries])
             candidates.append({
                 "lexrefs": [lr.model_dump() for lr in assoc.lexrefs],
                 "contents": contents,
+                **({"source": assoc.source} if assoc.source else {}),
             })
         else:
             candidates.append({"lexrefs": [], "reasoning": assoc.reasoning or ""})
@@ -149,7 +159,10 @@ def build_vetting_candidates(cached_associations) -> List[dict]:
 def vetting_params(word: str, segment: str, candidates: List[dict]) -> dict:
     described = []
     for i, cand in enumerate(candidates):
-        if cand["lexrefs"]:
+        if cand["lexrefs"] and cand.get("source"):
+            described.append(f"Candidate {i} (an existing word-form link, not a previous determination):\n"
+                             f"{cand['contents']}")
+        elif cand["lexrefs"]:
             described.append(f"Candidate {i}:\n{cand['contents']}")
         else:
             described.append(
@@ -203,12 +216,41 @@ def determination_system_prompt(is_phrase: bool) -> str:
     Be decisive: when the entries already provided (or your first searches) contain a suitable entry, conclude immediately.  If two or three searches have returned nothing relevant, further rephrasing is unlikely to help - conclude with an empty determination rather than continuing to search."""
 
 
+def speculative_queries(word: str, limit: int) -> List[str]:
+    """
+    The search_word_forms queries the agent most often opens with, cheapest guesses first:
+    the morphological base forms (prefix letters or suffixes stripped, defective spelling).
+    Not the bare consonants: the words API lookup in the prompt already searched those
+    (always_consonants=1). Phrases get none.
+    """
+    if re.search(r"\s", word):
+        return []
+    return morphology.surface_variants(word, limit)
+
+
 def determination_initial_params(ref: str, word: str, segment: str,
-                                 possible_entries: List[dict], associated_entries: List[dict]) -> dict:
+                                 possible_entries: List[dict], associated_entries: List[dict],
+                                 model: Optional[str] = None,
+                                 prefetched: Optional[dict] = None) -> dict:
+    """
+    ``prefetched`` maps speculative search_word_forms queries to their results; entries
+    already listed as associated or possible are not repeated.
+    """
     is_phrase = bool(re.search(r"\s", word))
     associated_clause = ("There are no entries currently associated with this word."
                          if not associated_entries else "Associated Entries:\n" + str(associated_entries))
     possible_clause = "---\nPossible Entries:\n" + str(possible_entries) if possible_entries else ""
+    prefetch_clause = ""
+    if prefetched:
+        shown = {(e["headword"], e["parent_lexicon"]) for e in associated_entries + possible_entries}
+        lines = []
+        for query, entries in prefetched.items():
+            fresh = [e for e in entries if (e["headword"], e["parent_lexicon"]) not in shown]
+            shown.update((e["headword"], e["parent_lexicon"]) for e in fresh)
+            lines.append(f"search_word_forms({query}): " + (str(fresh) if fresh else
+                         "no further entries" if entries else "no entries"))
+        prefetch_clause = ("---\nThese lookups of likely base forms have already been run for you; "
+                           "do not repeat them:\n" + "\n".join(lines))
 
     human = f"""
     From: {ref}
@@ -217,14 +259,15 @@ def determination_initial_params(ref: str, word: str, segment: str,
     ---
     {associated_clause}
     {possible_clause}
+    {prefetch_clause}
     """
     return {
-        "model": config.DETERMINATION_MODEL,
+        "model": model or config.DETERMINATION_MODEL,
         "max_tokens": config.DETERMINATION_MAX_TOKENS,
         "system": determination_system_prompt(is_phrase),
         "thinking": {"type": "disabled"},
         "tools": DETERMINATION_TOOLS,
-        "tool_choice": {"type": "any"},
+        "tool_choice": DETERMINATION_TOOL_CHOICE,
         "messages": [{"role": "user", "content": human}],
     }
 
@@ -297,6 +340,51 @@ def interpret_determination_response(content_blocks: List[dict]) -> Tuple[str, o
     return "lookups", tool_calls
 
 
+def lookup_key(name: str, tool_input: dict) -> str:
+    """Identity of a lookup for duplicate detection: the tool plus its query with nikkud,
+    punctuation and extra whitespace removed, so trivially different repeats collide."""
+    query = morphology.consonants(str(tool_input.get("query", "")))
+    query = re.sub(r"[^\w\s\"'״׳]", "", query)
+    return f"{name}:{' '.join(query.split())}"
+
+
+SHOWN_EARLIER = "(full entry shown earlier in this conversation)"
+
+
+def entry_key(headword: str, lexicon_name: str) -> str:
+    return f"{lexicon_name}|{headword}"
+
+
+def dedupe_entries(result, shown: set):
+    """
+    Replace dictionary entries the conversation has already shown in full with a short
+    reference, for a lookup result about to be appended. ``shown`` holds entry_key()s and
+    is updated with the full entries this result introduces. Only new results are rewritten,
+    never earlier messages, so the cached conversation prefix stays byte-identical.
+
+    Works on search_word_forms entries (headword/parent_lexicon/content) and
+    search_dictionaries hits (headword/lexicon_name/text); a hit's text excerpt doesn't
+    count as showing the entry.
+    """
+    if not isinstance(result, list):
+        return result
+    out = []
+    for item in result:
+        lexicon = item.get("parent_lexicon") or item.get("lexicon_name") if isinstance(item, dict) else None
+        if not lexicon or not item.get("headword"):
+            out.append(item)
+            continue
+        key = entry_key(item["headword"], lexicon)
+        if key in shown:
+            body = "content" if "content" in item else "text"
+            out.append({**{k: v for k, v in item.items() if k not in ("content", "text")}, body: SHOWN_EARLIER})
+        else:
+            if "content" in item:
+                shown.add(key)
+            out.append(item)
+    return out
+
+
 def tool_result_block(tool_use_id: str, result, is_error: bool = False) -> dict:
     return {
         "type": "tool_result",
@@ -306,6 +394,13 @@ def tool_result_block(tool_use_id: str, result, is_error: bool = False) -> dict:
     }
 
 
+FORCE_CONCLUSION_TEXT = (
+    "Your recent lookups have all come back empty, and further rephrasing is unlikely to help. "
+    "Conclude now: call WordDetermination with the best entries you have verified so far, "
+    "or an empty determination if none are appropriate."
+)
+
+
 # --- Payload instrumentation --------------------------------------------------
 
 def measure_payload(params: dict) -> dict:
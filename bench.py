@@ -0,0 +1,460 @@
+"""
+Offline end-to-end benchmark of the batch driver.
+
+Runs resolver.run over a synthetic (or recorded) tractate with every external service
+replaced by a local stand-in, so a driver change can be measured in seconds, for free,
+and reproducibly:
+  - Message Batches API: FakeAnthropic - batches end after --turnaround seconds; responses
+    are scripted (phrases, vetting, a few lookups then a valid WordDetermination) or
+    replayed from a --responses JSONL file; --error-rate / --expire-rate inject errored
+    and expired results.
+  - Sefaria words/search API: a stub HTTP server on localhost answering from a fake
+    lexicon built from the tractate's own words, with --sefaria-latency per request.
+  - Mongo: mongomock by default, or a throwaway mongod (--mongo URI; refused if it already
+    holds data). Both Sefaria's database (WordForm writes, entry validation) and the
+    Lexicon collections live there.
+
+Reports rounds, wall clock, submit/apply time per round and Mongo operations by collection;
+--out writes the report as JSON and --compare prints the change against an earlier one.
+
+    python bench.py --segments 40 --words 15 --out before.json
+    python bench.py --segments 40 --words 15 --compare before.json
+    python bench.py --tractate sanhedrin_63.json --turnaround 5 --sefaria-latency 80
+
+A recorded tractate is a JSON list of {"ref": ..., "text": ...}; recorded responses are
+JSONL lines of {"kind": "phrases"|"vet"|"resolve", "word": ..., "turn": ..., "content": [blocks]}.
+Needs the Sefaria-Project environment (DJANGO_SETTINGS_MODULE, PYTHONPATH) like the driver;
+no API key, network or Sefaria data.
+"""
+from __future__ import annotations
+import argparse
+import asyncio
+import collections
+import hashlib
+import json
+import os
+import random
+import re
+import socket
+import threading
+import time
+import types
+from typing import Dict, List, Optional
+
+RUN_ID = "bench"
+LEXICON = "Jastrow Dictionary"
+LEXICON_PATH = "Reference/Dictionary/Jastrow"
+CONSONANTS = "אבגדהזחטיכלמנסעפצקרשת"
+
+
+def _stable(s: str) -> int:
+    return int(hashlib.md5(s.encode("utf-8")).hexdigest()[:8], 16)
+
+
+# --- Mongo ----------------------------------------------------------------------
+
+class OpCounter:
+    """Mongo operations by "<db>.<collection> <op>", since the last take()."""
+
+    def __init__(self):
+        self.ops = collections.Counter()
+        self._local = threading.local()
+
+    def take(self) -> Dict[str, int]:
+        out, self.ops = dict(self.ops), collections.Counter()
+        return out
+
+
+MOCK_OPS = ["find", "find_one", "insert_one", "insert_many", "update_one", "update_many",
+            "replace_one", "delete_one", "delete_many", "bulk_write", "count_documents",
+            "aggregate", "find_one_and_update", "distinct"]
+
+
+def patch_mongo(uri: Optional[str]) -> OpCounter:
+    """Point sefaria.system.database (and so every module importing it afterwards) at a
+    disposable database, counting operations. Must run before any repo module is imported."""
+    import sefaria.system.database as database
+    counter = OpCounter()
+    if uri:
+        import pymongo
+        from pymongo import monitoring
+
+        class Listener(monitoring.CommandListener):
+            def started(self, event):
+                target = event.command.get(event.command_name)
+                if isinstance(target, str):
+                    counter.ops[f"{event.database_name}.{target} {event.command_name}"] += 1
+
+            def succeeded(self, event):
+                pass
+
+            def failed(self, event):
+                pass
+
+        client = pymongo.MongoClient(uri, event_listeners=[Listener()])
+        existing = [d for d in client.list_database_names() if d not in ("admin", "config", "local")]
+        if existing:
+            raise SystemExit(f"--mongo must be a throwaway server; it already has databases {existing}")
+    else:
+        import mongomock
+        from mongomock.collection import Collection
+
+        def counted(op, orig):
+            def wrapper(self, *args, **kwargs):
+                if getattr(counter._local, "inside", False):   # mongomock calls itself (find_one -> find)
+                    return orig(self, *args, **kwargs)
+                counter.ops[f"{self.database.name}.{self.name} {op}"] += 1
+                counter._local.inside = True
+                try:
+                    return orig(self, *args, **kwargs)
+                finally:
+                    counter._local.inside = False
+            return wrapper
+
+        for op in MOCK_OPS:
+            setattr(Collection, op, counted(op, getattr(Collection, op)))
+        client = mongomock.MongoClient()
+    database.client = client
+    database.db = client[database.db.name]
+    return counter
+
+
+# --- Tractate and fake lexicon ---------------------------------------------------
+
+def synthetic_tractate(segments: int, words: int, vocab: int, rng: random.Random) -> List[dict]:
+    """Segments of words drawn Zipf-style from a vocabulary of consonantal bases, some with
+    prefix letters or an emphatic -א, like real Aramaic text."""
+    bases = list(dict.fromkeys("".join(rng.choice(CONSONANTS) for _ in range(rng.randint(2, 4)))
+                               for _ in range(vocab)))
+    weights = [1 / (i + 1) for i in range(len(bases))]
+    out = []
+    for i in range(segments):
+        seg = []
+        for base in rng.choices(bases, weights, k=words):
+            r = rng.random()
+            seg.append(("ד" + base) if r < 0.15 else ("ו" + base) if r < 0.25 else (base + "א") if r < 0.4 else base)
+        out.append({"ref": f"Bench {i // 10 + 2}a:{i % 10 + 1}", "text": " ".join(seg)})
+    return out
+
+
+def fake_lexicon(tractate: List[dict], rng: random.Random) -> Dict[str, List[dict]]:
+    """Consonantal headword -> entries, covering most of the tractate's words through their
+    best morphological base; some bases get homograph entries, some words none."""
+    import morphology
+    from util import split_hebrew_text
+    lexicon: Dict[str, List[dict]] = {}
+    for seg in tractate:
+        for word in split_hebrew_text(seg["text"]):
+            if _stable(word) % 10 == 0:
+                continue   # no entry: the agent should end up with an empty determination
+            cands = morphology.candidates(word)
+            base = cands[1][0] if len(cands) > 1 and _stable(word) % 3 else cands[0][0]
+            if base in lexicon:
+                continue
+            n = 1 + (_stable(base) % 5 == 0)
+            lexicon[base] = [{
+                "headword": base if n == 1 else f"{base} {'I' * (k + 1)}",
+                "parent_lexicon": LEXICON,
+                "content": {"senses": [{"definition": f"<b>{base}</b> sense {k + 1}. " + " ".join(
+                    rng.choice(["to say", "a court", "judgment", "the house", "came", "a man", "cf.",
+                                "Targ.", "Y.", "B. Bath.", "Snh.", "pl.", "v."]) for _ in range(rng.randint(15, 60)))}]},
+                "refs": [],
+            } for k in range(n)]
+    return lexicon
+
+
+# --- Stub Sefaria ------------------------------------------------------------------
+
+def start_sefaria_stub(lexicon: Dict[str, List[dict]], latency_ms: float) -> int:
+    """Serve /api/words/<q> and the ES search wrapper from the fake lexicon, in a thread with
+    its own event loop (so a blocked driver loop doesn't also stall the server). Returns the port."""
+    from aiohttp import web
+    import morphology
+
+    entries = [e for group in lexicon.values() for e in group]
+
+    async def words(request):
+        await asyncio.sleep(latency_ms / 1000)
+        return web.json_response(lexicon.get(morphology.consonants(request.match_info["q"]), []))
+
+    async def search(request):
+        await asyncio.sleep(latency_ms / 1000)
+        query = (await request.json()).get("query", "")
+        hits = [e for e in entries if query and query in json.dumps(e["content"], ensure_ascii=False)][:8]
+        return web.json_response({"hits": {"hits": [{"_source": {
+            "ref": f"{LEXICON}, {e['headword']} 1", "titleVariants": [e["headword"]],
+            "path": LEXICON_PATH, "exact": e["content"]["senses"][0]["definition"]}} for e in hits]}})
+
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    ready = threading.Event()
+
+    def serve():
+        loop = asyncio.new_event_loop()
+        app = web.Application()
+        app.router.add_get("/api/words/{q}", words)
+        app.router.add_post("/api/search-wrapper/es8", search)
+        runner = web.AppRunner(app, access_log=None)
+        loop.run_until_complete(runner.setup())
+        loop.run_until_complete(web.TCPSite(runner, "127.0.0.1", port).start())
+        ready.set()
+        loop.run_forever()
+
+    threading.Thread(target=serve, name="sefaria stub", daemon=True).start()
+    ready.wait()
+    return port
+
+
+# --- Fake Message Batches API ------------------------------------------------------------
+
+class Responder:
+    """Scripted model behaviour, overridden per (kind, word, turn) by recorded responses."""
+
+    def __init__(self, lexicon: Dict[str, List[dict]], rng: random.Random, reject_rate: float,
+                 max_lookups: int, recorded: Optional[dict] = None):
+        self.lexicon = lexicon
+        self.rng = rng
+        self.reject_rate = reject_rate
+        self.max_lookups = max_lookups
+        self.recorded = recorded or {}
+        self._ids = 0
+
+    def _tool_use(self, name: str, tool_input: dict) -> dict:
+        self._ids += 1
+        return {"type": "tool_use", "id": f"toolu_bench{self._ids:08d}", "name": name, "input": tool_input}
+
+    def respond(self, params: dict) -> List[dict]:
+        names = {t["name"] for t in params.get("tools", [])}
+        first = params["messages"][0]["content"]
+        first = first if isinstance(first, str) else json.dumps(first, ensure_ascii=False)
+        turn = sum(1 for m in params["messages"] if m["role"] == "assistant")
+        if "PhrasesInSegment" in names:
+            kind, word = "phrases", None
+        elif "SelectCandidate" in names:
+            kind, word = "vet", re.search(r"^Word: (.+)$", first, re.M)
+        else:
+            kind, word = "resolve", re.search(r"(?:Word|Phrase) to define: (.+)", first)
+        word = word.group(1).strip() if word else None
+        recorded = self.recorded.get((kind, word, turn))
+        if recorded is not None:
+            return recorded
+
+        if kind == "phrases":
+            words = first.rsplit("\n\n", 1)[-1].split()
+            phrases = [" ".join(words[:2])] if len(words) > 1 and _stable(first) % 10 == 0 else []
+            return [self._tool_use("PhrasesInSegment", {"phrases": phrases})]
+        if kind == "vet":
+            keep = self.rng.random() >= self.reject_rate
+            return [self._tool_use("SelectCandidate", {"selected_index": 0 if keep else None, "reasoning": "bench"})]
+
+        import morphology
+        pinned = params.get("tool_choice", {}).get("name") == "WordDetermination"
+        lookups = _stable(word or "") % (self.max_lookups + 1)
+        if turn < lookups and not pinned:
+            variants = [word] + morphology.surface_variants(word, 2)
+            return [{"type": "text", "text": "Let me look that up."},
+                    self._tool_use("search_word_forms", {"query": variants[turn % len(variants)]})]
+        found = []
+        for form, _ in morphology.candidates(word or ""):
+            found = [{"headword": e["headword"], "lexicon_name": e["parent_lexicon"]}
+                     for e in self.lexicon.get(form, [])]
+            if found:
+                break
+        return [self._tool_use("WordDetermination", {
+            "word": word, "reasoning": "bench determination", "entries_to_keep": [],
+            "entries_to_remove": [], "entries_to_add": found, "confidence": "high"})]
+
+
+def _ns(**kwargs):
+    return types.SimpleNamespace(**kwargs)
+
+
+class FakeBatches:
+    def __init__(self, responder: Responder, turnaround: float, error_rate: float,
+                 expire_rate: float, rng: random.Random):
+        self.responder = responder
+        self.turnaround = turnaround
+        self.error_rate = error_rate
+        self.expire_rate = expire_rate
+        self.rng = rng
+        self.batches: Dict[str, dict] = {}
+        self.prefix_tokens: Dict[str, int] = {}   # task id -> prompt tokens of its last turn
+
+    def _usage(self, custom_id: str, params: dict, content: list):
+        task_id = custom_id.rsplit("_", 1)[0]
+        prompt = len(json.dumps(params, ensure_ascii=False)) // 4
+        cached = self.prefix_tokens.get(task_id, 0) if "system" in params else 0
+        self.prefix_tokens[task_id] = prompt
+        return _ns(input_tokens=prompt - min(cached, prompt), output_tokens=len(json.dumps(content)) // 4,
+                   cache_creation_input_tokens=prompt - min(cached, prompt) if "system" in params else 0,
+                   cache_read_input_tokens=min(cached, prompt), cache_creation=None)
+
+    def create(self, requests: List[dict]):
+        batch_id = f"msgbatch_bench{len(self.batches):05d}"
+        results = []
+        for r in requests:
+            roll = self.rng.random()
+            if roll < self.error_rate:
+                result = _ns(type="errored", error=_ns(error=_ns(type="overloaded_error")))
+            elif roll < self.error_rate + self.expire_rate:
+                result = _ns(type="expired")
+            else:
+                content = self.responder.respond(r["params"])
+                result = _ns(type="succeeded", message=_ns(
+                    model=r["params"]["model"], content=content,
+                    usage=self._usage(r["custom_id"], r["params"], content)))
+            results.append(_ns(custom_id=r["custom_id"], result=result))
+        self.batches[batch_id] = {"ready_at": time.time() + self.turnaround * self.rng.uniform(0.8, 1.2),
+                                  "results": results}
+        return _ns(id=batch_id, processing_status="in_progress")
+
+    def retrieve(self, batch_id: str):
+        b = self.batches[batch_id]
+        ended = time.time() >= b["ready_at"]
+        done = sum(1 for r in b["results"] if r.result.type == "succeeded") if ended else 0
+        return _ns(processing_status="ended" if ended else "in_progress",
+                   request_counts=_ns(processing=0 if ended else len(b["results"]), succeeded=done,
+                                      errored=len(b["results"]) - done if ended else 0))
+
+    def results(self, batch_id: str):
+        return iter(self.batches[batch_id]["results"])
+
+
+class FakeAnthropic:
+    def __init__(self, batches: FakeBatches):
+        self.messages = _ns(batches=batches)
+
+
+# --- Run and report ------------------------------------------------------------------
+
+def report(resolver, store, metrics, counter: OpCounter, phase_ops: List[dict], wall: float,
+           args: argparse.Namespace) -> dict:
+    rounds = []
+    for r, ops in zip(store.rounds.find({"run_id": RUN_ID}).sort("created_at", 1), phase_ops):
+        submit = metrics.merge([r.get("submit_metrics")])["timers"]
+        apply = metrics.merge([r.get("apply_metrics")])["timers"]
+        rounds.append({
+            "requests": len(r["task_ids"]),
+            "submit_s": round(sum(h["sum"] for k, h in submit.items() if k.startswith("submit_")), 3),
+            "apply_s": round(apply.get("apply_results", {}).get("sum", 0.0), 3),
+            "turnaround_s": round((r["ended_at"] - r["created_at"]).total_seconds(), 2) if r.get("ended_at") else None,
+            "mongo_ops": ops,
+        })
+    totals = counter.take()
+    for ops in phase_ops:
+        for k, n in ops.get("by_op", {}).items():
+            totals[k] = totals.get(k, 0) + n
+    return {
+        "settings": {k: v for k, v in vars(args).items() if k not in ("out", "compare")},
+        "wall_s": round(wall, 2),
+        "rounds": len(rounds),
+        "requests": sum(r["requests"] for r in rounds),
+        "submit_s": round(sum(r["submit_s"] for r in rounds), 3),
+        "apply_s": round(sum(r["apply_s"] for r in rounds), 3),
+        "mongo_ops": sum(totals.values()),
+        "mongo_ops_by_collection": dict(sorted(totals.items(), key=lambda kv: -kv[1])),
+        "per_round": rounds,
+        "phases": metrics.summary(resolver.run_metrics(RUN_ID))[:15],
+        "status": store.run_status(RUN_ID),
+        "resolution": store.resolution_report(RUN_ID),
+    }
+
+
+def compare(now: dict, before: dict) -> None:
+    for key in ("wall_s", "rounds", "requests", "submit_s", "apply_s", "mongo_ops"):
+        a, b = before.get(key), now.get(key)
+        change = f" ({100 * (b - a) / a:+.1f}%)" if a else ""
+        print(f"{key:>10}: {a} -> {b}{change}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline end-to-end benchmark of the batch driver")
+    parser.add_argument("--tractate", help="Recorded tractate: JSON list of {ref, text}")
+    parser.add_argument("--segments", type=int, default=30, help="Synthetic tractate size")
+    parser.add_argument("--words", type=int, default=15, help="Words per synthetic segment")
+    parser.add_argument("--vocab", type=int, default=400, help="Synthetic vocabulary size")
+    parser.add_argument("--responses", help="Recorded responses (JSONL), replayed before the script")
+    parser.add_argument("--turnaround", type=float, default=1.0, help="Seconds until a fake batch ends")
+    parser.add_argument("--poll", type=float, default=0.2, help="Poll interval, seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--expire-rate", type=float, default=0.0)
+    parser.add_argument("--reject-rate", type=float, default=0.2, help="Share of vettings that reject")
+    parser.add_argument("--max-lookups", type=int, default=3, help="Most lookup turns per determination")
+    parser.add_argument("--sefaria-latency", type=float, default=30, help="Stub Sefaria latency, ms")
+    parser.add_argument("--mongo", help="Throwaway mongod URI (default: mongomock)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", help="Write the report here (JSON)")
+    parser.add_argument("--compare", help="Earlier report (JSON) to compare against")
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    counter = patch_mongo(args.mongo)
+    import morphology   # pure until its index is built, which is after the lexicon is loaded
+
+    if args.tractate:
+        with open(args.tractate, encoding="utf-8") as f:
+            tractate = json.load(f)
+    else:
+        tractate = synthetic_tractate(args.segments, args.words, args.vocab, rng)
+    lexicon = fake_lexicon(tractate, rng)
+    port = start_sefaria_stub(lexicon, args.sefaria_latency)
+    os.environ["DICTRES_SEFARIA_API_BASE"] = f"http://127.0.0.1:{port}"
+
+    import sefaria.system.database as database
+    database.db.lexicon_entry.insert_many([dict(e) for group in lexicon.values() for e in group])
+
+    import config
+    config.POLL_INTERVAL_SECONDS = args.poll
+    import resolver
+    import store
+    import metrics
+    from agent_core import phrase_extraction_params
+
+    recorded = {}
+    if args.responses:
+        with open(args.responses, encoding="utf-8") as f:
+            for line in f:
+                row = json.loads(line)
+                recorded[(row["kind"], row.get("word"), row.get("turn", 0))] = row["content"]
+    resolver._client = FakeAnthropic(FakeBatches(
+        Responder(lexicon, rng, args.reject_rate, args.max_lookups, recorded),
+        args.turnaround, args.error_rate, args.expire_rate, rng))
+
+    # Mongo operations per round: attribute everything up to each round's close to it.
+    phase_ops: List[dict] = []
+    apply_round = resolver.poll_and_apply_round
+
+    async def counted_apply(run_id, round_doc):
+        await apply_round(run_id, round_doc)
+        by_op = counter.take()
+        phase_ops.append({"total": sum(by_op.values()), "by_op": by_op})
+    resolver.poll_and_apply_round = counted_apply
+
+    morphology.headword_index()
+    store.clear_run(RUN_ID)
+    for seg in tractate:
+        store.create_task(RUN_ID, "phrases", seg["ref"], seg["text"], params=phrase_extraction_params(seg["text"]))
+    counter.take()
+    metrics.take()
+
+    started = time.time()
+    asyncio.run(resolver.run(RUN_ID))
+    wall = time.time() - started
+
+    result = report(resolver, store, metrics, counter, phase_ops, wall, args)
+    for key in ("wall_s", "rounds", "requests", "submit_s", "apply_s", "mongo_ops", "status", "resolution"):
+        print(f"{key}: {result[key]}")
+    for i, r in enumerate(result["per_round"], 1):
+        print(f"round {i}: {r['requests']} requests, submit {r['submit_s']}s, apply {r['apply_s']}s, "
+              f"turnaround {r['turnaround_s']}s, {r['mongo_ops']['total']} mongo ops")
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=1, default=str)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(result, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,10 @@
-from sefaria.system.database import client  # a pymongo client
+from typing import Optional
+import orm
 from models import LexRef, WordFormAssociations, LexiconAssociations
+from util import segment_hash
+from metrics import instrument
 
-db = client["Lexicon"]
-cache_collection = db["assocs"]  # stores instances of WordFormAssociations
+cache_collection = orm.collection("Lexicon", "assocs")  # stores instances of WordFormAssociations
 
 def clear_cache() -> None:
     """
@@ -11,6 +13,7 @@ def clear_cache() -> None:
     """
     cache_collection.drop()
 
+@instrument("cache_get")
 def get_cached_associations(wordform: str) -> list[LexiconAssociations]:
     """
     Given a wordform, return the lexicon associations that have been previously determined to be associated with it.
@@ -24,6 +27,33 @@ def get_cached_associations(wordform: str) -> list[LexiconAssociations]:
     else:
         return []
 
+def get_memoized_association(wordform: str, ref: str, segment: str) -> Optional[LexiconAssociations]:
+    """
+    Given a wordform and the segment it occurs in, return the association previously determined for
+    this exact context - the same ref, or a segment with identical normalized text - or None.
+    When more than one association claims the context, the most recently added wins.
+    :param wordform:
+    :param ref:
+    :param segment:
+    :return:
+    """
+    h = segment_hash(segment)
+    for assoc in reversed(get_cached_associations(wordform)):
+        if assoc.source is not None:
+            continue   # imported links were never determined in their contexts
+        if ref in assoc.refs or h in assoc.segment_hashes:
+            return assoc
+    return None
+
+def _note_segment(assoc: LexiconAssociations, state: dict) -> None:
+    if state["ref"] not in assoc.refs:
+        assoc.refs.append(state["ref"])
+    if state.get("segment"):
+        h = segment_hash(state["segment"])
+        if h not in assoc.segment_hashes:
+            assoc.segment_hashes.append(h)
+
+@instrument("cache_add_segment")
 def add_segment_to_cache(state: dict) -> None:
     """
     For the given wordform -
@@ -44,24 +74,26 @@ def add_segment_to_cache(state: dict) -> None:
     if entry:
         wfa = WordFormAssociations(**entry)
 
-        # Update the entry with the new segment
+        # Update the entry with the new segment. An imported association that vetting
+        # confirmed gets a determined twin rather than losing its provenance.
         for assoc in wfa.associations:
-            if set(assoc.lexrefs) == set(state["selected_association"]):
-                if state["ref"] not in assoc.refs:
-                    assoc.refs.append(state["ref"])
+            if assoc.source is None and set(assoc.lexrefs) == set(state["selected_association"]):
+                _note_segment(assoc, state)
                 break
         else:
-            wfa.associations.append(LexiconAssociations(lexrefs=state["selected_association"], refs=[state["ref"]]))
+            assoc = LexiconAssociations(lexrefs=state["selected_association"], refs=[])
+            _note_segment(assoc, state)
+            wfa.associations.append(assoc)
 
         cache_collection.update_one({"word": state["word"]}, {"$set": wfa.model_dump()})
 
     else:
-        new_wfa = WordFormAssociations(
-            word=state["word"],
-            associations=[LexiconAssociations(lexrefs=state["selected_association"], refs=[state["ref"]])]
-        )
+        assoc = LexiconAssociations(lexrefs=state["selected_association"], refs=[])
+        _note_segment(assoc, state)
+        new_wfa = WordFormAssociations(word=state["word"], associations=[assoc])
         cache_collection.insert_one(new_wfa.model_dump())
 
+@instrument("cache_add_empty")
 def add_empty_association_to_cache(state: dict) -> None:
     """
     For the given word, if no association was found,
@@ -73,16 +105,38 @@ def add_empty_association_to_cache(state: dict) -> None:
     if entry:
         wfa = WordFormAssociations(**entry)
         for assoc in wfa.associations:
-            if not assoc.lexrefs and assoc.reasoning == reasoning:
-                if state["ref"] not in assoc.refs:
-                    assoc.refs.append(state["ref"])
+            if assoc.source is None and not assoc.lexrefs and assoc.reasoning == reasoning:
+                _note_segment(assoc, state)
                 break
         else:
-            wfa.associations.append(LexiconAssociations(lexrefs=[], refs=[state["ref"]], reasoning=reasoning))
+            assoc = LexiconAssociations(lexrefs=[], refs=[], reasoning=reasoning)
+            _note_segment(assoc, state)
+            wfa.associations.append(assoc)
         cache_collection.update_one({"word": state["word"]}, {"$set": wfa.model_dump()})
     else:
-        new_wfa = WordFormAssociations(
-            word=state["word"],
-            associations=[LexiconAssociations(lexrefs=[], refs=[state["ref"]], reasoning=reasoning)]
-        )
-        cache_collection.insert_one(new_wfa.model_dump())
\ No newline at end of file
+        assoc = LexiconAssociations(lexrefs=[], refs=[], reasoning=reasoning)
+        _note_segment(assoc, state)
+        new_wfa = WordFormAssociations(word=state["word"], associations=[assoc])
+        cache_collection.insert_one(new_wfa.model_dump())
+
+
+def detach_ref(wordform: str, ref: str, segment: Optional[str] = None) -> None:
+    """
+    Unlink this context (the ref, and the segment's text hash) from every association of the
+    wordform, so neither the memo nor vetting keeps answering it from a stale determination.
+    Associations left with no refs are dropped.
+    :param wordform:
+    :param ref:
+    :param segment:
+    :return:
+    """
+    entry = cache_collection.find_one({"word": wordform})
+    if not entry:
+        return
+    wfa = WordFormAssociations(**entry)
+    h = segment_hash(segment) if segment else None
+    for assoc in wfa.associations:
+        assoc.refs = [r for r in assoc.refs if r != ref]
+        assoc.segment_hashes = [s for s in assoc.segment_hashes if s != h]
+    wfa.associations = [assoc for assoc in wfa.associations if assoc.refs]
+    cache_collection.update_one({"word": wordform}, {"$set": wfa.model_dump()})
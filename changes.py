@@ -0,0 +1,197 @@
+"""
+Change detection for incremental re-resolution.
+
+Fingerprints (sha1 of content) of every entry in the lexicons of lexicon_map, and of the
+cleaned text of every segment the cache knows, are kept in `Lexicon.fingerprints` as a
+baseline. plan() diffs the current state against it and works out what is affected:
+  - a changed or removed entry: every (word, ref) whose cached association, or LLM
+    WordForm, links to it;
+  - an added entry (a re-import, a new dictionary going live): every cached word with a
+    morphological candidate form (morphology.candidates) equal to its consonantal
+    headword, at all its refs - vetting can't pick an entry it has never seen;
+  - a changed segment text: the whole segment, re-seeded as a phrases task (its words may
+    have changed too). A segment that no longer parses or has no text is only reported.
+
+seed() detaches those contexts from the cache and seeds a run with just them (forced past
+the memo), then moves the baseline forward. The first plan() only records the baseline.
+
+    python resolver.py changes --run-id jastrow-reimport --dry-run   # report only
+    python resolver.py changes --run-id jastrow-reimport && python resolver.py run --run-id jastrow-reimport
+"""
+from __future__ import annotations
+import hashlib
+import json
+from collections import defaultdict
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+from pymongo import UpdateOne
+
+import cache
+import corpus
+import morphology
+import orm
+import store
+from util import segment_hash, split_hebrew_text
+
+fingerprints = orm.collection("Lexicon", "fingerprints", indexes=[([("kind", 1)], {})])
+
+# Fields that change without the entry's meaning changing (links maintained by Sefaria).
+_VOLATILE_FIELDS = {"_id", "refs"}
+
+
+def entry_fingerprint(doc: dict) -> str:
+    body = {k: v for k, v in doc.items() if k not in _VOLATILE_FIELDS}
+    return hashlib.sha1(json.dumps(body, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8")).hexdigest()
+
+
+def current_entries() -> Dict[str, str]:
+    """"lexicon|headword" -> fingerprint, for every entry of the lexicons in lexicon_map."""
+    from sefaria.system.database import db as sefaria_db
+    from tools import lexicon_names
+    cursor = sefaria_db.lexicon_entry.find({"parent_lexicon": {"$in": lexicon_names}}, {"refs": 0}).batch_size(1000)
+    return {f"{doc['parent_lexicon']}|{doc['headword']}": entry_fingerprint(doc) for doc in cursor}
+
+
+def segment_texts(refs: Iterable[str], vtitle: str) -> Dict[str, Optional[str]]:
+    """Cleaned text per ref (None when it no longer parses), read one Version per book."""
+    orm.setup()
+    from sefaria.model import Ref
+    from sefaria.system.exceptions import InputError
+    texts: Dict[str, Optional[str]] = {}
+    by_book = defaultdict(list)
+    for r in refs:
+        try:
+            oref = Ref(r)
+        except InputError:
+            texts[r] = None
+            continue
+        by_book[oref.index.title].append((r, oref))
+    for pairs in by_book.values():
+        raw = corpus.raw_texts([oref for _, oref in pairs], vtitle)
+        for (r, _), text in zip(pairs, corpus.clean_many([t for _, t in raw])):
+            texts[r] = text
+    return texts
+
+
+def _baseline(kind: str) -> Dict[str, str]:
+    return {d["key"]: d["hash"] for d in fingerprints.find({"kind": kind}, {"key": 1, "hash": 1})}
+
+
+def _save_baseline(kind: str, current: Dict[str, Optional[str]]) -> None:
+    """Replace the baseline: upsert every current fingerprint, then drop the ones not seen."""
+    generation = store.now()
+    ops = [UpdateOne({"_id": f"{kind}:{key}"},
+                     {"$set": {"kind": kind, "key": key, "hash": h, "generation": generation}}, upsert=True)
+           for key, h in current.items() if h is not None]
+    for i in range(0, len(ops), 1000):
+        fingerprints.bulk_write(ops[i:i + 1000], ordered=False)
+    fingerprints.delete_many({"kind": kind, "generation": {"$ne": generation}})
+
+
+def _diff(old: Dict[str, str], new: Dict[str, Optional[str]]) -> Dict[str, Set[str]]:
+    return {"changed": {k for k, h in new.items() if h is not None and k in old and old[k] != h},
+            "removed": {k for k in old if new.get(k) is None},
+            "added": {k for k, h in new.items() if h is not None and k not in old}}
+
+
+def _lexref_key(lexref: dict) -> str:
+    return f"{lexref['lexicon_name']}|{lexref['headword']}"
+
+
+def plan(vtitle: str) -> dict:
+    """What changed since the baseline and which (word, ref) contexts it affects."""
+    # Imported associations (warmstart.py) are vetting candidates, not resolutions: skipped.
+    cached_refs = {r for doc in cache.cache_collection.find({}, {"associations": 1})
+                   for a in doc.get("associations", []) if not a.get("source") for r in a.get("refs", [])}
+    entries_now = current_entries()
+    texts = segment_texts(cached_refs, vtitle)
+    segments_now = {f"{vtitle}|{r}": segment_hash(t) if t else None for r, t in texts.items()}
+    entries_then, segments_then = _baseline("entry"), _baseline("segment")
+    out = {"vtitle": vtitle, "baseline": bool(entries_then), "entries_now": entries_now,
+           "segments_now": segments_now, "texts": texts}
+    if not entries_then:
+        return {**out, "pairs": set(), "reseed": set()}
+
+    entries = _diff(entries_then, entries_now)
+    # Segments not in the baseline yet (first resolved since) have nothing to compare to.
+    segments = _diff({k: h for k, h in segments_then.items() if k in segments_now}, segments_now)
+    stale = entries["changed"] | entries["removed"]
+    added = {key.split("|", 1)[1] for key in entries["added"]}
+    added_forms = {morphology.headword_key(hw) for hw in added}
+    reseed = {k.split("|", 1)[1] for k in segments["changed"]}
+    gone = {k.split("|", 1)[1] for k in segments["removed"]}
+
+    pairs: Set[Tuple[str, str]] = set()
+    reasons = defaultdict(int)
+    for doc in cache.cache_collection.find({}, {"word": 1, "associations": 1}).batch_size(1000):
+        word, assocs = doc["word"], doc.get("associations", [])
+        new_entry = bool(added_forms) and any(form in added_forms for form, _ in morphology.candidates(word))
+        for a in assocs:
+            if a.get("source"):
+                continue
+            hit = any(_lexref_key(lr) in stale for lr in a.get("lexrefs", []))
+            if not (hit or new_entry):
+                continue
+            for r in a.get("refs", []):
+                if r not in reseed and r not in gone and (word, r) not in pairs:
+                    pairs.add((word, r))
+                    reasons["entry_changed" if hit else "entry_added"] += 1
+
+    # LLM WordForms linking a stale entry (normally the cache's own pairs, but the cache can
+    # have been cleared). Streamed; other generators' WordForms are not ours to redo.
+    from sefaria.system.database import db as sefaria_db
+    from db import LLM
+    if stale:
+        cursor = sefaria_db.word_form.find({"generated_by": LLM}, {"form": 1, "refs": 1, "lookups": 1}).batch_size(1000)
+        for wf in cursor:
+            if any(f"{lk.get('parent_lexicon')}|{lk.get('headword')}" in stale for lk in wf.get("lookups", [])):
+                for r in wf.get("refs", []):
+                    if r not in reseed and r not in gone and (wf["form"], r) not in pairs:
+                        pairs.add((wf["form"], r))
+                        reasons["wordform_entry_changed"] += 1
+
+    # WordForm refs the cache didn't know: their text, for the prompts.
+    texts.update(segment_texts({r for _, r in pairs if r not in texts}, vtitle))
+    pairs = {(w, r) for w, r in pairs if texts.get(r)}
+    return {**out, "entries": {k: len(v) for k, v in entries.items()},
+            "segments": {k: len(v) for k, v in segments.items()},
+            "pairs": pairs, "reseed": reseed, "reasons": dict(reasons)}
+
+
+def report(p: dict) -> dict:
+    """The incremental run's size next to a full re-run of every ref it touches."""
+    if not p["baseline"]:
+        return {"baseline": "none yet; recorded on seeding"}
+    touched = {r for _, r in p["pairs"]} | p["reseed"]
+    texts = {r: p["texts"].get(r) or "" for r in touched}
+    pairs_in_reseed = sum(len(set(split_hebrew_text(texts[r]))) for r in p["reseed"])
+    full_words = sum(len(set(split_hebrew_text(t))) for t in texts.values())
+    incremental = len(p["pairs"]) + pairs_in_reseed
+    return {
+        "entries": p["entries"], "segments": p["segments"], "reasons": p["reasons"],
+        "word_tasks": len(p["pairs"]), "segments_reseeded": len(p["reseed"]),
+        "incremental_words": incremental,
+        "full_rerun": {"segments": len(touched), "words": full_words},
+        "share_of_full_rerun": f"{100 * incremental / full_words:.1f}%" if full_words else "n/a",
+    }
+
+
+def seed(run_id: str, p: dict, create_word_task) -> int:
+    """Seed ``run_id`` with the affected contexts and record the new baseline. Each pair is
+    detached from the cache first (vetting would otherwise offer the stale association
+    back) and forced past the memo. ``create_word_task`` is the driver's."""
+    from agent_core import phrase_extraction_params
+    if p["baseline"]:
+        for word, r in sorted(p["pairs"], key=lambda wr: wr[1]):
+            segment = p["texts"].get(r)
+            cache.detach_ref(word, r, segment)
+            create_word_task(run_id, r, segment, word, force=True)
+        rows = []
+        for r in sorted(p["reseed"]):
+            for word in {doc["word"] for doc in cache.cache_collection.find({"associations.refs": r}, {"word": 1})}:
+                cache.detach_ref(word, r)
+            rows.append((r, p["texts"][r], phrase_extraction_params(p["texts"][r])))
+        store.create_tasks(run_id, "phrases", rows, extra={"force": True})
+    _save_baseline("entry", p["entries_now"])
+    _save_baseline("segment", p["segments_now"])
+    return len(p["pairs"]) + len(p["reseed"])
@@ -0,0 +1,144 @@
+"""
+Compression of bulky task fields in `Lexicon.batch_tasks`: tool results and prompts in
+conversations, vetting candidates, and completed determinations.
+
+pack() turns a JSON-able value into a small marker document holding the compressed bytes;
+unpack() reverses it and passes anything else through, so documents written before
+compression (or values under COMPRESS_MIN_BYTES) read back unchanged.
+
+Codec: zstd with a shared dictionary trained on lexicon content when the `zstandard`
+package is installed and a dictionary has been trained (`python resolver.py
+train-compression`); plain zstd without one; stdlib zlib when zstandard is missing.
+Dictionary entries are small and repetitive across tasks, which is exactly the case
+dictionary compression is for.
+"""
+from __future__ import annotations
+import json
+import zlib
+from typing import Any, Optional
+
+from bson import Binary
+import config
+import orm
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+dicts_collection = orm.collection("Lexicon", "compression_dicts")
+
+MARKER = "__z"
+
+# Raw vs stored bytes of everything packed since the last take_stats().
+stats = {"raw": 0, "packed": 0}
+
+_dicts = {}          # dict_id -> zstandard.ZstdCompressionDict
+_current_dict_id: Optional[str] = None
+_loaded = False
+
+
+def _load_dicts() -> None:
+    global _loaded, _current_dict_id
+    if _loaded or zstandard is None:
+        return
+    for doc in dicts_collection.find().sort("created_at", 1):
+        _dicts[doc["_id"]] = zstandard.ZstdCompressionDict(bytes(doc["data"]))
+        _current_dict_id = doc["_id"]
+    _loaded = True
+
+
+def pack(value: Any) -> Any:
+    """Compressed marker for a JSON-able value, or the value itself if small."""
+    if not config.COMPRESS_TASKS or value is None:
+        return value
+    raw = json.dumps(value, ensure_ascii=False).encode("utf-8")
+    if len(raw) < config.COMPRESS_MIN_BYTES:
+        return value
+    if zstandard is not None:
+        _load_dicts()
+        dict_data = _dicts.get(_current_dict_id)
+        compressor = (zstandard.ZstdCompressor(level=3, dict_data=dict_data) if dict_data
+                      else zstandard.ZstdCompressor(level=3))
+        out = {MARKER: "zstd", "dict": _current_dict_id if dict_data else None,
+               "data": Binary(compressor.compress(raw))}
+    else:
+        out = {MARKER: "zlib", "data": Binary(zlib.compress(raw, 6))}
+    stats["raw"] += len(raw)
+    stats["packed"] += len(out["data"])
+    return out
+
+
+def unpack(value: Any) -> Any:
+    if not (isinstance(value, dict) and MARKER in value):
+        return value
+    data = bytes(value["data"])
+    if value[MARKER] == "zlib":
+        raw = zlib.decompress(data)
+    else:
+        if zstandard is None:
+            raise RuntimeError("task field is zstd-compressed but the zstandard package is not installed")
+        _load_dicts()
+        dict_data = _dicts.get(value.get("dict")) if value.get("dict") else None
+        decompressor = (zstandard.ZstdDecompressor(dict_data=dict_data) if dict_data
+                        else zstandard.ZstdDecompressor())
+        raw = decompressor.decompress(data)
+    return json.loads(raw)
+
+
+def pack_messages(messages: list) -> list:
+    """Compress prompt text and tool_result contents, leaving message structure readable."""
+    out = []
+    for m in messages:
+        content = m.get("content")
+        if isinstance(content, str):
+            out.append({**m, "content": pack(content)})
+        elif isinstance(content, list):
+            out.append({**m, "content": [{**b, "content": pack(b["content"])}
+                                         if isinstance(b, dict) and b.get("type") == "tool_result" else b
+                                         for b in content]})
+        else:
+            out.append(m)
+    return out
+
+
+def unpack_messages(messages: list) -> list:
+    out = []
+    for m in messages:
+        content = unpack(m.get("content"))
+        if isinstance(content, list):
+            content = [{**b, "content": unpack(b["content"])}
+                       if isinstance(b, dict) and b.get("type") == "tool_result" else b
+                       for b in content]
+        out.append({**m, "content": content})
+    return out
+
+
+def take_stats() -> dict:
+    out = dict(stats)
+    stats["raw"] = stats["packed"] = 0
+    return out
+
+
+# Below this many samples zstd's trainer fails or yields a dictionary that doesn't help.
+MIN_TRAINING_SAMPLES = 1000
+
+
+def train_dictionary(samples: list[bytes], size: int = 112_640) -> str:
+    """Train and store a shared zstd dictionary from sample payloads; new writes use it.
+    Returns its id. Older dictionaries are kept so existing documents stay readable."""
+    import datetime
+    import hashlib
+    if zstandard is None:
+        raise RuntimeError("training a compression dictionary needs the zstandard package")
+    trained = zstandard.train_dictionary(size, samples)
+    data = trained.as_bytes()
+    dict_id = hashlib.sha1(data).hexdigest()[:16]
+    dicts_collection.update_one({"_id": dict_id},
+                                {"$setOnInsert": {"data": Binary(data),
+                                                  "created_at": datetime.datetime.now(datetime.timezone.utc)}},
+                                upsert=True)
+    global _loaded
+    _loaded = False
+    _load_dicts()
+    return dict_id
@@ -7,6 +7,14 @@ DETERMINATION_MODEL = os.environ.get("DICTRES_DETERMINATION_MODEL", "claude-sonn
 VETTING_MODEL = os.environ.get("DICTRES_VETTING_MODEL", "claude-haiku-4-5")
 PHRASE_MODEL = os.environ.get("DICTRES_PHRASE_MODEL", "claude-haiku-4-5")
 
+# Cascade mode: run each determination on a cheaper model first and escalate to
+# DETERMINATION_MODEL only if it fails validation, runs out of its turns, or reports a
+# confidence in CASCADE_ESCALATE_CONFIDENCE (or none at all). Empty disables the cascade.
+CASCADE_MODEL = os.environ.get("DICTRES_CASCADE_MODEL", "")      # e.g. "claude-haiku-4-5"
+CASCADE_MAX_TURNS = int(os.environ.get("DICTRES_CASCADE_MAX_TURNS", "4"))
+CASCADE_ESCALATE_CONFIDENCE = {s.strip().lower() for s in os.environ.get(
+    "DICTRES_CASCADE_ESCALATE_CONFIDENCE", "low").split(",") if s.strip()}
+
 DETERMINATION_MAX_TOKENS = 4096
 VETTING_MAX_TOKENS = 1024
 PHRASE_MAX_TOKENS = 1024
@@ -27,12 +35,124 @@ ADAPTIVE_CACHE_TTL = os.environ.get("DICTRES_ADAPTIVE_CACHE_TTL", "1") == "1"
 # Threshold sits below the 5-minute (300s) window with margin for our own poll/apply.
 CACHE_SLOW_ROUND_SECONDS = int(os.environ.get("DICTRES_CACHE_SLOW_ROUND_SECONDS", "240"))
 
+# Rule-based pre-resolution (rules.py): comma-separated rule names tried in order before a
+# word is determined. Off by default: a rule hit is recorded with no model judgement, where
+# a determination could still return no entry or reject a homograph that doesn't fit.
+# language_match is the riskiest (Jastrow also covers Talmudic Hebrew, and a lone Aramaic
+# candidate is not always right); legacy_agrees_with_cache runs before vetting, so it costs
+# a words API lookup for every word with cached candidates. rules.py rejects unknown names.
+PRERESOLVE_RULES = [r.strip() for r in os.environ.get(
+    "DICTRES_PRERESOLVE_RULES", "").split(",") if r.strip()]
+TEXT_LANGUAGE = os.environ.get("DICTRES_TEXT_LANGUAGE", "aramaic")   # for language_match
+
+# Speculative prefetch: before a determination's first submission, run the lookups the agent
+# usually spends its first turns on (base consonants, prefix-stripped, defective spelling)
+# and fold the results into the initial prompt.
+PREFETCH_LOOKUPS = os.environ.get("DICTRES_PREFETCH", "1") == "1"
+PREFETCH_MAX_QUERIES = int(os.environ.get("DICTRES_PREFETCH_MAX_QUERIES", "4"))
+# search_word_forms also returns entries for up to this many morphological base forms
+# (morphology.py) found in the local headword index; 0 disables.
+MORPHOLOGY_MAX_BASES = int(os.environ.get("DICTRES_MORPHOLOGY_MAX_BASES", "3"))
+
+# Compact entry renderings (renderings.py) replace full entry JSON in prompts. Budgets are
+# characters per entry; Jastrow and BDB entries run long and carry the most senses.
+COMPACT_ENTRIES = os.environ.get("DICTRES_COMPACT_ENTRIES", "1") == "1"
+RENDER_SENSE_CHARS = int(os.environ.get("DICTRES_RENDER_SENSE_CHARS", "300"))
+RENDER_DEFAULT_BUDGET = 1000
+RENDER_BUDGETS = {
+    "Jastrow Dictionary": 1500,
+    "BDB Dictionary": 1500,
+    "BDB Aramaic Dictionary": 1000,
+    "Klein Dictionary": 700,
+    "Ben Yehuda Dictionary": 1000,
+    "Kovetz Yesodot VaChakirot": 2000,
+}
+
+# Compress bulky task fields (conversation prompts and tool results, vetting candidates,
+# determinations) at rest in batch_tasks; see compress.py. Values under the threshold
+# aren't worth the marker overhead.
+COMPRESS_TASKS = os.environ.get("DICTRES_COMPRESS_TASKS", "1") == "1"
+COMPRESS_MIN_BYTES = int(os.environ.get("DICTRES_COMPRESS_MIN_BYTES", "512"))
+
+# Adaptive TTL also checks measured cache reads: if fewer than this share of the previous
+# round's follow-up determination turns read from cache at 5m, write the next round at 1h.
+CACHE_MIN_HIT_RATE = float(os.environ.get("DICTRES_CACHE_MIN_HIT_RATE", "0.5"))
+
+# Standard $/MTok (input, output) for cost reports; the Batches API charges half. Cache
+# writes cost 1.25x input at 5m and 2x at 1h, cache reads 0.1x. Update with pricing changes.
+MODEL_PRICES = {
+    "claude-sonnet-5": (3.00, 15.00),
+    "claude-haiku-4-5": (1.00, 5.00),
+}
+BATCH_DISCOUNT = 0.5
+
+# Write the run's cumulative phase timings here after every round (see metrics.py):
+# Prometheus text format for a .prom path, JSON otherwise. Empty = don't export.
+METRICS_FILE = os.environ.get("DICTRES_METRICS_FILE", "")
+
+# --profile (see profiling.py): output directory, sampling interval, and how long the event
+# loop must be blocked before the stall is reported with its stack and task.
+PROFILE_DIR = os.environ.get("DICTRES_PROFILE_DIR", "profiles")
+PROFILE_INTERVAL_MS = int(os.environ.get("DICTRES_PROFILE_INTERVAL_MS", "10"))
+PROFILE_SLOW_MS = int(os.environ.get("DICTRES_PROFILE_SLOW_MS", "100"))
+
+# Sefaria API calls share an adaptive concurrency limit (limiter.py): AIMD between MIN
+# and MAX starting at START, cut when a call errors, is throttled, or takes longer than
+# LATENCY_TOLERANCE x the best recent latency; RATE_LIMIT (requests/s) is a hard ceiling.
+LOOKUP_CONCURRENCY_START = int(os.environ.get("DICTRES_LOOKUP_CONCURRENCY_START", "8"))
+LOOKUP_CONCURRENCY_MIN = int(os.environ.get("DICTRES_LOOKUP_CONCURRENCY_MIN", "1"))
+LOOKUP_CONCURRENCY_MAX = int(os.environ.get("DICTRES_LOOKUP_CONCURRENCY_MAX", "64"))
+LOOKUP_RATE_LIMIT = float(os.environ.get("DICTRES_LOOKUP_RATE_LIMIT", "25"))
+LOOKUP_LATENCY_TOLERANCE = float(os.environ.get("DICTRES_LOOKUP_LATENCY_TOLERANCE", "3"))
+
+# Tail latency of lookups. An HTTP attempt gives up after HTTP_TIMEOUT_SECONDS; a whole
+# agent lookup (retries included) after LOOKUP_DEADLINE_SECONDS, when the agent gets an
+# is_error result instead of the round waiting. With HEDGE_LOOKUPS, a Sefaria call still
+# running past its endpoint's recent p95 (at least HEDGE_MIN_DELAY_SECONDS) gets a
+# duplicate request; the first answer wins.
+HTTP_TIMEOUT_SECONDS = float(os.environ.get("DICTRES_HTTP_TIMEOUT", "15"))
+LOOKUP_DEADLINE_SECONDS = float(os.environ.get("DICTRES_LOOKUP_DEADLINE", "45"))
+HEDGE_LOOKUPS = os.environ.get("DICTRES_HEDGE_LOOKUPS", "1") == "1"
+HEDGE_MIN_DELAY_SECONDS = float(os.environ.get("DICTRES_HEDGE_MIN_DELAY", "0.5"))
+HEDGE_MIN_SAMPLES = 20   # latencies seen on an endpoint before its p95 is trusted
+
+# Vetting prefilter (similarity.py): a word with more than VET_TOP_K cached associations
+# sends only the VET_TOP_K whose recorded contexts (up to VET_CONTEXT_REFS refs each,
+# VET_CONTEXT_WORDS words either side of the word) are most similar to this segment's,
+# by character n-gram TF-IDF cosine. 0 disables. With VET_AUTO_ACCEPT > 0, a determined
+# association scoring at least that, VET_AUTO_MARGIN clear of the next, is accepted with
+# no vetting call; off by default - check `prefilter-eval` on a finished run first.
+VET_TOP_K = int(os.environ.get("DICTRES_VET_TOP_K", "4"))
+VET_CONTEXT_REFS = int(os.environ.get("DICTRES_VET_CONTEXT_REFS", "5"))
+VET_CONTEXT_WORDS = int(os.environ.get("DICTRES_VET_CONTEXT_WORDS", "12"))
+VET_AUTO_ACCEPT = float(os.environ.get("DICTRES_VET_AUTO_ACCEPT", "0"))
+VET_AUTO_MARGIN = float(os.environ.get("DICTRES_VET_AUTO_MARGIN", "0.25"))
+
+# Seeding (corpus.py): a ref range's text is read in one go, HTML-cleaned in SEED_WORKERS
+# processes (1 = in-process) and inserted SEED_CHUNK_SIZE segments at a time; `process`
+# submits the first batch as soon as the first chunk is in.
+SEED_WORKERS = int(os.environ.get("DICTRES_SEED_WORKERS", str(min(8, os.cpu_count() or 1))))
+SEED_CHUNK_SIZE = int(os.environ.get("DICTRES_SEED_CHUNK_SIZE", "200"))
+
 # Batch driver tuning
 POLL_INTERVAL_SECONDS = int(os.environ.get("DICTRES_POLL_INTERVAL", "10"))
+# Polling adapts to each batch's ETA (a quarter of it, from its completion rate or the
+# previous round's turnaround), between POLL_INTERVAL_SECONDS and this cap. Keep the cap
+# well under the 5m cache TTL: a late poll delays the next round's cache reads.
+POLL_MAX_INTERVAL_SECONDS = int(os.environ.get("DICTRES_POLL_MAX_INTERVAL", "60"))
 # How many results to apply concurrently. The work is dominated by dictionary lookups
 # over HTTP, so concurrency collapses the dead time between rounds; keep it modest so
 # we don't hammer the Sefaria API.
 APPLY_CONCURRENCY = int(os.environ.get("DICTRES_APPLY_CONCURRENCY", "16"))
 MAX_REQUESTS_PER_BATCH = 10_000
+# Word scheduling: "fifo" initializes every new word task at once; "frequency" runs one
+# determination per frequent word (at least SCHEDULE_MIN_COUNT occurrences in the run)
+# and holds the other occurrences until it lands, so they vet against its association.
+# Trades extra rounds on frequent words for far fewer determinations.
+SCHEDULE = os.environ.get("DICTRES_SCHEDULE", "fifo")
+SCHEDULE_MIN_COUNT = int(os.environ.get("DICTRES_SCHEDULE_MIN_COUNT", "2"))
 MAX_AGENT_TURNS = 10         # LLM turns per word before giving up
 MAX_TASK_ATTEMPTS = 3        # resubmissions after batch-level errors
+# After this many consecutive lookups with no results, force the agent to conclude
+# (tool_choice pinned to WordDetermination) instead of searching out its turn budget.
+EMPTY_LOOKUP_LIMIT = int(os.environ.get("DICTRES_EMPTY_LOOKUP_LIMIT", "4"))
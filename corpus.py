@@ -0,0 +1,114 @@
+"""
+Segment texts for seeding, streamed in chunks.
+
+segments() reads the text of a whole ref range at once - one Version document (the whole
+book's jagged array) instead of a TextChunk load per segment - cleans each segment's HTML
+in a process pool, and yields (ref, text) chunks in document order as they are ready, so
+the caller can insert and submit the first ones while the rest are still being cleaned.
+Segments in ``skip`` (already seeded) are not read, which makes seeding resumable.
+"""
+from __future__ import annotations
+import functools
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, Tuple
+
+import config
+import metrics
+import orm
+
+logger = logging.getLogger("resolver.corpus")
+
+
+def clean(text: str) -> str:
+    """Sefaria's presentable plain text (HTML and footnote markup stripped). Runs in workers."""
+    orm.setup()   # once per worker process, on its first segment
+    from sefaria.model import TextChunk
+    return TextChunk.remove_html_and_make_presentable(text or "")
+
+
+@functools.lru_cache(maxsize=8)
+def load_version(title: str, vtitle: str):
+    """A book's Hebrew Version (its whole text), kept for the next few reads; None if absent."""
+    from sefaria.model import Version
+    return Version().load({"title": title, "versionTitle": vtitle, "language": "he"})
+
+
+@functools.lru_cache(maxsize=20_000)
+def segment_text(ref: str, vtitle: str) -> str:
+    """One segment's cleaned text, from its book's cached Version ("" if it has none)."""
+    orm.setup()
+    from sefaria.model import Ref
+    from sefaria.system.exceptions import InputError
+    try:
+        oref = Ref(ref)
+    except InputError:
+        return ""
+    return clean(raw_texts([oref], vtitle)[0][1])
+
+
+def raw_texts(segment_refs: list, vtitle: str) -> List[Tuple[str, str]]:
+    """(normal ref, raw text) for segments of one book, from a single Version read. Falls
+    back to per-segment loads when the version is missing or its layout doesn't address."""
+    if not segment_refs:
+        return []
+    version = load_version(segment_refs[0].index.title, vtitle)
+    out = []
+    for seg in segment_refs:
+        text = None
+        if version is not None:
+            try:
+                text = version.sub_content_with_ref(seg)
+            except (IndexError, KeyError, TypeError, AttributeError):
+                text = None
+        if not isinstance(text, str):
+            text = seg.text("he", vtitle=vtitle).text
+        out.append((seg.normal(), text if isinstance(text, str) else ""))
+    return out
+
+
+def clean_many(texts: List[str], chunk_size: int = config.SEED_CHUNK_SIZE,
+               workers: int = config.SEED_WORKERS) -> Iterator[str]:
+    """clean() over ``texts``, in order, in a process pool when there is enough to split."""
+    if workers <= 1 or len(texts) <= chunk_size:   # below a chunk the pool costs more than it saves
+        yield from map(clean, texts)
+        return
+    # Spawned, not forked: seeding runs in a thread of the driver, and forking a process with
+    # live threads (event loop, pymongo monitors, the profiler) can deadlock the child.
+    pool = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"))
+    try:
+        yield from pool.map(clean, texts, chunksize=max(1, chunk_size // workers))
+    finally:
+        pool.shutdown(cancel_futures=True)
+
+
+def segments(ref_str: str, vtitle: str, skip: frozenset | set = frozenset(),
+             chunk_size: int = config.SEED_CHUNK_SIZE,
+             workers: int = config.SEED_WORKERS) -> Iterator[List[Tuple[str, str]]]:
+    """Chunks of (normal ref, cleaned text) for every segment of ``ref_str`` not in ``skip``.
+    Segments with no text in ``vtitle`` are left out (and logged once, at the end)."""
+    orm.setup()
+    from sefaria.model import Ref
+    ref = Ref(ref_str)
+    segment_refs = ref.all_segment_refs() if not ref.is_segment_level() else [ref]
+    todo = [s for s in segment_refs if s.normal() not in skip]
+    if len(todo) < len(segment_refs):
+        logger.info("%d of %d segments of %s already seeded", len(segment_refs) - len(todo), len(segment_refs), ref_str)
+    with metrics.timed("seed_fetch"):
+        raw = raw_texts(todo, vtitle)
+
+    chunk, missing = [], []
+    for (normal, _), text in zip(raw, clean_many([t for _, t in raw], chunk_size, workers)):
+        if not text.strip():
+            missing.append(normal)
+            continue
+        chunk.append((normal, text))
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+    if missing:
+        logger.warning("No text for %d segments (vtitle=%s), skipped: %s%s", len(missing), vtitle,
+                       ", ".join(missing[:5]), " ..." if len(missing) > 5 else "")
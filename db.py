@@ -1,14 +1,21 @@
-import django
-django.setup()
-from sefaria.model import WordForm, WordFormSet
+from __future__ import annotations
 from models import LexRef
 from typing import Optional
-from sefaria.utils.hebrew import strip_nikkud
 from log import log
+from metrics import instrument
+import orm
 
 LLM = "LLM Dictionary Resolver"
 
 
+def _orm():
+    """WordForm and WordFormSet (and strip_nikkud), setting Django up on first use."""
+    orm.setup()
+    from sefaria.model import WordForm, WordFormSet
+    from sefaria.utils.hebrew import strip_nikkud
+    return WordForm, WordFormSet, strip_nikkud
+
+
 def superseded_wordforms(word: str, ref: str, keep: Optional[WordForm] = None):
     """
     Every wordform (any source) that claims this word at this ref, matched by
@@ -18,11 +25,13 @@ def superseded_wordforms(word: str, ref: str, keep: Optional[WordForm] = None):
     form match would miss - are superseded here. `keep` is the wordform carrying
     our own determination, which is not scrubbed.
     """
+    _, WordFormSet, strip_nikkud = _orm()
     cf = strip_nikkud(word)
     return [wf for wf in WordFormSet({"c_form": cf, "refs": ref})
             if keep is None or wf != keep]
 
 
+@instrument("db_record_determination")
 def record_determination(state: dict) -> None:
     # As currently used, we shouldn't trip this, but defensive programming
     if not state["selected_association"]:
@@ -70,6 +79,7 @@ def get_matching_wordform(word: str, associations: list[LexRef]) -> Optional[Wor
         },
         "$expr": {"$eq": [{"$size": "$lookups"}, len(associations)]}
     }
+    WordForm, _, _ = _orm()
     wordform = WordForm().load(query)
     return wordform
 
@@ -96,6 +106,7 @@ def create_wordform(word: str, associations: list[LexRef], ref: str):
     :param ref:
     :return:
     """
+    WordForm, _, strip_nikkud = _orm()
     wordform = WordForm({
         "form": word,
         "lookups": [ { "headword": x.headword, "parent_lexicon": x.lexicon_name } for x in associations ],
@@ -107,8 +118,10 @@ def create_wordform(word: str, associations: list[LexRef], ref: str):
     wordform.save()
 
 def clear_wordforms():
+    _, WordFormSet, _ = _orm()
     WordFormSet({"generated_by": "LLM Dictionary Resolver"}).delete()
 
+@instrument("db_record_empty")
 def record_empty_determination(state: dict) -> None:
     """
     We determined this word has no valid dictionary entry here, so no wordform should
@@ -0,0 +1,171 @@
+"""
+Adaptive concurrency limit for the Sefaria API calls in tools.py.
+
+Every HTTP call takes a slot from one shared AdaptiveLimiter (`async with limiter.call():`).
+The limit follows AIMD: each fast success adds 1/limit (about +1 per limit's worth of
+calls); an error, a throttle or a call slower than LOOKUP_LATENCY_TOLERANCE x the
+recent best latency multiplies it by 0.7, at most once a second. A 429/503 with
+Retry-After pauses all new calls until then. A token bucket caps the request rate
+regardless of how far the limit grows.
+
+Callers queue for slots, so an unbounded gather (hundreds of init_resolve_task lookups)
+runs at the rate the API tolerates instead of all at once. stats() exposes the current
+limit, in-flight calls and queue depth.
+
+LatencyWindow keeps recent latencies for percentiles: tools.py hedges a call that runs past
+its endpoint's p95, and the driver reports per-tool p50/p95/p99.
+"""
+from __future__ import annotations
+import asyncio
+import collections
+import time
+from contextlib import asynccontextmanager
+from typing import Optional
+
+THROTTLE_STATUSES = (429, 503)
+
+
+class LatencyWindow:
+    """The last ``size`` latencies (seconds), for percentiles."""
+
+    def __init__(self, size: int = 500):
+        self._samples: collections.deque = collections.deque(maxlen=size)
+
+    def add(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def percentile(self, q: float) -> Optional[float]:
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def summary(self) -> dict:
+        return {f"p{int(q * 100)}_ms": round(1000 * self.percentile(q)) if self._samples else None
+                for q in (0.5, 0.95, 0.99)}
+
+
+def retry_after(exc: BaseException) -> Optional[float]:
+    """Seconds from a throttling response's Retry-After header (aiohttp.ClientResponseError)."""
+    if getattr(exc, "status", None) not in THROTTLE_STATUSES:
+        return None
+    value = (getattr(exc, "headers", None) or {}).get("Retry-After")
+    try:
+        return max(0.0, float(value)) if value is not None else None
+    except ValueError:   # an HTTP date; not worth parsing for this API
+        return None
+
+
+class AdaptiveLimiter:
+    def __init__(self, start: int, minimum: int, maximum: int, rate: float, tolerance: float):
+        self.limit = float(start)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.rate = rate
+        self.burst = max(1.0, rate)
+        self.tolerance = tolerance
+        self.in_flight = 0
+        self.throttled = 0
+        self.errors = 0
+        self._waiters: collections.deque = collections.deque()
+        self._tokens = self.burst
+        self._refilled = time.monotonic()
+        self._paused_until = 0.0
+        self._last_decrease = 0.0
+        self._latencies: collections.deque = collections.deque(maxlen=200)
+
+    # --- slots ----------------------------------------------------------------------
+
+    async def _acquire(self) -> None:
+        """Take a slot, then wait out any Retry-After pause and the rate ceiling. Cancelled
+        anywhere in here (a deadline, a losing hedge), it leaves no slot or wake-up behind."""
+        while self.in_flight >= max(1, int(self.limit)):
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                elif waiter.done() and not waiter.cancelled():
+                    self._wake()   # woken, then cancelled: hand the wake-up on
+                raise
+        self.in_flight += 1
+        try:
+            while True:
+                pause = self._paused_until - time.monotonic()
+                if pause <= 0:
+                    pause = self._take_token()
+                if pause <= 0:
+                    return
+                await asyncio.sleep(pause)
+        except BaseException:
+            self._release()
+            raise
+
+    def _release(self) -> None:
+        self.in_flight -= 1
+        self._wake()
+
+    def _wake(self) -> None:
+        """Wake as many queued callers as there are free slots."""
+        free = max(1, int(self.limit)) - self.in_flight
+        while free > 0 and self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                free -= 1
+
+    def _take_token(self) -> float:
+        """0 if a request token was taken, else seconds until one is available."""
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._refilled) * self.rate)
+        self._refilled = now
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return 0.0
+        return (1 - self._tokens) / self.rate
+
+    @asynccontextmanager
+    async def call(self):
+        """A slot for one HTTP call; its latency and outcome adjust the limit."""
+        await self._acquire()
+        started = time.monotonic()
+        try:
+            yield
+        except asyncio.CancelledError:   # a losing hedge or an expired deadline: no signal
+            raise
+        except BaseException as e:
+            self._record(time.monotonic() - started, ok=False, retry_after=retry_after(e))
+            raise
+        else:
+            self._record(time.monotonic() - started, ok=True)
+        finally:
+            self._release()
+
+    # --- AIMD ------------------------------------------------------------------------
+
+    def _record(self, latency: float, ok: bool, retry_after: Optional[float] = None) -> None:
+        now = time.monotonic()
+        if retry_after is not None:
+            self.throttled += 1
+            self._paused_until = max(self._paused_until, now + retry_after)
+        if ok:
+            self._latencies.append(latency)
+        else:
+            self.errors += 1
+        slow = ok and latency > self.tolerance * min(self._latencies)
+        if not ok or slow:
+            if now - self._last_decrease >= 1.0:
+                self.limit = max(float(self.minimum), self.limit * 0.7)
+                self._last_decrease = now
+        else:
+            self.limit = min(float(self.maximum), self.limit + 1 / self.limit)
+
+    def stats(self) -> dict:
+        return {"limit": round(self.limit, 1), "in_flight": self.in_flight, "queued": len(self._waiters),
+                "throttled": self.throttled, "errors": self.errors,
+                "best_latency_ms": round(1000 * min(self._latencies)) if self._latencies else None}
@@ -1,9 +1,9 @@
 from __future__ import annotations
 import datetime
-from sefaria.system.database import client  # a pymongo client
+from metrics import instrument
+import orm
 
-db = client["Lexicon"]
-log_collection = db["log"]  # stores logs of operations.  {ref, word, action, ...}
+log_collection = orm.collection("Lexicon", "log")  # stores logs of operations.  {ref, word, action, ...}
 
 
 def _jsonable(value):
@@ -18,6 +18,7 @@ def _jsonable(value):
     return str(value)
 
 
+@instrument("log_insert")
 def log(action: str, state):
     log_state = _jsonable(dict(state))
     log_state["action"] = action
@@ -0,0 +1,173 @@
+"""
+Per-phase timing and counters for the batch driver.
+
+Phases are timed with ``timed(name)`` (a context manager) or ``instrument(name)`` (a
+decorator for plain and async functions) into fixed-bucket histograms; ``count(name)``
+bumps a counter and ``gauge(name, value)`` records a current value. take() returns everything recorded since the last take() and resets,
+the same way store.take_io() does, so each round stores what its own submission and
+application cost (`submit_metrics` / `apply_metrics` on the batch_rounds doc).
+
+Async phases (lookups under apply concurrency) are wall time per call, overlap included:
+their sum can exceed the round's elapsed time.
+
+Export: when DICTRES_METRICS_FILE is set, the run's cumulative metrics are written there
+after every round - Prometheus text format for a .prom path (node_exporter's textfile
+collector picks it up), JSON otherwise. `python resolver.py status --metrics` prints them.
+"""
+from __future__ import annotations
+import functools
+import inspect
+import json
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+# Upper bounds, in seconds; a final +Inf bucket is implicit.
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300, 900, 3600)
+
+# Phase names are Mongo field names once stored: no dots.
+_timers: Dict[str, dict] = {}
+_counters: Dict[str, int] = {}
+_gauges: Dict[str, float] = {}
+# Recorded into from the loop thread, the seeding thread and the profiler's sampler; take()
+# swaps the registry out on the loop thread. One lock keeps every update in one round.
+_lock = threading.Lock()
+
+
+def _new_histogram() -> dict:
+    return {"count": 0, "sum": 0.0, "max": 0.0, "buckets": [0] * (len(BUCKETS) + 1)}
+
+
+def observe(name: str, seconds: float) -> None:
+    bucket = next((i for i, bound in enumerate(BUCKETS) if seconds <= bound), len(BUCKETS))
+    with _lock:
+        h = _timers.setdefault(name, _new_histogram())
+        h["count"] += 1
+        h["sum"] += seconds
+        h["max"] = max(h["max"], seconds)
+        h["buckets"][bucket] += 1
+
+
+def count(name: str, n: int = 1) -> None:
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + n
+
+
+def gauge(name: str, value: float) -> None:
+    """A current value (e.g. the lookup limiter's concurrency); snapshots keep the latest."""
+    with _lock:
+        _gauges[name] = value
+
+
+@contextmanager
+def timed(name: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - started)
+
+
+def instrument(name: str):
+    """Decorator timing every call of a function (sync or async) as phase ``name``."""
+    def wrap(fn):
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def timed_async(*args, **kwargs):
+                with timed(name):
+                    return await fn(*args, **kwargs)
+            return timed_async
+
+        @functools.wraps(fn)
+        def timed_sync(*args, **kwargs):
+            with timed(name):
+                return fn(*args, **kwargs)
+        return timed_sync
+    return wrap
+
+
+def take() -> dict:
+    """Everything recorded since the last take(), as a storable snapshot; resets."""
+    with _lock:
+        out = {"timers": dict(_timers), "counters": dict(_counters), "gauges": dict(_gauges)}
+        _timers.clear()
+        _counters.clear()
+        _gauges.clear()
+    return out
+
+
+def merge(snapshots: List[Optional[dict]]) -> dict:
+    """Sum snapshots (e.g. every round of a run) into one; gauges keep the latest value.
+    Reads only the snapshots given, never the live registry, so it needs no lock."""
+    out = {"timers": {}, "counters": {}, "gauges": {}}
+    for snap in snapshots:
+        if not snap:
+            continue
+        for name, h in snap.get("timers", {}).items():
+            agg = out["timers"].setdefault(name, _new_histogram())
+            agg["count"] += h["count"]
+            agg["sum"] += h["sum"]
+            agg["max"] = max(agg["max"], h["max"])
+            agg["buckets"] = [a + b for a, b in zip(agg["buckets"], h["buckets"])]
+        for name, n in snap.get("counters", {}).items():
+            out["counters"][name] = out["counters"].get(name, 0) + n
+        out["gauges"].update(snap.get("gauges") or {})
+    return out
+
+
+def quantile(h: dict, q: float) -> Optional[float]:
+    """Bucket upper bound holding the q-quantile (the histogram's resolution), or None."""
+    if not h["count"]:
+        return None
+    rank = q * h["count"]
+    seen = 0
+    for i, n in enumerate(h["buckets"]):
+        seen += n
+        if seen >= rank:
+            return BUCKETS[i] if i < len(BUCKETS) else h["max"]
+    return h["max"]
+
+
+def summary(snapshot: dict) -> List[dict]:
+    """One row per phase, slowest total first."""
+    rows = [{"phase": name, "count": h["count"], "total_s": round(h["sum"], 2),
+             "mean_ms": round(1000 * h["sum"] / h["count"], 1) if h["count"] else None,
+             "p50_le_s": quantile(h, 0.5), "p95_le_s": quantile(h, 0.95), "max_s": round(h["max"], 3)}
+            for name, h in snapshot["timers"].items()]
+    return sorted(rows, key=lambda r: -r["total_s"])
+
+
+def to_prometheus(snapshot: dict, run_id: str) -> str:
+    run = run_id.replace("\\", "\\\\").replace('"', '\\"')
+    lines = ["# HELP dictres_phase_seconds Wall time per driver phase.",
+             "# TYPE dictres_phase_seconds histogram"]
+    for name, h in sorted(snapshot["timers"].items()):
+        labels = f'run_id="{run}",phase="{name}"'
+        cumulative = 0
+        for bound, n in zip(list(BUCKETS) + ["+Inf"], h["buckets"]):
+            cumulative += n
+            lines.append(f'dictres_phase_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f"dictres_phase_seconds_sum{{{labels}}} {h['sum']:.6f}")
+        lines.append(f"dictres_phase_seconds_count{{{labels}}} {h['count']}")
+    lines += ["# HELP dictres_events_total Driver event counters.", "# TYPE dictres_events_total counter"]
+    for name, n in sorted(snapshot["counters"].items()):
+        lines.append(f'dictres_events_total{{run_id="{run}",event="{name}"}} {n}')
+    lines += ["# HELP dictres_gauge Driver state at the last round.", "# TYPE dictres_gauge gauge"]
+    for name, v in sorted((snapshot.get("gauges") or {}).items()):
+        lines.append(f'dictres_gauge{{run_id="{run}",name="{name}"}} {v}')
+    return "\n".join(lines) + "\n"
+
+
+def export(snapshot: dict, run_id: str, path: str) -> None:
+    """Write a snapshot to ``path``: Prometheus text for *.prom, JSON otherwise. The file is
+    replaced atomically so a scraper never reads half of it."""
+    import os
+    if path.endswith(".prom"):
+        text = to_prometheus(snapshot, run_id)
+    else:
+        text = json.dumps({"run_id": run_id, "phases": summary(snapshot), **snapshot}, indent=1)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)
@@ -0,0 +1,211 @@
+"""
+Microbenchmarks for the pure functions that run once per task per round, with realistic
+fixtures: a full-daf segment, big Jastrow-shaped entries with HTML, and a ten-turn
+determination conversation carrying several entries per lookup.
+
+    python microbench.py                              # time everything
+    python microbench.py --save-baseline baseline.json
+    python microbench.py --check baseline.json        # exit 1 on a regression
+    python microbench.py --ref "Sanhedrin 63b" -k prune   # real segment/entries from the local DB
+    python microbench.py --startup                    # per-command import cost vs. STARTUP_BUDGETS,
+                                                      # and that importing resolver stays off Mongo
+
+A function regresses when its best time is more than --threshold (default 1.25x) its
+baseline. Baselines are per machine; keep one next to the checkout, not in the repo.
+Needs the Sefaria-Project environment (DJANGO_SETTINGS_MODULE, PYTHONPATH) like the driver.
+"""
+from __future__ import annotations
+import argparse
+import copy
+import json
+import random
+import subprocess
+import sys
+import time
+import timeit
+from typing import Callable, Dict, List, Tuple
+
+from util import split_hebrew_text, prune_lexicon_entry, clean_nested_html
+
+VTITLE = "William Davidson Edition - Vocalized Aramaic"
+_WORDS = ["אָמַר", "רַבִּי", "יוֹחָנָן", "מִשּׁוּם", "דְּאָמַר", "וּבְדִינָא", "קָרָא", "הָתָם", "אִיתְּמַר",
+          "מַאי", "טַעְמָא", "דִּכְתִיב", "לְהוּ", "אַבָּיֵי", "רָבָא", "תְּנַן", "בְּסַנְהֶדְרִין", "עֲבוֹדָה",
+          "זָרָה", "הַמְגַדֵּף", "שֶׁנֶּאֱמַר", "חַיָּיב", "פָּטוּר", "—", "?", "כְּדִתְנַן:"]
+_GLOSS = ["to say, declare", "<i>Snh.</i> 63<sup>b</sup>", "<a href='/Jastrow'>v.</a>", "court of law",
+          "<b>Targ.</b> Y. Deut. XIII, 7", "an idolater", "pl.", "cmp.", "<span dir='rtl'>אמר</span>"]
+
+
+# What each resolver command loads before doing any work, and how long that may take (s).
+# status/clear/retry-failed/usage/simulate only need Mongo; seed and render-entries need the
+# ORM; run/process also load the Anthropic SDK and aiohttp.
+STARTUP_COMMANDS = {
+    "status": "import resolver",
+    "seed": "import resolver, orm; orm.setup()",
+    "run": "import resolver, orm; orm.setup(); resolver.transient_errors(); import aiohttp",
+}
+STARTUP_BUDGETS = {"status": 1.0, "seed": 3.0, "run": 4.0}
+
+# Importing resolver must not open Sefaria's Mongo client (or create indexes): collections
+# connect on first use (orm.collection), so --help and bad arguments stay offline.
+NO_MONGO_ON_IMPORT = """
+import sys, pymongo
+opened = []
+_init = pymongo.MongoClient.__init__
+def _counted(self, *args, **kwargs):
+    opened.append(1)
+    _init(self, *args, **kwargs)
+pymongo.MongoClient.__init__ = _counted
+import resolver
+sys.exit(1 if opened or "sefaria.system.database" in sys.modules else 0)
+"""
+
+
+def startup(repeat: int) -> Dict[str, float]:
+    """Best wall time of each command's imports, each in a fresh interpreter."""
+    out = {}
+    for name, code in STARTUP_COMMANDS.items():
+        best = float("inf")
+        for _ in range(repeat):
+            started = time.perf_counter()
+            subprocess.run([sys.executable, "-c", code], check=True, stdout=subprocess.DEVNULL)
+            best = min(best, time.perf_counter() - started)
+        out[name] = best
+    return out
+
+
+def opens_mongo_on_import() -> bool:
+    return subprocess.run([sys.executable, "-c", NO_MONGO_ON_IMPORT], stdout=subprocess.DEVNULL).returncode != 0
+
+
+def fixtures(ref: str | None = None) -> Dict[str, object]:
+    import agent_core
+    rng = random.Random(7)
+    if ref:
+        import orm
+        orm.setup()
+        from sefaria.model import Ref, TextChunk
+        from sefaria.system.database import db
+        segments = [TextChunk.remove_html_and_make_presentable(s.text("he", vtitle=VTITLE).text)
+                    for s in Ref(ref).all_segment_refs()]
+        segment = max(segments, key=len)
+        entries = list(db.lexicon_entry.aggregate([
+            {"$match": {"parent_lexicon": "Jastrow Dictionary"}},
+            # $toString can't take an object; the content's BSON size ranks entries just as well.
+            {"$addFields": {"size": {"$cond": [{"$eq": [{"$type": "$content"}, "object"]},
+                                               {"$bsonSize": "$content"}, 0]}}},
+            {"$sort": {"size": -1}}, {"$limit": 20}, {"$project": {"_id": 0, "size": 0}}]))
+    else:
+        segment = " ".join(rng.choice(_WORDS) for _ in range(420))
+        entries = [{
+            "headword": f"אָמַר {i}", "parent_lexicon": "Jastrow Dictionary", "rid": f"J{i}", "refs": [],
+            "content": {"morphology": "v. a.", "senses": [
+                {"num": str(s), "definition": " ".join(rng.choice(_GLOSS) for _ in range(40)),
+                 "senses": [{"definition": " ".join(rng.choice(_GLOSS) for _ in range(25))} for _ in range(3)]}
+                for s in range(1, 7)]},
+        } for i in range(20)]
+
+    pruned = [prune_lexicon_entry(copy.deepcopy(e)) for e in entries[:5]]
+    messages = [{"role": "user", "content": f"From: Sanhedrin 63b:4\nText: {segment}\nWord to define: דְּאָמַר\n"
+                                            f"Possible Entries:\n{pruned}"}]
+    for turn in range(10):
+        messages.append({"role": "assistant", "content": [
+            {"type": "text", "text": "Let me check the base form."},
+            {"type": "tool_use", "id": f"toolu_{turn:04d}", "name": "search_word_forms", "input": {"query": "אמר"}}]})
+        messages.append({"role": "user", "content": [
+            agent_core.tool_result_block(f"toolu_{turn:04d}", pruned)]})
+    params = {"model": "claude-sonnet-5", "max_tokens": 4096, "system": agent_core.determination_system_prompt(False),
+              "tools": agent_core.DETERMINATION_TOOLS, "tool_choice": {"type": "any"}, "messages": messages}
+    blocks = [{"type": "text", "text": "Looking up the root."}] + [
+        {"type": "tool_use", "id": f"toolu_l{i}", "name": "search_word_forms", "input": {"query": w}}
+        for i, w in enumerate(["אמר", "דאמר", "מימר"])]
+    final = [{"type": "tool_use", "id": "toolu_f", "name": "WordDetermination", "input": {
+        "word": "דְּאָמַר", "reasoning": "No entry fits this usage. " * 20, "entries_to_keep": [],
+        "entries_to_remove": [], "entries_to_add": [], "confidence": "medium"}}]
+    sdk_blocks = [{**b, "citations": None, "cache_control": None} for b in blocks]
+    return {"segment": segment, "entries": entries, "params": params, "blocks": blocks,
+            "final": final, "sdk_blocks": sdk_blocks,
+            "phrases": [" ".join(segment.split()[i:i + 2]) for i in range(0, 60, 6)]}
+
+
+def cases(fx: Dict[str, object]) -> List[Tuple[str, Callable[[], object]]]:
+    import agent_core
+    from resolver import sanitize_content
+    entry = fx["entries"][0]
+    return [
+        ("split_hebrew_text", lambda: split_hebrew_text(fx["segment"])),
+        ("words_for_segment", lambda: agent_core.words_for_segment(fx["segment"], fx["phrases"])),
+        # prune/clean mutate their input, so each call gets a fresh copy (timed with it).
+        ("prune_lexicon_entry", lambda: prune_lexicon_entry(copy.deepcopy(entry))),
+        ("clean_nested_html", lambda: clean_nested_html(copy.deepcopy(entry["content"]))),
+        ("add_prompt_caching", lambda: agent_core.add_prompt_caching(fx["params"], ttl="5m")),
+        ("measure_payload", lambda: agent_core.measure_payload(fx["params"])),
+        ("sanitize_content", lambda: sanitize_content(fx["sdk_blocks"])),
+        ("interpret_determination/lookups", lambda: agent_core.interpret_determination_response(fx["blocks"])),
+        ("interpret_determination/final", lambda: agent_core.interpret_determination_response(fx["final"])),
+    ]
+
+
+def measure(fn: Callable[[], object], repeat: int) -> float:
+    """Best seconds per call over ``repeat`` runs, each sized by autorange to ~0.2s."""
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmarks of the per-task pure functions")
+    parser.add_argument("-k", help="Only benchmarks whose name contains this")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--ref", help="Take the segment and largest Jastrow entries from the local DB")
+    parser.add_argument("--save-baseline", metavar="PATH")
+    parser.add_argument("--check", metavar="PATH", help="Baseline to compare against")
+    parser.add_argument("--threshold", type=float, default=1.25)
+    parser.add_argument("--startup", action="store_true", help="Time each command's imports against its budget")
+    args = parser.parse_args()
+
+    if args.startup:
+        over = []
+        for name, seconds in startup(args.repeat).items():
+            budget = STARTUP_BUDGETS[name]
+            print(f"{name:<8} {seconds * 1000:>8.0f} ms  (budget {budget * 1000:.0f} ms)"
+                  + ("  OVER BUDGET" if seconds > budget else ""))
+            if seconds > budget:
+                over.append(name)
+        if opens_mongo_on_import():
+            print("import resolver opened a Mongo connection")
+            over.append("import")
+        sys.exit(1 if over else 0)
+
+    fx = fixtures(args.ref)
+    print(f"fixtures: segment {len(fx['segment'])} chars, entry {len(json.dumps(fx['entries'][0], ensure_ascii=False))} "
+          f"chars, conversation {len(fx['params']['messages'])} messages")
+    baseline = {}
+    if args.check:
+        with open(args.check, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+
+    results, regressions = {}, []
+    for name, fn in cases(fx):
+        if args.k and args.k not in name:
+            continue
+        seconds = measure(fn, args.repeat)
+        results[name] = seconds
+        line = f"{name:<34} {seconds * 1e6:>10.1f} µs"
+        if name in baseline:
+            ratio = seconds / baseline[name]
+            line += f"  {ratio:>5.2f}x baseline"
+            if ratio > args.threshold:
+                regressions.append(name)
+                line += "  REGRESSION"
+        print(line)
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump({"ref": args.ref, "results": results}, f, indent=1)
+    if regressions:
+        print(f"{len(regressions)} regressed past {args.threshold}x: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
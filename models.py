@@ -20,6 +20,8 @@ class LexiconAssociations(BaseModel):
     lexrefs: List[LexRef] = Field(description="The dictionary entries associated with the word form")
     refs: List[str] = Field(description="The refs of the segments of text in which the word form appears")
     reasoning: Optional[str] = Field(default=None, description="The reasoning behind the association of these entries")
+    segment_hashes: List[str] = Field(default_factory=list, description="Hashes of the normalized text of the segments in which this association was determined")
+    source: Optional[str] = Field(default=None, description="None for a determination; \"wordform:<generated_by>\" for an association imported from an existing WordForm (a vetting candidate only)")
 
 class WordFormAssociations(BaseModel):
     word: str = Field(description="The word form being associated with the dictionary entries")
@@ -32,6 +34,7 @@ class WordDetermination(BaseModel):
     entries_to_keep: List[LexRef] = Field(description="The dictionary entries to keep")
     entries_to_remove: List[LexRef] = Field(description="The dictionary entries to remove")
     entries_to_add: List[LexRef] = Field(description="The dictionary entries to add")
+    confidence: Optional[str] = Field(default=None, description="How confident the determination is: high, medium or low")
 
 class PhrasesInSegment(BaseModel):
     phrases: List[str] = Field(description="The phrases in the segment")
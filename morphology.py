@@ -0,0 +1,196 @@
+"""
+Offline Hebrew/Aramaic morphology for dictionary lookup.
+
+Generates ranked candidate base forms for a surface form - prefix letters stripped,
+common Aramaic suffixes stripped, matres lectionis dropped - and checks them against a
+nikkud-insensitive index of the headwords in tools.lexicon_map, so a single lookup can
+return entries for every plausible base (וּבְדִינָא -> דינא, דְּאָמַר -> אמר) instead of the
+agent spending turns finding it.
+
+The generator is pure; the index is built lazily from the local lexicon_entry collection.
+
+Throughput benchmark over a word list (one word per line) or a ref's words:
+    python morphology.py words.txt
+    python morphology.py --ref "Sanhedrin" [--vtitle ...]
+"""
+from __future__ import annotations
+import re
+import unicodedata
+from typing import Dict, List, Optional, Tuple
+
+from models import LexRef
+
+_NIKKUD = re.compile(r"[\u0591-\u05BD\u05BF-\u05C2\u05C4-\u05C7]")
+# Homograph numbering on headwords: "אָמַר I", "אָמַר II", "בַּר 2", "עַם¹".
+_HOMOGRAPH = re.compile(r"\s*(?:\b[IVX]+|\d+|[¹²³⁴-⁹⁰]+)\.?$")
+
+PREFIX_LETTERS = "והבכלמשד"
+MAX_PREFIXES = 2
+# Longest first, so -ייהו is tried before -הו.
+ARAMAIC_SUFFIXES = ["ייהו", "יהון", "יהו", "הון", "כון", "ניה", "תא", "יא", "יה", "הו", "ין", "נא", "א", "ה", "ן"]
+# Endings that alternate with the emphatic -א that Jastrow lists Aramaic nouns under.
+EMPHATIC_ALTERNATES = {"ה", "ן", "ין", "יה"}
+MIN_BASE = 2
+
+_FINAL = {"כ": "ך", "מ": "ם", "נ": "ן", "פ": "ף", "צ": "ץ"}
+_MEDIAL = {v: k for k, v in _FINAL.items()}
+
+
+def consonants(word: str) -> str:
+    """Strip nikkud and cantillation, leaving the consonantal form."""
+    return _NIKKUD.sub("", unicodedata.normalize("NFC", word))
+
+
+def headword_key(headword: str) -> str:
+    """A headword as a surface form would match it: consonantal, homograph number dropped."""
+    return _HOMOGRAPH.sub("", consonants(headword)).strip()
+
+
+def _finalize(form: str) -> str:
+    """Medial letters become final after a suffix is stripped, and vice versa mid-word."""
+    if not form:
+        return form
+    body = "".join(_MEDIAL.get(c, c) for c in form[:-1])
+    return body + _FINAL.get(form[-1], form[-1])
+
+
+def _defective(form: str) -> str:
+    """Drop internal ו/י used as vowel letters (plene -> defective spelling)."""
+    if len(form) <= 3:
+        return form
+    return form[0] + re.sub("[וי]", "", form[1:-1]) + form[-1]
+
+
+def candidates(word: str) -> List[Tuple[str, int]]:
+    """
+    Ranked (form, cost) candidates for a surface form, cheapest first; cost counts the
+    edits (prefix letter, suffix, spelling change) that produced the form. The consonantal
+    form itself is first at cost 0. Phrases get just their consonantal form.
+    """
+    base = consonants(word)
+    if re.search(r"\s", base):
+        return [(base, 0)]
+
+    costs: Dict[str, int] = {}
+
+    def add(form: str, cost: int) -> None:
+        if len(form) >= MIN_BASE and cost < costs.get(form, cost + 1):
+            costs[form] = cost
+
+    stems = [(base, 0)]
+    stripped = base
+    for i in range(1, MAX_PREFIXES + 1):
+        if len(stripped) - 1 < MIN_BASE or stripped[0] not in PREFIX_LETTERS:
+            break
+        stripped = stripped[1:]
+        stems.append((stripped, i))
+
+    for stem, cost in stems:
+        add(stem, cost)
+        variants = [(stem, cost)]
+        for suffix in ARAMAIC_SUFFIXES:
+            if stem.endswith(suffix) and len(stem) - len(suffix) >= MIN_BASE:
+                variants.append((_finalize(stem[:-len(suffix)]), cost + 1))
+                if suffix in EMPHATIC_ALTERNATES:
+                    variants.append((stem[:-len(suffix)] + "א", cost + 1))
+        for form, c in variants:
+            add(form, c)
+            add(_defective(form), c + 1)
+
+    return sorted(costs.items(), key=lambda kv: (kv[1], -len(kv[0])))
+
+
+def surface_variants(word: str, limit: int) -> List[str]:
+    """The top ``limit`` candidate forms other than the word's own consonantal form."""
+    return [form for form, _ in candidates(word) if form != consonants(word)][:limit]
+
+
+# --- Headword index -------------------------------------------------------------
+
+_index: Optional[Dict[str, List[LexRef]]] = None
+
+
+def headword_index() -> Dict[str, List[LexRef]]:
+    """Consonantal headword (and alt headword) -> entries, over the lexicons in lexicon_map.
+    Built once per process from the local lexicon_entry collection."""
+    global _index
+    if _index is None:
+        from sefaria.system.database import db
+        from tools import lexicon_names
+        index: Dict[str, List[LexRef]] = {}
+        cursor = db.lexicon_entry.find({"parent_lexicon": {"$in": lexicon_names}},
+                                       {"headword": 1, "alt_headwords": 1, "parent_lexicon": 1})
+        for doc in cursor:
+            lexref = LexRef(headword=doc["headword"], lexicon_name=doc["parent_lexicon"])
+            for hw in [doc["headword"]] + list(doc.get("alt_headwords") or []):
+                key = headword_key(hw)
+                if lexref not in index.get(key, []):
+                    index.setdefault(key, []).append(lexref)
+        _index = index
+    return _index
+
+
+def lookup_candidates(word: str, limit: int,
+                      index: Optional[Dict[str, List[LexRef]]] = None) -> List[Tuple[str, List[LexRef]]]:
+    """The ``limit`` best-ranked candidate forms that are headwords, with their entries. A
+    word that is itself a headword gets only that: stripping "prefixes" from it would mostly
+    eat root letters (בית -> ית)."""
+    index = headword_index() if index is None else index
+    if consonants(word) in index:
+        return [(consonants(word), index[consonants(word)])]
+    out = []
+    for form, _ in candidates(word):
+        if form in index:
+            out.append((form, index[form]))
+            if len(out) >= limit:
+                break
+    return out
+
+
+def _benchmark(words: List[str]) -> None:
+    import time
+    words = list(dict.fromkeys(words))
+    started = time.perf_counter()
+    generated = sum(len(candidates(w)) for w in words)
+    gen_s = time.perf_counter() - started
+
+    started = time.perf_counter()
+    index = headword_index()
+    load_s = time.perf_counter() - started
+
+    started = time.perf_counter()
+    hits = [lookup_candidates(w, 3, index) for w in words]
+    look_s = time.perf_counter() - started
+
+    covered = sum(1 for h in hits if h)
+    print(f"{len(words)} unique words, {generated} candidates ({generated / len(words):.1f}/word)")
+    print(f"generate: {gen_s:.2f}s ({len(words) / gen_s:,.0f} words/s)")
+    print(f"index: {len(index)} forms, built in {load_s:.1f}s")
+    print(f"lookup: {look_s:.2f}s ({len(words) / look_s:,.0f} words/s); "
+          f"{covered} words ({100 * covered / len(words):.1f}%) have a headword candidate")
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Morphological candidate throughput benchmark")
+    parser.add_argument("wordlist", nargs="?", help="File with one word per line")
+    parser.add_argument("--ref", help="Sefaria ref whose words to use instead")
+    parser.add_argument("--vtitle", default="William Davidson Edition - Vocalized Aramaic")
+    args = parser.parse_args()
+    if args.ref:
+        import orm
+        orm.setup()
+        from sefaria.model import Ref, TextChunk
+        from util import split_hebrew_text
+        ref = Ref(args.ref)
+        segments = ref.all_segment_refs() if not ref.is_segment_level() else [ref]
+        words = []
+        for seg in segments:
+            words += split_hebrew_text(TextChunk.remove_html_and_make_presentable(
+                seg.text("he", vtitle=args.vtitle).text))
+    elif args.wordlist:
+        with open(args.wordlist, encoding="utf-8") as f:
+            words = [line.strip() for line in f if line.strip()]
+    else:
+        parser.error("need a word list or --ref")
+    _benchmark(words)
@@ -0,0 +1,73 @@
+"""
+Lazy Django setup for the parts of the resolver that use the Sefaria ORM (sefaria.model):
+WordForm writes, entry validation, text fetching for seeding; and lazy Mongo collections.
+
+Nothing calls django.setup() at import time, so commands that only touch Mongo directly
+(status, clear, usage, simulate) never pay for it; setup() runs it once, on first need.
+Likewise no module opens Sefaria's Mongo client (importing sefaria.system.database does)
+or creates indexes at import: collection() returns a stand-in that does both on first use,
+so `--help` and a mistyped command never touch the database.
+"""
+import contextlib
+import logging
+from typing import Callable, Iterable, Tuple
+
+_ready = False
+
+
+@contextlib.contextmanager
+def _keep_logging():
+    """Sefaria's settings reconfigure logging, resetting the root logger and disabling
+    existing loggers; logging configured before that (the driver's) is put back."""
+    root = logging.getLogger()
+    handlers, level = root.handlers[:], root.level
+    enabled = [lg for lg in logging.root.manager.loggerDict.values()
+               if isinstance(lg, logging.Logger) and not lg.disabled]
+    yield
+    if handlers:
+        root.handlers[:] = handlers
+        root.setLevel(level)
+    for lg in enabled:
+        lg.disabled = False
+
+
+def setup() -> None:
+    """django.setup(), once."""
+    global _ready
+    if _ready:
+        return
+    import django
+    with _keep_logging():
+        django.setup()
+    _ready = True
+
+
+def mongo():
+    """Sefaria's pymongo client, opened by the first call."""
+    with _keep_logging():
+        from sefaria.system.database import client
+    return client
+
+
+class Lazy:
+    """Stands in for the object ``build()`` returns, built on first attribute access."""
+
+    def __init__(self, build: Callable[[], object]):
+        self._build = build
+        self._target = None
+
+    def __getattr__(self, name):
+        if self._target is None:
+            self._target = self._build()
+        return getattr(self._target, name)
+
+
+def collection(db_name: str, name: str, indexes: Iterable[Tuple[list, dict]] = ()) -> Lazy:
+    """A collection of Sefaria's Mongo server, connected to (and its ``indexes``, as
+    (keys, create_index options), ensured) on first use."""
+    def build():
+        coll = mongo()[db_name][name]
+        for keys, options in indexes:
+            coll.create_index(keys, **options)
+        return coll
+    return Lazy(build)
@@ -0,0 +1,151 @@
+"""
+Low-overhead profiling of the driver: `python resolver.py run --profile` (or process).
+
+Two pieces, both cheap enough to leave on for a whole tractate:
+  - a sampling profiler: a daemon thread reads the main thread's stack every
+    PROFILE_INTERVAL_MS (sys._current_frames, no tracing hooks) and counts collapsed
+    stacks, written per phase as `<label>.folded` - one "frame;frame;... count" line per
+    stack, the input format of flamegraph.pl, speedscope and inferno;
+  - an event-loop lag monitor: a coroutine that sleeps LAG_TICK and records how late it
+    wakes (the `loop_lag` phase in metrics). When the loop is blocked longer than
+    PROFILE_SLOW_MS, the sampler notes the blocking stack and the asyncio task running
+    it - apply_one and init_resolve_task name their tasks "<kind> <word>" - and the stall
+    is appended to `slow.jsonl`.
+
+Output goes to PROFILE_DIR/<run id>/, one .folded file per round phase
+(`003-submit`, `003-apply`, ...).
+"""
+from __future__ import annotations
+import asyncio
+import collections
+import json
+import os
+import re
+import sys
+import threading
+import time
+from typing import Optional
+
+import config
+import metrics
+
+LAG_TICK = 0.05
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})"
+
+
+def _collapse(frame) -> str:
+    stack = []
+    while frame is not None:
+        stack.append(_frame_label(frame))
+        frame = frame.f_back
+    return ";".join(reversed(stack))
+
+
+class Profiler:
+    def __init__(self, run_id: str):
+        slug = re.sub(r"[^\w.-]+", "_", run_id).strip("_") or "run"
+        self.out_dir = os.path.join(config.PROFILE_DIR, slug)
+        os.makedirs(self.out_dir, exist_ok=True)
+        self.interval = config.PROFILE_INTERVAL_MS / 1000
+        self.slow = config.PROFILE_SLOW_MS / 1000
+        self.stacks = collections.Counter()
+        self.samples = 0
+        self._lock = threading.Lock()   # stacks and the stall: written by the sampler, swapped by dump()
+        self.label = "start"
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._heartbeat = time.monotonic()
+        self._stall: Optional[dict] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._monitor: Optional[asyncio.Task] = None
+        self._main_id = threading.main_thread().ident
+
+    # --- lifecycle ---------------------------------------------------------------
+
+    def start(self) -> None:
+        """Start sampling and lag monitoring; call from inside the running event loop."""
+        self._loop = asyncio.get_running_loop()
+        self._heartbeat = time.monotonic()
+        self._monitor = self._loop.create_task(self._watch_lag(), name="profiler lag monitor")
+        self._thread = threading.Thread(target=self._sample, name="profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._monitor:
+            self._monitor.cancel()
+        if self._thread:
+            self._thread.join(timeout=1)
+        with self._lock:   # a stall still going when the run ends is still a stall
+            if self._stall is not None:
+                self._record_stall()
+        self.dump(self.label)
+
+    def begin(self, label: str) -> None:
+        """Close the current phase (writing its stacks) and start sampling into ``label``."""
+        self.dump(self.label)
+        self.label = label
+
+    def dump(self, label: str) -> Optional[str]:
+        """Write the stacks sampled since the last dump as `<label>.folded`; returns the path."""
+        with self._lock:
+            stacks, self.stacks = self.stacks, collections.Counter()
+        if not stacks:
+            return None
+        path = os.path.join(self.out_dir, f"{label}.folded")
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, n in stacks.most_common():
+                f.write(f"{stack} {n}\n")
+        return path
+
+    # --- loop side ---------------------------------------------------------------
+
+    async def _watch_lag(self) -> None:
+        while True:
+            before = time.monotonic()
+            self._heartbeat = before
+            await asyncio.sleep(LAG_TICK)
+            metrics.observe("loop_lag", max(0.0, time.monotonic() - before - LAG_TICK))
+
+    # --- sampler thread ----------------------------------------------------------
+
+    def _running_task(self) -> str:
+        try:
+            task = asyncio.current_task(self._loop)
+        except RuntimeError:
+            return ""
+        return task.get_name() if task else ""
+
+    def _sample(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._main_id)
+            if frame is None:
+                continue
+            stack = _collapse(frame)
+            blocked = time.monotonic() - self._heartbeat - LAG_TICK
+            with self._lock:
+                self.stacks[stack] += 1
+                self.samples += 1
+                if blocked > self.slow:
+                    if self._stall is None:
+                        self._stall = {"phase": self.label, "task": self._running_task(),
+                                       "stacks": collections.Counter()}
+                    self._stall["stacks"][stack] += 1
+                    self._stall["blocked_s"] = round(blocked, 3)
+                elif self._stall is not None:
+                    self._record_stall()
+
+    def _record_stall(self) -> None:
+        """Append the current stall to slow.jsonl. Called holding the lock."""
+        stall, self._stall = self._stall, None
+        top, n = stall["stacks"].most_common(1)[0]
+        event = {"phase": stall["phase"], "task": stall["task"], "blocked_s": stall["blocked_s"],
+                 "samples": sum(stall["stacks"].values()), "top_stack_samples": n,
+                 "top_stack": top.split(";")[-8:]}
+        metrics.count("loop_stalls")
+        with open(os.path.join(self.out_dir, "slow.jsonl"), "a", encoding="utf-8") as f:
+            f.write(json.dumps(event, ensure_ascii=False) + "\n")
@@ -0,0 +1,152 @@
+"""
+Compact, precomputed renderings of lexicon entries for prompts.
+
+A pruned entry's `content` is a nested structure of senses, sub-senses and bookkeeping
+fields; sent as str(dict)/JSON, the quoting and structure cost about as much as the
+text. The compact rendering is one string: numbered senses within a per-dictionary length
+budget, each sense's citation tail clipped to its share of the budget so long senses don't
+crowd out the later ones.
+
+Renderings are stored in `Lexicon.entry_renderings` keyed by (parent_lexicon, headword,
+version) and computed on first use, with a hash of the entry's content and the budget
+settings: a stored rendering whose hash no longer matches (the entry was edited, a budget
+changed) is rendered again. Bump RENDER_VERSION when the format changes.
+Precompute (and measure) for every entry in lexicon_map with `python resolver.py render-entries`.
+"""
+from __future__ import annotations
+import hashlib
+import json
+from typing import Dict, List
+
+import config
+import orm
+
+RENDER_VERSION = 1
+
+renderings_collection = orm.collection("Lexicon", "entry_renderings", indexes=[
+    ([("parent_lexicon", 1), ("headword", 1), ("version", 1)], {"unique": True})])
+
+# Bookkeeping fields that carry no meaning for the model.
+_NOISE_KEYS = {"num", "language_code"}
+
+
+def _sense_lines(node, label: str, out: List[str]) -> None:
+    if isinstance(node, list):
+        for i, item in enumerate(node, 1):
+            _sense_lines(item, f"{label}{i}." if label else f"{i}.", out)
+        return
+    if not isinstance(node, dict):
+        if isinstance(node, str) and node.strip():
+            out.append(f"{label} {node.strip()}".strip())
+        return
+    texts = [" ".join(v.split()) for k, v in node.items()
+             if isinstance(v, str) and v.strip() and k not in _NOISE_KEYS]
+    if texts:
+        out.append(f"{label} {' '.join(texts)}".strip())
+    for k, v in node.items():
+        if isinstance(v, (list, dict)) and k not in _NOISE_KEYS:
+            _sense_lines(v, label, out)
+
+
+def _budget(entry: dict) -> int:
+    return config.RENDER_BUDGETS.get(entry.get("parent_lexicon"), config.RENDER_DEFAULT_BUDGET)
+
+
+def _clip(line: str, limit: int) -> str:
+    return line if len(line) <= limit else line[:limit - 1].rstrip() + "…"
+
+
+def _fit(lines: List[str], budget: int) -> List[str]:
+    """Clip the senses' tails so all of them fit the budget where they can: each sense gets
+    at most RENDER_SENSE_CHARS, short senses keep their text, and what they leave is shared
+    evenly among the long ones."""
+    lines = [_clip(line, config.RENDER_SENSE_CHARS) for line in lines]
+    room = budget - (len(lines) - 1)   # the joining spaces
+    long_ones = sorted(range(len(lines)), key=lambda i: len(lines[i]))
+    share = room
+    for n, i in enumerate(long_ones):
+        share = room // (len(lines) - n)
+        if len(lines[i]) > share:
+            break
+        room -= len(lines[i])
+    else:
+        return lines
+    # A sense keeps at least its label and a few words; the overall cut handles the rest.
+    share = max(share, 40)
+    return [_clip(line, share) for line in lines]
+
+
+def render_entry(entry: dict) -> str:
+    """Compact text rendering of a pruned entry's content, within its dictionary's budget."""
+    lines: List[str] = []
+    _sense_lines(entry.get("content") or {}, "", lines)
+    budget = _budget(entry)
+    text = " ".join(_fit(lines, budget))
+    if len(text) > budget:
+        text = text[:budget].rstrip() + " […]"
+    return text
+
+
+def render_hash(entry: dict) -> str:
+    """Hash of what a rendering depends on: the entry's content and the budget settings."""
+    basis = [config.RENDER_SENSE_CHARS, _budget(entry), entry.get("content")]
+    return hashlib.sha1(json.dumps(basis, sort_keys=True, ensure_ascii=False, default=str)
+                        .encode("utf-8")).hexdigest()
+
+
+def _store(entry: dict, text: str, digest: str) -> None:
+    renderings_collection.update_one(
+        {"parent_lexicon": entry["parent_lexicon"], "headword": entry["headword"], "version": RENDER_VERSION},
+        {"$set": {"text": text, "hash": digest}}, upsert=True)
+
+
+def compact_entries(entries: List[dict]) -> List[dict]:
+    """
+    Swap each pruned entry's content for its stored compact rendering, computing and storing
+    any that are missing or stale. Keeps headword/parent_lexicon, so callers that key on them are
+    unaffected.
+    """
+    if not entries:
+        return entries
+    query = {"version": RENDER_VERSION,
+             "$or": [{"parent_lexicon": e["parent_lexicon"], "headword": e["headword"]} for e in entries]}
+    stored: Dict[tuple, dict] = {(d["parent_lexicon"], d["headword"]): d
+                                 for d in renderings_collection.find(query, {"text": 1, "hash": 1,
+                                                                             "parent_lexicon": 1, "headword": 1})}
+    out = []
+    for e in entries:
+        key = (e["parent_lexicon"], e["headword"])
+        digest = render_hash(e)
+        doc = stored.get(key)
+        if doc is None or doc.get("hash") != digest:
+            doc = stored[key] = {"text": render_entry(e), "hash": digest}
+            _store(e, doc["text"], digest)
+        out.append({"headword": e["headword"], "parent_lexicon": e["parent_lexicon"], "content": doc["text"]})
+    return out
+
+
+def precompute(lexicon_names: List[str]) -> Dict[str, dict]:
+    """
+    Render and store every entry of the given lexicons at the current version. Returns, per
+    lexicon, the entry count and average characters of the full pruned JSON versus the
+    compact rendering - the per-entry saving in every prompt that carries the entry.
+    """
+    import orm
+    orm.setup()
+    from sefaria.model import LexiconEntrySet
+    from util import prune_lexicon_entry
+    report = {}
+    for name in lexicon_names:
+        n = full = compact = 0
+        for entry in LexiconEntrySet({"parent_lexicon": name}):
+            pruned = prune_lexicon_entry(entry.contents())
+            text = render_entry(pruned)
+            _store(pruned, text, render_hash(pruned))
+            n += 1
+            full += len(json.dumps(pruned.get("content"), ensure_ascii=False))
+            compact += len(text)
+        report[name] = {"entries": n,
+                        "avg_full_chars": round(full / n) if n else 0,
+                        "avg_compact_chars": round(compact / n) if n else 0,
+                        "saved": f"{100 * (full - compact) / full:.1f}%" if full else "n/a"}
+    return report
@@ -11,22 +11,21 @@ Usage (env needs DJANGO_SETTINGS_MODULE, PYTHONPATH to Sefaria-Project, ANTHROPI
     python resolver.py process "Sanhedrin 63a"      # seed + run to completion
     python resolver.py seed "Sanhedrin 63a:4"
     python resolver.py run --run-id "Sanhedrin 63a:4"
-    python resolver.py status --run-id "Sanhedrin 63a"
+    python resolver.py status --run-id "Sanhedrin 63a" [--metrics]
     python resolver.py clear --run-id "Sanhedrin 63a"
+
+Words already resolved in the same context (same ref, or identical segment text) are
+answered from `Lexicon.assocs` without a model call; pass --force to re-determine them.
 """
 from __future__ import annotations
 import argparse
 import asyncio
+import datetime
 import logging
 import time
 
-import anthropic
-
-import django
-django.setup()
-from sefaria.model import Ref, TextChunk
-
 import config
+import metrics
 import store
 import agent_core
 from agent_core import (
@@ -34,36 +33,43 @@ from agent_core import (
     build_vetting_candidates, vetting_params, interpret_vetting_response,
     determination_initial_params, interpret_determination_response, tool_result_block,
 )
-from cache import get_cached_associations, add_segment_to_cache, add_empty_association_to_cache
+from cache import (
+    get_cached_associations, get_memoized_association, add_segment_to_cache, add_empty_association_to_cache,
+)
 from db import record_determination, record_empty_determination
-from models import LexRef, WordDetermination
-from tools import words_api, LOCAL_TOOL_FUNCTIONS
+from models import LexRef, LexiconAssociations, WordDetermination
+from rules import preresolve, rules_read_cache
+from tools import words_api, LOCAL_TOOL_FUNCTIONS, sefaria_limiter, tool_latency
+from limiter import LatencyWindow
 from log import log
 
-# force=True: sefaria's Django settings configure the root logger during django.setup(),
-# which would otherwise make this a silent no-op.
+# force=True: replaces any root logger configuration imported so far. Sefaria's settings load
+# later, with the first Mongo access or orm.setup(), and orm puts this configuration back.
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s", force=True)
 logger = logging.getLogger("resolver")
 
 _client = None
 
 
-def client() -> anthropic.Anthropic:
+def client() -> "anthropic.Anthropic":
     global _client
     if _client is None:
+        import anthropic   # loaded by the commands that submit or poll, not by status/clear
         # Long-running offline job: a laptop sleeping or changing networks kills
         # in-flight connections, so be generous with retries and timeouts.
         _client = anthropic.Anthropic(max_retries=8, timeout=120.0)
     return _client
 
 
-# Errors that mean "try again later", not "this request is wrong".
-TRANSIENT_ERRORS = (
-    anthropic.APITimeoutError,
-    anthropic.APIConnectionError,
-    anthropic.InternalServerError,
-    anthropic.RateLimitError,
-)
+def transient_errors() -> tuple:
+    """Errors that mean "try again later", not "this request is wrong"."""
+    import anthropic
+    return (
+        anthropic.APITimeoutError,
+        anthropic.APIConnectionError,
+        anthropic.InternalServerError,
+        anthropic.RateLimitError,
+    )
 
 
 async def resilient(fn, what: str, attempts: int = 20):
@@ -80,7 +86,7 @@ async def resilient(fn, what: str, attempts: int = 20):
     for i in range(attempts):
         try:
             return fn()
-        except TRANSIENT_ERRORS as e:
+        except transient_errors() as e:
             logger.warning("%s failed (%s); retry %d/%d in %ds",
                            what, type(e).__name__, i + 1, attempts, delay)
             await asyncio.sleep(delay)
@@ -92,18 +98,23 @@ VTITLE = "William Davidson Edition - Vocalized Aramaic"
 
 # --- Seeding -----------------------------------------------------------------
 
-def seed(run_id: str, ref_str: str, vtitle: str = VTITLE) -> int:
-    ref = Ref(ref_str)
-    segments = ref.all_segment_refs() if not ref.is_segment_level() else [ref]
+def seed(run_id: str, ref_str: str, vtitle: str = VTITLE, force: bool = False) -> int:
+    """
+    A phrases task per segment of ref_str, streamed (corpus.py): the range's text is read
+    at once, cleaned in a worker pool and inserted SEED_CHUNK_SIZE segments at a time, so
+    `process` submits the first batch while the rest is still seeding. Segments the run
+    already has are skipped: an interrupted seed resumes where it stopped.
+    """
+    import corpus
     n = 0
-    for seg in segments:
-        text = TextChunk.remove_html_and_make_presentable(seg.text('he', vtitle=vtitle).text)
-        if not text or not text.strip():
-            logger.warning("No text for %s (vtitle=%s); skipping", seg.normal(), vtitle)
-            continue
-        store.create_task(run_id, "phrases", seg.normal(), text,
-                          params=phrase_extraction_params(text))
-        n += 1
+    # Seeding timings stay in the registry; they land in the submit_metrics of whichever
+    # round is submitted next.
+    for chunk in corpus.segments(ref_str, vtitle, skip=store.seeded_refs(run_id)):
+        with metrics.timed("seed_insert"):
+            n += store.create_tasks(run_id, "phrases",
+                                    [(ref, text, phrase_extraction_params(text)) for ref, text in chunk],
+                                    extra={"force": True} if force else None)
+        logger.info("Seeded %d segments for run %s so far", n, run_id)
     logger.info("Seeded %d segments for run %s", n, run_id)
     return n
 
@@ -129,41 +140,148 @@ def sanitize_content(content_blocks) -> list[dict]:
 
 # --- Word-task creation ------------------------------------------------------
 
-def create_word_task(run_id: str, ref: str, segment: str, word: str) -> None:
-    """Create a vet task if the cache has candidates, else an uninitialized resolve task."""
-    cached = get_cached_associations(word)
+def memo_result(ref: str, segment: str, word: str) -> dict | None:
+    """
+    If this word was already resolved in this exact context (same ref, or a segment with
+    identical normalized text), re-record that association and return the task result.
+    Deterministic and free: no model call, no lookups.
+    """
+    assoc = get_memoized_association(word, ref, segment)
+    if assoc is None:
+        return None
+    determination = None
+    if not assoc.lexrefs:
+        determination = WordDetermination(word=word, reasoning=assoc.reasoning or "",
+                                          entries_to_keep=[], entries_to_remove=[], entries_to_add=[])
+    record_resolution({"ref": ref, "word": word, "segment": segment}, assoc.lexrefs, determination)
+    return {"via": "memo", "selected_association": [lr.model_dump() for lr in assoc.lexrefs]}
+
+
+def prefilter_candidates(ref: str, segment: str, word: str, cached: list[LexiconAssociations],
+                         force: bool = False) -> tuple[list, dict, dict | None]:
+    """
+    Cut a long list of cached associations to the VET_TOP_K whose recorded contexts are most
+    similar to this segment (similarity.py). Returns (associations to vet, the prefilter's
+    counts for the task, or {}, and a task result if one was auto-accepted - already recorded).
+    A forced task is never auto-accepted: it is being redone because its context's cached
+    answer is in doubt.
+    """
+    if not cached:
+        return cached, {}, None
+    import corpus      # the seeding and ranking modules load with the first word that needs them
+    import similarity
+    with metrics.timed("vet_prefilter"):
+        kept, info, auto = similarity.prefilter(word, segment, cached,
+                                                lambda r: corpus.segment_text(r, VTITLE),
+                                                auto_accept=0 if force else config.VET_AUTO_ACCEPT, ref=ref)
+    if auto is None:
+        return kept, info, None
+    record_resolution({"ref": ref, "word": word, "segment": segment}, auto.lexrefs, None)
+    return kept, info, {"via": "similarity", "score": info["top_score"],
+                        "selected_association": [lr.model_dump() for lr in auto.lexrefs]}
+
+
+def create_word_task(run_id: str, ref: str, segment: str, word: str, force: bool = False) -> None:
+    """Record a memoized resolution if there is one (unless forced); otherwise create a vet
+    task if the cache has candidates, else an uninitialized resolve task (pre-resolution rules
+    run in init_resolve_task). With a rule that reads the cache enabled, every word starts as
+    an uninitialized resolve task so the rules run before any vetting."""
+    extra = {"force": True} if force else {}
+    memo = None if force else memo_result(ref, segment, word)
+    if memo:
+        store.create_task(run_id, "resolve", ref, segment, word, params=None,
+                          extra={"status": "done", "result": memo})
+        return
+    if config.PRERESOLVE_RULES and rules_read_cache():
+        store.create_task(run_id, "resolve", ref, segment, word, params=None, extra=extra)
+        return
+
+    cached, prefiltered, accepted = prefilter_candidates(ref, segment, word, get_cached_associations(word), force)
+    if accepted:
+        store.create_task(run_id, "resolve", ref, segment, word, params=None,
+                          extra={"status": "done", "result": accepted})
+        return
     candidates = build_vetting_candidates(cached) if cached else []
     if candidates:
+        if prefiltered:
+            extra["prefiltered"] = prefiltered
         store.create_task(run_id, "vet", ref, segment, word,
                           params=vetting_params(word, segment, candidates),
-                          extra={"candidates": candidates})
+                          extra={"candidates": candidates, **extra})
     else:
-        store.create_task(run_id, "resolve", ref, segment, word, params=None)
+        store.create_task(run_id, "resolve", ref, segment, word, params=None, extra=extra)
 
 
+@metrics.instrument("prefetch_lookups")
+async def prefetch_lookups(word: str) -> dict:
+    """Run the agent's likely opening search_word_forms queries in parallel, before the
+    first submission. Failed lookups are left out; the agent can still run them itself."""
+    queries = agent_core.speculative_queries(word, config.PREFETCH_MAX_QUERIES)
+    fn = LOCAL_TOOL_FUNCTIONS["search_word_forms"]
+    results = await asyncio.gather(*[asyncio.wait_for(fn(q), config.LOOKUP_DEADLINE_SECONDS) for q in queries],
+                                   return_exceptions=True)
+    return {q: r for q, r in zip(queries, results) if not isinstance(r, BaseException)}
+
+
+@metrics.instrument("init_resolve")
 async def init_resolve_task(task: dict) -> None:
     """Fill in initial params for a resolve task (requires a words API call).
-    If cached associations have appeared since the task was created (word resolved
-    in another segment this run), convert to a vet task instead."""
+    Words covered by a pre-resolution rule are recorded directly. If cached associations
+    have appeared since the task was created (word resolved in another segment this run),
+    convert to a vet task instead."""
     word, ref, segment = task["word"], task["ref"], task["segment"]
+    asyncio.current_task().set_name(f"init {word}")  # for --profile
+
+    # After retry-failed, or when an identical segment resolved this word meanwhile.
+    memo = None if task.get("force") else memo_result(ref, segment, word)
+    if memo:
+        store.complete_pending_task(task["_id"], memo)
+        return
+
+    cached = [] if task.get("vetted") else get_cached_associations(word)
+    lookup = None
+    # Rules run on a word headed for a determination, which needs the lookup anyway, and before
+    # vetting only if one reads the cache. Once vetting has rejected the cache, they don't get
+    # another say.
+    if config.PRERESOLVE_RULES and not task.get("vetted") and (not cached or rules_read_cache()):
+        lookup = await words_api(word, ref)
+        hit = preresolve(word, *lookup, cached)
+        if hit:
+            rule, lexrefs = hit
+            record_resolution(task, lexrefs, None)
+            store.complete_pending_task(task["_id"], {
+                "via": "rule", "rule": rule,
+                "selected_association": [lr.model_dump() for lr in lexrefs]})
+            return
 
     # A word may have been resolved in another segment since this task was created;
     # vet those fresh cache candidates instead of running a full determination.
     # (Skipped if this task already went through vetting and rejected them.)
-    cached = [] if task.get("vetted") else get_cached_associations(word)
+    cached, prefiltered, accepted = prefilter_candidates(ref, segment, word, cached, task.get("force", False))
+    if accepted:
+        store.complete_pending_task(task["_id"], accepted)
+        return
     candidates = build_vetting_candidates(cached) if cached else []
     if candidates:
-        store.tasks.update_one({"_id": task["_id"]},
-                               {"$set": {"kind": "vet",
-                                         "candidates": candidates,
-                                         "params": vetting_params(word, segment, candidates),
-                                         "updated_at": store.now()}})
+        store.set_params(task["_id"], vetting_params(word, segment, candidates),
+                         extra={"kind": "vet", "candidates": candidates,
+                                **({"prefiltered": prefiltered} if prefiltered else {})})
         return
 
-    possible, associated = await words_api(word, ref)
-    params = determination_initial_params(ref, word, segment, possible, associated)
-    store.tasks.update_one({"_id": task["_id"]},
-                           {"$set": {"params": params, "updated_at": store.now()}})
+    possible, associated = lookup or await words_api(word, ref)
+    prefetched = await prefetch_lookups(word) if config.PREFETCH_LOOKUPS else {}
+    update = {"prefetched": len(prefetched), "determination_start": task["turn"]}
+    update["shown_entries"] = sorted({agent_core.entry_key(e["headword"], e["parent_lexicon"])
+                                      for e in associated + possible + sum(prefetched.values(), [])})
+    if prefetched:   # so the agent repeating one is answered from the prompt, not re-run
+        keys = {agent_core.lookup_key("search_word_forms", {"query": q}): q for q in prefetched}
+        update["lookups"] = [{"key": k, "query": q, "empty": not prefetched[q], "prefetched": True}
+                             for k, q in keys.items()]
+    if config.CASCADE_MODEL:
+        update["cascade"] = {"model": config.CASCADE_MODEL, "start_turn": task["turn"]}
+    params = determination_initial_params(ref, word, segment, possible, associated,
+                                          model=config.CASCADE_MODEL or None, prefetched=prefetched)
+    store.set_params(task["_id"], params, extra=update)
 
 
 # --- Recording ---------------------------------------------------------------
@@ -193,7 +311,7 @@ def apply_phrases_result(run_id: str, task: dict, blocks: list[dict]) -> None:
     phrases = interpret_phrase_response(blocks)
     words = words_for_segment(task["segment"], phrases)
     for word in words:
-        create_word_task(run_id, task["ref"], task["segment"], word)
+        create_word_task(run_id, task["ref"], task["segment"], word, force=task.get("force", False))
     store.complete_task(task["_id"], task["turn"], {"phrases": phrases, "words": words})
     logger.info("%s: %d words/phrases", task["ref"], len(words))
 
@@ -204,8 +322,8 @@ def apply_vet_result(run_id: str, task: dict, blocks: list[dict]) -> None:
     if idx is None:
         # No cached candidate held up; fall through to a fresh determination.
         store.tasks.update_one({"_id": task["_id"], "turn": task["turn"], "status": "in_batch"},
-                               {"$set": {"kind": "resolve", "params": None, "status": "pending",
-                                         "vetted": True, "updated_at": store.now()},
+                               {"$set": {"kind": "resolve", "params": None, "messages": None,
+                                         "status": "pending", "vetted": True, "updated_at": store.now()},
                                 "$inc": {"turn": 1}})
         return
     cand = candidates[idx]
@@ -217,58 +335,161 @@ def apply_vet_result(run_id: str, task: dict, blocks: list[dict]) -> None:
     record_resolution(task, lexrefs, determination)
     store.complete_task(task["_id"], task["turn"],
                         {"via": "vetting", "selected_index": idx,
-                         "selected_association": [lr.model_dump() for lr in lexrefs]})
+                         "selected_association": [lr.model_dump() for lr in lexrefs],
+                         **({"candidate_source": cand["source"]} if cand.get("source") else {})})
+
+
+def determination_turn(task: dict) -> int:
+    """The task's turn count against MAX_AGENT_TURNS; turns spent on the cascade's cheap
+    model don't count, so an escalated task gets the full budget on DETERMINATION_MODEL."""
+    return task["turn"] - (task.get("cascade") or {}).get("turns", 0)
+
+
+def cascade_escalation(kind: str, payload) -> str | None:
+    """Why a cheap-model turn should go to DETERMINATION_MODEL instead, or None to carry on."""
+    if kind == "final":
+        confidence = (payload.confidence or "").strip().lower()
+        if not confidence:
+            return "no confidence"
+        if confidence in config.CASCADE_ESCALATE_CONFIDENCE:
+            return "low confidence"
+    if kind == "tool_results":   # only produced for an unusable WordDetermination call
+        return "invalid determination"
+    if kind == "invalid":
+        return "invalid response"
+    return None
+
+
+def escalate_task(task: dict, reason: str, new_messages: list, extra: dict | None = None,
+                  overrides: dict | None = None) -> None:
+    """Hand a cascade task to DETERMINATION_MODEL, keeping the conversation (and so every
+    lookup result) gathered so far."""
+    cheap_turns = task["turn"] - task["cascade"]["start_turn"] + 1
+    store.advance_task(task, new_messages, overrides={**(overrides or {}), "model": config.DETERMINATION_MODEL},
+                       extra={**(extra or {}), "cascade.escalated": reason, "cascade.turns": cheap_turns})
+    logger.info("%s / %s: escalated after %d cheap turns (%s)", task["ref"], task["word"], cheap_turns, reason)
+
+
+async def execute_lookups(task: dict, calls: list[dict]) -> tuple[list[dict], dict]:
+    """
+    Execute the agent's lookup calls locally. A lookup already run for this task - an exact
+    or normalized repeat, including the prefetched ones - is not re-executed; the model is
+    pointed back at the earlier result instead. Entries the conversation already shows in
+    full are rendered as a short reference. Returns the tool results and the task fields
+    tracking lookups (executed keys, current run of empty results, duplicates answered,
+    entries shown, characters saved by deduplication).
+    """
+    seen = {entry["key"]: entry for entry in task.get("lookups", [])}
+    shown = set(task.get("shown_entries", []))
+    streak = task.get("empty_streak", 0)
+    duplicates = 0
+    deduped_chars = 0
+    tool_results = []
+    for call in calls:
+        fn = LOCAL_TOOL_FUNCTIONS.get(call["name"])
+        if fn is None:
+            tool_results.append(tool_result_block(call["id"], f"Unknown tool: {call['name']}", is_error=True))
+            continue
+        key = agent_core.lookup_key(call["name"], call["input"])
+        earlier = seen.get(key)
+        if earlier:
+            duplicates += 1
+            streak = streak + 1 if earlier["empty"] else 0
+            where = "in the initial prompt" if earlier.get("prefetched") else "earlier in this conversation"
+            outcome = "It returned no results." if earlier["empty"] else "Its results are shown there."
+            tool_results.append(tool_result_block(
+                call["id"], f"Repeated lookup: this is the same as {earlier['query']!r}, already run {where}. "
+                            f"{outcome} Please do not repeat lookups."))
+            continue
+        try:
+            started = time.monotonic()
+            # A deadline per lookup: a stuck call costs this agent one error result, not the
+            # whole round its wait (every task's next submission waits on the slowest apply).
+            result = await asyncio.wait_for(fn(**call["input"]), config.LOOKUP_DEADLINE_SECONDS)
+            tool_latency.setdefault(call["name"], LatencyWindow()).add(time.monotonic() - started)
+            block = tool_result_block(call["id"], agent_core.dedupe_entries(result, shown))
+            deduped_chars += len(tool_result_block(call["id"], result)["content"]) - len(block["content"])
+            tool_results.append(block)
+            empty = not result
+            seen[key] = {"key": key, "query": call["input"].get("query", ""), "empty": empty}
+            streak = streak + 1 if empty else 0
+        except asyncio.TimeoutError:
+            metrics.count("lookup_deadline_expired")
+            tool_results.append(tool_result_block(
+                call["id"], f"Lookup timed out after {config.LOOKUP_DEADLINE_SECONDS:.0f}s. "
+                            "Try a different query, or conclude with what you have.", is_error=True))
+        except Exception as e:
+            tool_results.append(tool_result_block(call["id"], f"Tool error: {e}", is_error=True))
+    return tool_results, {"lookups": list(seen.values()), "empty_streak": streak,
+                          "duplicate_lookups": task.get("duplicate_lookups", 0) + duplicates,
+                          "shown_entries": sorted(shown),
+                          "deduped_chars": task.get("deduped_chars", 0) + deduped_chars}
 
 
 async def apply_resolve_result(run_id: str, task: dict, blocks: list[dict]) -> None:
     kind, payload = interpret_determination_response(blocks)
+    # A forced conclusion pins only the turn after it; whatever follows gets the usual choice.
+    overrides = {}
+    if (task.get("forced_conclusion") or {}).get("turn") == task["turn"]:
+        overrides["tool_choice"] = agent_core.DETERMINATION_TOOL_CHOICE
+
+    cascade = task.get("cascade")
+    on_cheap = cascade is not None and not cascade.get("escalated")
+    if on_cheap:
+        reason = cascade_escalation(kind, payload)
+        if reason:
+            # Drop the unusable turn; the conversation still ends on our last tool results.
+            escalate_task(task, reason, [], overrides=overrides)
+            return
 
     if kind == "final":
         determination: WordDetermination = payload
         selected = determination.entries_to_keep + determination.entries_to_add
         record_resolution(task, selected, determination)
         store.complete_task(task["_id"], task["turn"],
-                            {"via": "determination", "determination": determination.model_dump()})
+                            {"via": "determination", "determination": determination.model_dump(),
+                             "model": store.build_params(task)["model"]})
         return
 
     if kind == "invalid":
         store.fail_task(task["_id"], f"invalid agent response: {payload}")
         return
 
-    if task["turn"] + 1 >= config.MAX_AGENT_TURNS:
+    cheap_exhausted = on_cheap and task["turn"] - cascade["start_turn"] + 1 >= config.CASCADE_MAX_TURNS
+    if not on_cheap and determination_turn(task) + 1 >= config.MAX_AGENT_TURNS:
         store.fail_task(task["_id"], "exceeded max agent turns")
         logger.warning("%s / %s: exceeded max agent turns", task["ref"], task["word"])
         return
 
+    extra = {}
     if kind == "tool_results":
         tool_results = payload
     else:  # kind == "lookups": execute the lookup tools locally
-        tool_results = []
-        for call in payload:
-            fn = LOCAL_TOOL_FUNCTIONS.get(call["name"])
-            if fn is None:
-                tool_results.append(tool_result_block(call["id"], f"Unknown tool: {call['name']}", is_error=True))
-                continue
-            try:
-                result = await fn(**call["input"])
-                tool_results.append(tool_result_block(call["id"], result))
-            except Exception as e:
-                tool_results.append(tool_result_block(call["id"], f"Tool error: {e}", is_error=True))
-
+        tool_results, extra = await execute_lookups(task, payload)
+
+    if extra.get("empty_streak", 0) >= config.EMPTY_LOOKUP_LIMIT and not cheap_exhausted:
+        # A run of empty searches rarely ends in a find; stop the search here rather than
+        # at MAX_AGENT_TURNS, and pin the next turn to a determination.
+        tool_results = tool_results + [{"type": "text", "text": agent_core.FORCE_CONCLUSION_TEXT}]
+        overrides["tool_choice"] = agent_core.FORCED_TOOL_CHOICE
+        extra["forced_conclusion"] = {"turn": task["turn"] + 1,
+                                      "turns_left": config.MAX_AGENT_TURNS - determination_turn(task) - 1}
     # Near the turn cap, tell the model to wrap up rather than letting it
-    # research its way into a hard failure.
-    if task["turn"] + 3 >= config.MAX_AGENT_TURNS:
+    # research its way into a hard failure. (The cascade's cheap model escalates instead.)
+    elif not on_cheap and determination_turn(task) + 3 >= config.MAX_AGENT_TURNS:
         tool_results = tool_results + [{
             "type": "text",
             "text": "You have used most of your lookup budget. Please conclude now: call WordDetermination with the best entries you have verified so far, or an empty determination if none are appropriate.",
         }]
 
-    params = task["params"]
-    params["messages"] = params["messages"] + [
+    new_messages = [
         {"role": "assistant", "content": blocks},
         {"role": "user", "content": tool_results},
     ]
-    store.advance_task(task["_id"], task["turn"], params)
+    if cheap_exhausted:
+        escalate_task(task, "out of turns", new_messages, extra, overrides)
+    else:
+        store.advance_task(task, new_messages, overrides, extra)
 
 
 async def apply_result(run_id: str, task: dict, blocks: list[dict]) -> None:
@@ -282,21 +503,64 @@ async def apply_result(run_id: str, task: dict, blocks: list[dict]) -> None:
 
 # --- The driver loop ---------------------------------------------------------
 
+def usage_of(message) -> dict:
+    """Token usage of one batch result, as plain ints (see store.USAGE_FIELDS)."""
+    u = message.usage
+    out = {f: getattr(u, f, 0) or 0 for f in store.USAGE_FIELDS if f != "cache_creation_1h_tokens"}
+    breakdown = getattr(u, "cache_creation", None)
+    out["cache_creation_1h_tokens"] = (getattr(breakdown, "ephemeral_1h_input_tokens", 0) or 0) if breakdown else 0
+    return out
+
+
+def poll_schedule(interval: float, rate: float, remaining: int, elapsed: float,
+                  expected: float | None) -> tuple[float, float | None]:
+    """
+    Next poll interval and the batch's ETA in seconds (None if unknown). The ETA comes from
+    the completion rate since the last poll, or failing that (batches often report little
+    progress until they end) the previous round's turnaround less the time already spent.
+    Poll at a quarter of the ETA within [POLL_INTERVAL_SECONDS, POLL_MAX_INTERVAL_SECONDS];
+    with no ETA, back off 1.5x per poll.
+    """
+    if rate > 0:
+        eta = remaining / rate
+    elif expected is not None and expected > elapsed:
+        eta = expected - elapsed
+    else:
+        eta = None
+    nxt = eta / 4 if eta is not None else interval * 1.5
+    return min(max(nxt, config.POLL_INTERVAL_SECONDS), config.POLL_MAX_INTERVAL_SECONDS), eta
+
+
 async def poll_and_apply_round(run_id: str, round_doc: dict) -> None:
     batch_id = round_doc["batch_id"]
-    while True:
-        batch = await resilient(lambda: client().messages.batches.retrieve(batch_id),
-                                f"poll {batch_id}")
-        if batch.processing_status == "ended":
-            break
-        counts = batch.request_counts
-        logger.info("batch %s: processing=%d succeeded=%d errored=%d",
-                    batch_id, counts.processing, counts.succeeded, counts.errored)
-        await asyncio.sleep(config.POLL_INTERVAL_SECONDS)
+    expected = store.last_round_turnaround(run_id)
+    created = round_doc.get("created_at") or store.now()
+    if created.tzinfo is None:   # pymongo returns naive UTC
+        created = created.replace(tzinfo=datetime.timezone.utc)
+    interval = config.POLL_INTERVAL_SECONDS
+    prev = None   # (monotonic time, finished count) at the last poll
+    with metrics.timed("batch_processing"):   # from this process's first poll; see batch_rounds for the full span
+        while True:
+            batch = await resilient(lambda: client().messages.batches.retrieve(batch_id),
+                                    f"poll {batch_id}")
+            if batch.processing_status == "ended":
+                break
+            counts = batch.request_counts
+            finished = sum(getattr(counts, k, 0) or 0 for k in ("succeeded", "errored", "canceled", "expired"))
+            now = time.monotonic()
+            rate = (finished - prev[1]) / (now - prev[0]) if prev and now > prev[0] else 0.0
+            prev = (now, finished)
+            interval, eta = poll_schedule(interval, rate, counts.processing,
+                                          (store.now() - created).total_seconds(), expected)
+            logger.info("batch %s: processing=%d succeeded=%d errored=%d; ETA %s; next poll in %.0fs",
+                        batch_id, counts.processing, counts.succeeded, counts.errored,
+                        f"{eta / 60:.0f}m" if eta is not None else "unknown", interval)
+            await asyncio.sleep(interval)
 
     # Materialize inside the retry so a mid-stream drop refetches the whole set.
-    results = await resilient(lambda: list(client().messages.batches.results(batch_id)),
-                              f"fetch results {batch_id}")
+    with metrics.timed("results_download"):
+        results = await resilient(lambda: list(client().messages.batches.results(batch_id)),
+                                  f"fetch results {batch_id}")
     # Apply concurrently: the slow part is each determination's dictionary lookups
     # (HTTP to Sefaria), and applying hundreds of them serially added ~2 minutes between
     # rounds - dead time that ages out prompt-cache entries and stretches wall clock.
@@ -304,17 +568,27 @@ async def poll_and_apply_round(run_id: str, round_doc: dict) -> None:
     # writes) is synchronous, so it runs to completion without yielding the event loop
     # and cannot interleave with another task's read-modify-write.
     sem = asyncio.Semaphore(config.APPLY_CONCURRENCY)
+    round_usage = store.new_round_usage()
+    task_usage = []
 
     async def apply_one(result) -> None:
         task_id_str, turn_str = result.custom_id.rsplit("_", 1)
-        task = store.tasks.find_one({"_id": store.ObjectId(task_id_str)})
+        metrics.count(f"results_{result.result.type}")
+        with metrics.timed("apply_load_task"):
+            task = store.load_task(store.ObjectId(task_id_str))
         if task is None or task["status"] != "in_batch" or task["turn"] != int(turn_str):
             return  # already applied (restart replay) or stale
+        asyncio.current_task().set_name(f"{task['kind']} {task.get('word') or task['ref']}")  # for --profile
         if result.result.type == "succeeded":
-            blocks = sanitize_content(result.result.message.content)
+            message = result.result.message
+            usage = usage_of(message)
+            store.add_usage(round_usage, task["kind"], message.model, store.is_followup(task), usage)
+            task_usage.append((task["_id"], usage))
+            blocks = sanitize_content(message.content)
             try:
                 async with sem:
-                    await apply_result(run_id, task, blocks)
+                    with metrics.timed(f"apply_{task['kind']}"):
+                        await apply_result(run_id, task, blocks)
             except Exception:
                 logger.exception("Failed applying result for %s / %s", task["ref"], task.get("word"))
                 store.fail_task(task["_id"], "exception while applying result")
@@ -329,105 +603,368 @@ async def poll_and_apply_round(run_id: str, round_doc: dict) -> None:
             store.requeue_task(task["_id"], config.MAX_TASK_ATTEMPTS)
 
     started = time.time()
-    await asyncio.gather(*[apply_one(r) for r in results])
+    with metrics.timed("apply_results"):
+        await asyncio.gather(*[apply_one(r) for r in results])
     logger.info("Applied %d results in %.0fs", len(results), time.time() - started)
 
-    store.close_round(round_doc["_id"])
+    log_lookup_limiter()
+    with metrics.timed("apply_record_usage"):
+        store.record_task_usage(task_usage)
+    store.close_round(round_doc["_id"], io=store.take_io(), usage=round_usage, metrics=metrics.take())
+    if config.METRICS_FILE:
+        metrics.export(run_metrics(run_id), run_id, config.METRICS_FILE)
 
 
-async def submit_round(run_id: str) -> bool:
-    """Initialize any uninitialized resolve tasks, then submit all pending work
-    as one batch. Returns True if a batch was submitted."""
+def log_lookup_limiter() -> None:
+    """Record and log the Sefaria lookup limiter's state (see limiter.py)."""
+    stats = sefaria_limiter.stats()
+    for k in ("limit", "in_flight", "queued"):
+        metrics.gauge(f"lookup_{k}", stats[k])
+    logger.info("lookup limiter: %s", stats)
+    for name, window in tool_latency.items():
+        percentiles = window.summary()
+        for k, v in percentiles.items():
+            if v is not None:
+                metrics.gauge(f"lookup_{name}_{k}", v)
+        logger.info("%s latency: %s", name, percentiles)
+
+
+def run_metrics(run_id: str) -> dict:
+    """Every round's submit and apply metrics for a run, summed."""
+    return metrics.merge([r.get(k) for r in store.round_metrics(run_id)
+                          for k in ("submit_metrics", "apply_metrics")])
+
+
+async def initialize_resolve_tasks(run_id: str) -> None:
+    """
+    Initialize pending resolve tasks that have no params yet.
+
+    Under frequency scheduling, only one occurrence of a frequent word is initialized while
+    no determination for that word is underway; the rest stay uninitialized (held) until it
+    lands, when init_resolve_task turns them into cheap vet tasks against its association.
+    Words whose representative resolved without a determination (memo, rule, vetting) are
+    released in the same round.
+    """
     uninitialized = list(store.tasks.find({"run_id": run_id, "status": "pending",
                                            "kind": "resolve", "params": None}))
-    if uninitialized:
+    if not uninitialized:
+        return
+    if config.SCHEDULE != "frequency":
         logger.info("Initializing %d resolve tasks", len(uninitialized))
         await asyncio.gather(*[init_resolve_task(t) for t in uninitialized])
+        return
+
+    inventory = store.word_inventory(run_id)
+    underway = store.words_in_determination(run_id)
+    # Most frequent words first, so their representatives lead the batch.
+    uninitialized.sort(key=lambda t: -inventory.get(t["word"], 0))
+    first, rest = [], []
+    for t in uninitialized:
+        word = t["word"]
+        if t.get("vetted") or inventory.get(word, 0) < config.SCHEDULE_MIN_COUNT:
+            first.append(t)   # rejected its cached candidates, or not frequent: nothing to wait for
+        elif word in underway:
+            rest.append(t)
+        else:
+            first.append(t)
+            underway.add(word)
+    logger.info("Initializing %d resolve tasks", len(first))
+    await asyncio.gather(*[init_resolve_task(t) for t in first])
+
+    underway = store.words_in_determination(run_id)
+    released = [t for t in rest if t["word"] not in underway]
+    held = [t["_id"] for t in rest if t["word"] in underway]
+    if released:
+        await asyncio.gather(*[init_resolve_task(t) for t in released])
+    if held:
+        store.hold_tasks(held)
+    logger.info("frequency schedule: %d representatives, %d released, %d held",
+                len(first), len(released), len(held))
+
+
+async def submit_round(run_id: str) -> bool:
+    """Initialize any uninitialized resolve tasks, then submit all pending work
+    as one batch. Returns True if a batch was submitted."""
+    with metrics.timed("submit_init_resolve"):
+        await initialize_resolve_tasks(run_id)   # lookups queue on the shared Sefaria limiter
+    log_lookup_limiter()
 
-    pending = store.pending_tasks(run_id, config.MAX_REQUESTS_PER_BATCH)
-    pending = [t for t in pending if t.get("params")]
+    with metrics.timed("submit_load_pending"):
+        pending = store.pending_tasks(run_id, config.MAX_REQUESTS_PER_BATCH)
     if not pending:
         return False
 
     # Adaptive cache TTL: if the previous round overran the 5-minute window, write this
     # round at 1h so the entry survives to be read; otherwise 5m (cheaper write premium).
+    # Turnaround is a proxy; the previous round's actual cache reads are the check: if its
+    # follow-up turns mostly missed at 5m, the window is too short for this run.
     ttl = config.CACHE_TTL
     if config.ADAPTIVE_CACHE_TTL:
         prev = store.last_round_turnaround(run_id)
+        cache = store.last_round_cache(run_id)
         if prev is not None and prev > config.CACHE_SLOW_ROUND_SECONDS:
             ttl = "1h"
-        logger.info("cache ttl for this round: %s (prev round turnaround %s)",
-                    ttl, f"{prev:.0f}s" if prev is not None else "n/a")
+        elif cache and cache["ttl"] == "5m" and cache["hit_rate"] < config.CACHE_MIN_HIT_RATE:
+            ttl = "1h"
+        logger.info("cache ttl for this round: %s (prev round turnaround %s, follow-up cache hits %s)",
+                    ttl, f"{prev:.0f}s" if prev is not None else "n/a",
+                    f"{100 * cache['hit_rate']:.0f}% at {cache['ttl']}" if cache else "n/a")
 
     requests = []
-    payload = {"system": 0, "tools": 0, "text": 0, "tool_use": 0, "tool_result": 0}
+    # tool_result_deduped: chars that tool_result would carry without entry deduplication;
+    # reported alongside, not part of the request.
+    payload = {"system": 0, "tools": 0, "text": 0, "tool_use": 0, "tool_result": 0, "tool_result_deduped": 0}
+    by_model = {}
+    build_started = time.perf_counter()
+    task_ids = []
     for t in pending:
-        params = t["params"]
+        try:
+            params = store.build_params(t)
+        except LookupError as e:
+            store.fail_task(t["_id"], f"cannot build request: {e}")
+            logger.error("Task %s: cannot build request: %s", t["_id"], e)
+            continue
         if t["kind"] == "resolve":  # cache the replayed agent prefix; single-shot tasks gain nothing
             params = agent_core.add_prompt_caching(params, ttl=ttl)
-            for k, v in agent_core.measure_payload(params).items():
+            measured = agent_core.measure_payload(params)
+            for k, v in measured.items():
                 payload[k] += v
+            chars = sum(measured.values())
+            payload["tool_result_deduped"] += t.get("deduped_chars", 0)
+        else:
+            chars = sum(agent_core.measure_payload(params).values())
+        model = by_model.setdefault(params["model"], {"model": params["model"], "requests": 0, "chars": 0})
+        model["requests"] += 1
+        model["chars"] += chars
         requests.append({"custom_id": f"{t['_id']}_{t['turn']}", "params": params})
+        task_ids.append(t["_id"])
+    metrics.observe("submit_build_requests", time.perf_counter() - build_started)
+    if not requests:
+        return False
 
-    total = sum(payload.values())
+    sent = {k: v for k, v in payload.items() if k != "tool_result_deduped"}
+    total = sum(sent.values())
     if total:
-        logger.info("determination payload: %s",
-                    " ".join(f"{k}={100*v//total}%" for k, v in payload.items()))
-    batch = await resilient(lambda: client().messages.batches.create(requests=requests),
-                            "submit batch", attempts=6)
-    task_ids = [t["_id"] for t in pending]
-    store.mark_in_batch(task_ids, batch.id)
-    store.create_round(run_id, batch.id, task_ids, payload=payload)
+        logger.info("determination payload: %s (dedup saved %d chars of tool_result)",
+                    " ".join(f"{k}={100*v//total}%" for k, v in sent.items()),
+                    payload["tool_result_deduped"])
+    with metrics.timed("submit_create_batch"):
+        batch = await resilient(lambda: client().messages.batches.create(requests=requests),
+                                "submit batch", attempts=6)
+    with metrics.timed("submit_mark_in_batch"):
+        store.mark_in_batch(task_ids, batch.id)
+    metrics.count("requests_submitted", len(requests))
+    store.create_round(run_id, batch.id, task_ids, payload=payload, models=list(by_model.values()),
+                       io=store.take_io(), ttl=ttl, metrics=metrics.take(),
+                       settings={"apply_concurrency": config.APPLY_CONCURRENCY,
+                                 "max_requests_per_batch": config.MAX_REQUESTS_PER_BATCH})
     logger.info("Submitted batch %s with %d requests", batch.id, len(requests))
     return True
 
 
-async def run(run_id: str) -> None:
+async def process(run_id: str, ref_str: str, vtitle: str, force: bool = False, profile: bool = False) -> None:
+    """Seed (or finish seeding) and run at the same time: the first chunk of segments goes
+    out as the first batch while the rest of the range is still being read and cleaned."""
+    seeding = asyncio.create_task(asyncio.to_thread(seed, run_id, ref_str, vtitle, force))
+    await run(run_id, profile=profile, seeding=seeding)
+
+
+async def run(run_id: str, profile: bool = False, seeding: asyncio.Task | None = None) -> None:
     start = time.time()
-    while True:
-        # First, resume any in-flight batches (restart safety).
-        for round_doc in store.open_rounds(run_id):
-            logger.info("Resuming open batch %s", round_doc["batch_id"])
-            await poll_and_apply_round(run_id, round_doc)
+    profiler = None
+    if profile:
+        import profiling
+        profiler = profiling.Profiler(run_id)
+        profiler.start()
+        logger.info("Profiling to %s", profiler.out_dir)
+    try:
+        await _run_rounds(run_id, profiler, seeding)
+    finally:
+        if profiler:
+            profiler.stop()
+            logger.info("Profile: %d samples in %s", profiler.samples, profiler.out_dir)
+
+    logger.info("Run %s complete in %.0fs. Status: %s", run_id, time.time() - start, store.run_status(run_id))
 
+
+async def _run_rounds(run_id: str, profiler=None, seeding: asyncio.Task | None = None) -> None:
+    n = 0
+    while True:
+        # First, resume any in-flight batches (restart safety). They end independently, so
+        # poll them concurrently and apply each as soon as it ends. (Their metrics and io
+        # snapshots are taken at each close, so overlapping rounds share attribution.)
+        open_rounds = store.open_rounds(run_id)
+        if open_rounds:
+            if profiler:
+                profiler.begin(f"{n:03d}-apply")
+            for round_doc in open_rounds:
+                logger.info("Resuming open batch %s", round_doc["batch_id"])
+            await asyncio.gather(*[poll_and_apply_round(run_id, r) for r in open_rounds])
+
+        # Attempts that submit nothing (waiting on seeding) stay in the same phase: a new
+        # one starts only when a round actually went out or came back.
+        if profiler and profiler.label != f"{n + 1:03d}-submit":
+            profiler.begin(f"{n + 1:03d}-submit")
+        still_seeding = seeding is not None and not seeding.done()
         submitted = await submit_round(run_id)
-        if not submitted:
+        if submitted:
+            n += 1
+        else:
+            if still_seeding:
+                # Seeding is still reading and cleaning text: submit as soon as a chunk lands.
+                await asyncio.wait({seeding}, timeout=1)
+                continue
             if not store.has_work(run_id):
                 break
             # tasks stuck without params or in_batch without an open round shouldn't happen;
             # avoid a hot loop if they do
             logger.warning("Work remains but nothing submittable; status: %s", store.run_status(run_id))
             await asyncio.sleep(config.POLL_INTERVAL_SECONDS)
-
-    logger.info("Run %s complete in %.0fs. Status: %s", run_id, time.time() - start, store.run_status(run_id))
+    if seeding is not None:
+        await seeding   # re-raises a seeding failure once the seeded part has run
 
 
 # --- CLI ---------------------------------------------------------------------
 
 def main():
     parser = argparse.ArgumentParser(description="Batch dictionary resolver")
-    parser.add_argument("command", choices=["seed", "run", "process", "status", "clear", "retry-failed"])
+    parser.add_argument("command", choices=["seed", "run", "process", "status", "clear", "retry-failed",
+                                            "render-entries", "train-compression", "usage", "simulate",
+                                            "changes", "warm-cache", "prefilter-eval"])
     parser.add_argument("ref", nargs="?", help="Sefaria ref (for seed/process)")
     parser.add_argument("--run-id", help="Run identifier (defaults to the ref)")
     parser.add_argument("--vtitle", default=VTITLE)
+    parser.add_argument("--force", action="store_true",
+                        help="Re-determine words even if already resolved in this exact context")
+    parser.add_argument("--profile", action="store_true",
+                        help="run/process: sampling profile and event-loop stalls per round (profiling.py)")
+    sim = parser.add_argument_group("simulate", "replay a finished run's rounds under other settings")
+    sim.add_argument("--from", dest="reference", metavar="RUN_ID",
+                     help="Instead estimate the (seeded) run from this finished reference run")
+    sim.add_argument("--ttl", choices=["5m", "1h"], default=config.CACHE_TTL)
+    sim.add_argument("--no-adaptive-ttl", action="store_true")
+    sim.add_argument("--slow-round", type=float, default=config.CACHE_SLOW_ROUND_SECONDS)
+    sim.add_argument("--max-requests", type=int, default=config.MAX_REQUESTS_PER_BATCH)
+    sim.add_argument("--apply-concurrency", type=int, default=config.APPLY_CONCURRENCY)
+    parser.add_argument("--dry-run", action="store_true",
+                        help="changes / warm-cache: report only, write nothing")
+    parser.add_argument("--metrics", action="store_true",
+                        help="status: per-phase timings and counters instead of the run reports")
     args = parser.parse_args()
 
+    if args.command == "render-entries":
+        import renderings
+        from tools import lexicon_names
+        for name, row in renderings.precompute(lexicon_names).items():
+            print(name, row)
+        return
+    if args.command == "train-compression":
+        # Samples shaped like the tool results and prompts we store: entry dicts as JSON.
+        import compress
+        import json
+        import renderings
+        samples = [json.dumps({"headword": d["headword"], "parent_lexicon": d["parent_lexicon"],
+                               "content": d["text"]}, ensure_ascii=False).encode("utf-8")
+                   for d in renderings.renderings_collection.aggregate([{"$sample": {"size": 20000}}])]
+        if len(samples) < compress.MIN_TRAINING_SAMPLES:
+            raise SystemExit(f"Only {len(samples)} stored entry renderings to train on (need "
+                             f"{compress.MIN_TRAINING_SAMPLES}); run `python resolver.py render-entries` first.")
+        before = store.record_storage_baseline("before dictionary training")
+        dict_id = compress.train_dictionary(samples)
+        print(f"Trained compression dictionary {dict_id} on {len(samples)} entries")
+        print(f"batch_tasks before: {before['count']} tasks, {before['avg_doc_bytes']} bytes/task; "
+              "`status` reports the change as tasks are written with it")
+        return
+
+    if args.command == "warm-cache":
+        import corpus
+        import warmstart
+        from tools import lexicon_names
+        before = None
+        if args.ref:   # coverage of a test ref (e.g. a tractate) before and after
+            segments = [text for chunk in corpus.segments(args.ref, args.vtitle) for _, text in chunk]
+            before = warmstart.coverage(segments)
+        stats, imported = warmstart.import_wordforms(lexicon_names, dry_run=args.dry_run)
+        print(stats)
+        if before is not None:
+            print("before:", before)
+            print("after: ", warmstart.coverage(segments, imported if args.dry_run else None))
+        return
+
     run_id = args.run_id or args.ref
     if run_id is None:
         parser.error("need a ref or --run-id")
 
+    if args.force and args.command in ("run", "process"):
+        n = store.force_pending(run_id)
+        if n:
+            logger.info("Forcing %d pending tasks past the memo", n)
+
     if args.command == "seed":
-        seed(run_id, args.ref, args.vtitle)
+        seed(run_id, args.ref, args.vtitle, force=args.force)
     elif args.command == "run":
-        asyncio.run(run(run_id))
+        asyncio.run(run(run_id, profile=args.profile))
     elif args.command == "process":
-        if store.tasks.count_documents({"run_id": run_id}, limit=1) == 0:
-            seed(run_id, args.ref, args.vtitle)
-        else:
-            logger.info("Run %s already seeded; resuming", run_id)
-        asyncio.run(run(run_id))
+        if args.ref is None:
+            logger.info("No ref given; resuming run %s as seeded", run_id)
+            asyncio.run(run(run_id, profile=args.profile))
+        else:   # seeding skips the segments the run already has
+            asyncio.run(process(run_id, args.ref, args.vtitle, force=args.force, profile=args.profile))
+    elif args.command == "status" and args.metrics:
+        snapshot = run_metrics(run_id)
+        for row in metrics.summary(snapshot):
+            print(row)
+        print(snapshot["counters"])
+        for r in store.round_metrics(run_id):
+            phases = metrics.summary(metrics.merge([r.get("submit_metrics"), r.get("apply_metrics")]))
+            print(r["batch_id"], " ".join(f"{p['phase']}={p['total_s']}s" for p in phases[:6]))
     elif args.command == "status":
         print(store.run_status(run_id))
+        print(store.resolution_report(run_id))
+        cascade = store.cascade_report(run_id)
+        if cascade:
+            print(cascade)
+        schedule = store.schedule_report(run_id, config.SCHEDULE_MIN_COUNT)
+        if schedule:
+            print(schedule)
+        print(store.turns_report(run_id))
+        print(store.lookup_report(run_id))
+        prefilter = store.prefilter_report(run_id)
+        if prefilter:
+            print(prefilter)
+        for row in store.dedup_report(run_id):
+            print(row)
+        for row in store.io_report(run_id):
+            print(row)
+        print(store.storage_report())
+    elif args.command == "usage":
+        for k, v in store.usage_report(run_id, config.MODEL_PRICES, config.BATCH_DISCOUNT).items():
+            print(f"{k}: {v}")
+    elif args.command == "simulate":
+        import simulate
+        if args.reference:
+            result = simulate.estimate(run_id, args.reference)
+        else:
+            result = simulate.replay(simulate.recorded_rounds(run_id), ttl=args.ttl,
+                                     adaptive=config.ADAPTIVE_CACHE_TTL and not args.no_adaptive_ttl,
+                                     slow_round=args.slow_round, max_requests=args.max_requests,
+                                     apply_concurrency=args.apply_concurrency)
+        for k, v in result.items():
+            print(f"{k}: {v}")
+    elif args.command == "prefilter-eval":
+        # Replays a run vetted with the full candidate lists (DICTRES_VET_TOP_K=0).
+        import corpus
+        import similarity
+        print(similarity.evaluate(store.vetted_tasks(run_id), get_cached_associations,
+                                  lambda r: corpus.segment_text(r, args.vtitle)))
+    elif args.command == "changes":
+        import changes
+        plan = changes.plan(args.vtitle)
+        for k, v in changes.report(plan).items():
+            print(f"{k}: {v}")
+        if not args.dry_run:
+            n = changes.seed(run_id, plan, create_word_task)
+            logger.info("Seeded %d affected contexts into run %s; baseline updated", n, run_id)
     elif args.command == "clear":
         store.clear_run(run_id)
         print(f"Cleared run {run_id}")
@@ -435,10 +972,14 @@ def main():
         # Restart failed resolve tasks from scratch (fresh prompt, turn 0).
         res = store.tasks.update_many(
             {"run_id": run_id, "status": "failed", "kind": "resolve"},
-            {"$set": {"status": "pending", "params": None, "turn": 0, "attempts": 0,
-                      "error": None, "updated_at": store.now()}})
+            {"$set": {"status": "pending", "params": None, "messages": None, "turn": 0, "attempts": 0,
+                      "error": None, "updated_at": store.now()},
+             "$unset": {"cascade": "", "lookups": "", "empty_streak": "", "forced_conclusion": "",
+                        "shown_entries": "", "deduped_chars": "", "determination_start": ""}})
         logger.info("Requeued %d failed tasks", res.modified_count)
-        asyncio.run(run(run_id))
+        if args.force:
+            store.force_pending(run_id)
+        asyncio.run(run(run_id, profile=args.profile))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,88 @@
+"""
+Rule-based pre-resolution: deterministic, non-LLM answers for words whose dictionary
+association is unambiguous from the lookup alone.
+
+Each rule sees the words API result for (word, ref) and the word's cached associations
+and either returns the association to record or None. Rules are tried in the order
+configured in config.PRERESOLVE_RULES; the first hit wins. A word no rule covers goes
+on to vetting or a full determination as before.
+
+The rules run on words headed for a full determination, which makes the words API lookup
+anyway. Only a configured rule that reads the cache (CACHE_RULES) has words with cached
+candidates looked up before vetting too - one extra lookup per such word.
+"""
+from __future__ import annotations
+from typing import Callable, Dict, List, Optional, Tuple
+
+from models import LexRef, LexiconAssociations
+import config
+
+# Dictionaries whose domain is each text language, for the language_match rule.
+LANGUAGE_LEXICONS = {
+    "aramaic": {"Jastrow Dictionary", "BDB Aramaic Dictionary"},
+    "hebrew": {"Klein Dictionary", "BDB Dictionary", "Ben Yehuda Dictionary"},
+}
+
+
+def _lexrefs(entries: List[dict]) -> List[LexRef]:
+    return list(dict.fromkeys(LexRef(headword=e["headword"], lexicon_name=e["parent_lexicon"])
+                              for e in entries))
+
+
+def single_candidate(word: str, possible: List[dict], associated: List[dict],
+                     cached: List[LexiconAssociations]) -> Optional[List[LexRef]]:
+    """Exactly one entry across all dictionaries matches the word form."""
+    lexrefs = _lexrefs(associated + possible)
+    return lexrefs if len(lexrefs) == 1 else None
+
+
+def language_match(word: str, possible: List[dict], associated: List[dict],
+                   cached: List[LexiconAssociations]) -> Optional[List[LexRef]]:
+    """Exactly one entry comes from a dictionary of the text's language (config.TEXT_LANGUAGE)."""
+    lexicons = LANGUAGE_LEXICONS.get(config.TEXT_LANGUAGE, set())
+    lexrefs = [lr for lr in _lexrefs(associated + possible) if lr.lexicon_name in lexicons]
+    return lexrefs if len(lexrefs) == 1 else None
+
+
+def legacy_agrees_with_cache(word: str, possible: List[dict], associated: List[dict],
+                             cached: List[LexiconAssociations]) -> Optional[List[LexRef]]:
+    """The entries already associated with this ref are exactly a previously determined association."""
+    lexrefs = _lexrefs(associated)
+    if not lexrefs:
+        return None
+    for assoc in cached:
+        # An association imported from the legacy WordForms would trivially agree with them.
+        if assoc.source is None and set(assoc.lexrefs) == set(lexrefs):
+            return assoc.lexrefs
+    return None
+
+
+RULES: Dict[str, Callable] = {
+    "single_candidate": single_candidate,
+    "language_match": language_match,
+    "legacy_agrees_with_cache": legacy_agrees_with_cache,
+}
+
+# A misspelt name would otherwise switch its rule off without a word.
+_unknown = [name for name in config.PRERESOLVE_RULES if name not in RULES]
+if _unknown:
+    raise ValueError(f"DICTRES_PRERESOLVE_RULES: unknown rule(s) {', '.join(_unknown)}; "
+                     f"known: {', '.join(RULES)}")
+
+
+# Rules that can only hit on a word with cached associations.
+CACHE_RULES = {"legacy_agrees_with_cache"}
+
+
+def rules_read_cache() -> bool:
+    return bool(CACHE_RULES & set(config.PRERESOLVE_RULES))
+
+
+def preresolve(word: str, possible: List[dict], associated: List[dict],
+               cached: List[LexiconAssociations]) -> Optional[Tuple[str, List[LexRef]]]:
+    """Return (rule name, association) for the first configured rule that covers the word, or None."""
+    for name in config.PRERESOLVE_RULES:
+        lexrefs = RULES[name](word, possible, associated, cached)
+        if lexrefs:
+            return name, lexrefs
+    return None
@@ -0,0 +1,167 @@
+"""
+Context-similarity prefilter for vetting candidates.
+
+A common word accumulates many cached associations, and build_vetting_candidates would
+render and send every one. prefilter() keeps the VET_TOP_K whose recorded contexts look
+most like this occurrence: the words around it in this segment against the words around
+it in up to VET_CONTEXT_REFS of each association's refs, as TF-IDF vectors over
+character 3-grams of the consonantal text (NumPy, CPU only), scored by the best cosine
+match. The kept candidates stay in cache order, so the vetting prompt reads as before;
+only the tail it would rarely pick is cut, before any entry is loaded or rendered.
+
+With VET_AUTO_ACCEPT set, a determined association whose context is near-identical (score
+at least VET_AUTO_ACCEPT and VET_AUTO_MARGIN above the runner-up) is accepted without a
+vetting call (task result `via: similarity`).
+
+evaluate() replays a finished run's vet tasks through the prefilter: how often the
+candidate vetting chose would have survived (recall@k), the candidates and rendered chars
+it would have cut, and how auto-acceptance would have agreed with vetting.
+"""
+from __future__ import annotations
+from collections import Counter
+from typing import Callable, Dict, List, Optional, Tuple
+
+import config
+from models import LexiconAssociations
+from morphology import consonants
+from util import split_hebrew_text
+
+NGRAM = 3
+
+
+def window(text: str, word: str, radius: int) -> str:
+    """Up to ``radius`` words either side of the word's first occurrence (all of ``text``
+    if it doesn't occur)."""
+    tokens = split_hebrew_text(text)
+    target = consonants(word)
+    for i, t in enumerate(tokens):
+        if consonants(t) == target:
+            return " ".join(tokens[max(0, i - radius):i + radius + 1])
+    return " ".join(tokens)
+
+
+def ngrams(text: str) -> Counter:
+    grams = Counter()
+    for token in consonants(text).split():
+        padded = f" {token} "
+        grams.update(padded[i:i + NGRAM] for i in range(max(1, len(padded) - NGRAM + 1)))
+    return grams
+
+
+def tfidf(docs: List[str]):
+    """Row-normalized TF-IDF matrix (sublinear tf, smoothed idf) of the docs' n-grams."""
+    import numpy as np   # loaded by the first word that needs ranking, not at startup
+    counts = [ngrams(d) for d in docs]
+    vocab: Dict[str, int] = {}
+    for c in counts:
+        for g in c:
+            vocab.setdefault(g, len(vocab))
+    m = np.zeros((len(docs), max(1, len(vocab))), dtype=np.float32)
+    for row, c in enumerate(counts):
+        for g, n in c.items():
+            m[row, vocab[g]] = n
+    df = (m > 0).sum(axis=0)
+    m = np.log1p(m) * (np.log((1 + len(docs)) / (1 + df)) + 1)
+    norms = np.linalg.norm(m, axis=1, keepdims=True)
+    return m / np.where(norms == 0, 1, norms)
+
+
+def scores(segment: str, word: str, contexts: List[List[str]]) -> List[float]:
+    """Per candidate, the best cosine similarity between this occurrence's window and the
+    windows of its contexts (0 for a candidate with no context text)."""
+    radius = config.VET_CONTEXT_WORDS
+    docs = [window(segment, word, radius)]
+    owner = []
+    for i, texts in enumerate(contexts):
+        for t in texts:
+            if t:
+                docs.append(window(t, word, radius))
+                owner.append(i)
+    best = [0.0] * len(contexts)
+    if not owner:
+        return best
+    m = tfidf(docs)
+    sims = m[1:] @ m[0]
+    for i, s in zip(owner, sims.tolist()):
+        best[i] = max(best[i], s)
+    return best
+
+
+def rank(segment: str, word: str, cached: List[LexiconAssociations],
+         context_of: Callable[[str], str], ref: Optional[str] = None) -> List[float]:
+    """scores() over each association's most recent refs, other than ``ref`` itself."""
+    contexts = [[context_of(r) for r in [r for r in a.refs if r != ref][-config.VET_CONTEXT_REFS:]]
+                for a in cached]
+    return scores(segment, word, contexts)
+
+
+def prefilter(word: str, segment: str, cached: List[LexiconAssociations],
+              context_of: Callable[[str], str], top_k: int = config.VET_TOP_K,
+              auto_accept: float = config.VET_AUTO_ACCEPT, ref: Optional[str] = None
+              ) -> Tuple[List[LexiconAssociations], dict, Optional[LexiconAssociations]]:
+    """(associations to vet, {"from", "kept", "top_score"} or {} when nothing was scored,
+    the association to accept outright or None)."""
+    rank_needed = 0 < top_k < len(cached)
+    if not cached or not (rank_needed or auto_accept > 0):
+        return cached, {}, None
+    s = rank(segment, word, cached, context_of, ref)
+    order = sorted(range(len(cached)), key=lambda i: -s[i])   # stable: ties keep cache order
+    auto = None
+    if auto_accept > 0:
+        top = order[0]
+        runner_up = s[order[1]] if len(order) > 1 else 0.0
+        if cached[top].source is None and cached[top].lexrefs and s[top] >= auto_accept \
+                and s[top] - runner_up >= config.VET_AUTO_MARGIN:
+            auto = cached[top]
+    kept = sorted(order[:top_k]) if rank_needed else list(range(len(cached)))
+    info = {"from": len(cached), "kept": len(kept), "top_score": round(s[order[0]], 3)}
+    return [cached[i] for i in kept], info, auto
+
+
+def evaluate(vet_tasks: List[dict], cached_of: Callable[[str], List[LexiconAssociations]],
+             context_of: Callable[[str], str], top_k: int = config.VET_TOP_K,
+             auto_accept: float = config.VET_AUTO_ACCEPT) -> dict:
+    """The prefilter replayed over vet tasks that were sent every candidate. A task's
+    candidates are matched to the word's cached associations by their entries; the task's
+    own ref, recorded there once it resolved, is not used as a context."""
+    out = {"vet_tasks": 0, "ranked": 0, "selected": 0, "selected_kept": 0,
+           "candidates": 0, "candidates_kept": 0, "chars": 0, "chars_kept": 0,
+           "auto_accepted": 0, "auto_agreed": 0}
+    for task in vet_tasks:
+        cands = task.get("candidates") or []
+        if task.get("prefiltered") or not cands:
+            continue   # already cut: the full list isn't known
+        out["vet_tasks"] += 1
+        by_entries = {frozenset((lr.headword, lr.lexicon_name) for lr in a.lexrefs): a
+                      for a in cached_of(task["word"])}
+        assocs = [by_entries.get(frozenset((lr["headword"], lr["lexicon_name"]) for lr in c["lexrefs"]))
+                  or LexiconAssociations(lexrefs=[], refs=[]) for c in cands]
+        kept, info, auto = prefilter(task["word"], task["segment"], assocs, context_of, top_k, auto_accept,
+                                     ref=task["ref"])
+        kept_ids = {id(a) for a in kept}
+        chars = [len(c.get("contents") or c.get("reasoning") or "") for c in cands]
+        out["candidates"] += len(cands)
+        out["candidates_kept"] += len(kept)
+        out["chars"] += sum(chars)
+        out["chars_kept"] += sum(n for a, n in zip(assocs, chars) if id(a) in kept_ids)
+        out["ranked"] += bool(info) and info["kept"] < info["from"]
+        result = task.get("result") or {}
+        idx = result.get("selected_index")
+        if result.get("via") == "vetting" and isinstance(idx, int) and idx < len(assocs):
+            choice = assocs[idx]
+            out["selected"] += 1
+            out["selected_kept"] += id(choice) in kept_ids
+        elif task.get("vetted"):
+            choice = None   # vetting rejected every candidate
+        else:
+            continue   # no verdict yet
+        if auto is not None:
+            out["auto_accepted"] += 1
+            out["auto_agreed"] += auto is choice
+    return {
+        **out,
+        f"recall_at_{top_k}": f"{100 * out['selected_kept'] / out['selected']:.1f}%" if out["selected"] else "n/a",
+        "chars_cut": f"{100 * (1 - out['chars_kept'] / out['chars']):.1f}%" if out["chars"] else "n/a",
+        "auto_accept_precision": (f"{100 * out['auto_agreed'] / out['auto_accepted']:.1f}%"
+                                  if out["auto_accepted"] else "n/a"),
+    }
@@ -0,0 +1,218 @@
+"""
+Run-cost and latency simulator over recorded rounds.
+
+replay() re-runs a finished run's rounds - their batch turnarounds, apply and submit
+times, payload and recorded token usage - under other driver settings, and estimates the
+cost, prompt-cache hit rate and wall clock the run would have had:
+  - CACHE_TTL / ADAPTIVE_CACHE_TTL / CACHE_SLOW_ROUND_SECONDS: each round's TTL is chosen
+    as the driver would; its follow-up reads hit when the gap since the previous round's
+    write (half of each turnaround, plus the apply and submit in between) is within the
+    TTL of that write. Missed reads are repriced as cache writes.
+  - MAX_REQUESTS_PER_BATCH: an oversized round is split into sequential batches, each
+    with the turnaround a linear fit of the run's (requests, turnaround) predicts.
+  - APPLY_CONCURRENCY: the lookup share of apply time (tools_* phases) scales inversely
+    with concurrency; the synchronous rest doesn't.
+
+estimate() pre-estimates a seeded, unsubmitted run from a finished reference run: words
+per segment, the mix of resolution paths, determination turns and cost per unit.
+
+    python resolver.py simulate --run-id "Sanhedrin 63b" --ttl 1h --apply-concurrency 32
+    python resolver.py simulate --run-id "Sanhedrin 64a" --from "Sanhedrin 63b"
+
+Models, not measurements: use them to rank settings, then confirm with a real run.
+"""
+from __future__ import annotations
+import math
+from typing import List, Optional
+
+import config
+import store
+from util import split_hebrew_text
+
+TTL_SECONDS = {"5m": 300, "1h": 3600}
+WRITE_MULTIPLIER = {"5m": 1.25, "1h": 2.0}
+READ_MULTIPLIER = 0.1
+
+
+def _timer(snapshot: Optional[dict], prefix: str) -> float:
+    return sum(h["sum"] for name, h in ((snapshot or {}).get("timers") or {}).items() if name.startswith(prefix))
+
+
+def _round_profile(r: dict) -> dict:
+    """What a recorded round spent where, with what token usage."""
+    apply_s = _timer(r.get("apply_metrics"), "apply_results")
+    download = _timer(r.get("apply_metrics"), "results_download")
+    total = (r["ended_at"] - r["created_at"]).total_seconds()
+    usage = r.get("usage") or {"by_model": [], "by_kind": {}, "followups": 0, "followup_hits": 0}
+    return {
+        "requests": len(r["task_ids"]),
+        "processing": max(0.0, total - apply_s - download),
+        "apply": apply_s + download,
+        "lookups": _timer(r.get("apply_metrics"), "tools_"),
+        "submit": _timer(r.get("submit_metrics"), "submit_"),
+        "ttl": r.get("ttl") or config.CACHE_TTL,
+        "concurrency": (r.get("settings") or {}).get("apply_concurrency", config.APPLY_CONCURRENCY),
+        "usage": usage,
+    }
+
+
+def _fit(points: List[tuple]) -> tuple:
+    """Least-squares (a, b) for turnaround = a + b * requests; flat mean for too few points."""
+    if len(points) < 3 or len({x for x, _ in points}) < 2:
+        mean = sum(y for _, y in points) / len(points) if points else 0.0
+        return mean, 0.0
+    n = len(points)
+    mx = sum(x for x, _ in points) / n
+    my = sum(y for _, y in points) / n
+    b = sum((x - mx) * (y - my) for x, y in points) / sum((x - mx) ** 2 for x, _ in points)
+    return my - b * mx, max(0.0, b)
+
+
+def _price(model: str) -> tuple:
+    return config.MODEL_PRICES.get(model, config.MODEL_PRICES.get(config.DETERMINATION_MODEL, (0.0, 0.0)))
+
+
+def _round_cost(usage: dict, reads_kept: float, ttl: str) -> tuple:
+    """Cost of a round's usage with only ``reads_kept`` (0..1) of its potential cache reads
+    hitting, writes at ``ttl``. Returns (dollars, tokens read, prompt tokens)."""
+    hit_rate = usage["followup_hits"] / usage["followups"] if usage.get("followups") else 1.0
+    dollars = read_total = prompt_total = 0.0
+    for m in usage["by_model"]:
+        p_in, p_out = _price(m["model"])
+        reads = m.get("cache_read_input_tokens", 0)
+        # Reads the round would have made had every follow-up hit; recorded misses were re-written.
+        potential = reads / hit_rate if hit_rate else reads
+        missed_recorded = potential - reads
+        writes = max(0.0, m.get("cache_creation_input_tokens", 0) - missed_recorded)
+        kept = potential * reads_kept
+        writes += potential - kept
+        dollars += (m.get("input_tokens", 0) * p_in + m.get("output_tokens", 0) * p_out
+                    + writes * p_in * WRITE_MULTIPLIER[ttl] + kept * p_in * READ_MULTIPLIER)
+        read_total += kept
+        prompt_total += m.get("input_tokens", 0) + writes + kept
+    return config.BATCH_DISCOUNT * dollars / 1_000_000, read_total, prompt_total
+
+
+def _recorded_cost(usage: dict) -> tuple:
+    dollars = reads = prompt = 0.0
+    for m in usage["by_model"]:
+        cost = store.usage_cost(m["model"], m, config.MODEL_PRICES, config.BATCH_DISCOUNT)
+        dollars += cost or 0.0
+        reads += m.get("cache_read_input_tokens", 0)
+        prompt += (m.get("input_tokens", 0) + m.get("cache_creation_input_tokens", 0)
+                   + m.get("cache_read_input_tokens", 0))
+    return dollars, reads, prompt
+
+
+def recorded_rounds(run_id: str) -> List[dict]:
+    return [_round_profile(r) for r in store.rounds.find({"run_id": run_id, "status": "ended"}).sort("created_at", 1)]
+
+
+def replay(rounds: List[dict], ttl: str, adaptive: bool, slow_round: float,
+           max_requests: int, apply_concurrency: int) -> dict:
+    """Cost, cache hit rate and wall clock of recorded rounds under the given settings,
+    next to what was recorded."""
+    a, b = _fit([(r["requests"], r["processing"]) for r in rounds])
+    actual = {"cost": 0.0, "reads": 0.0, "prompt": 0.0, "wall": 0.0}
+    sim = {"cost": 0.0, "reads": 0.0, "prompt": 0.0, "wall": 0.0, "batches": 0, "ttl_1h_rounds": 0}
+    prev = None   # (processing, apply, ttl, hit) of the previous simulated round
+    for r in rounds:
+        cost, reads, prompt = _recorded_cost(r["usage"])
+        actual["cost"] += cost
+        actual["reads"] += reads
+        actual["prompt"] += prompt
+        actual["wall"] += r["submit"] + r["processing"] + r["apply"]
+
+        chunks = max(1, math.ceil(r["requests"] / max_requests))
+        if chunks == 1:
+            processing = r["processing"]
+        else:   # scale the recorded turnaround by the fit's ratio for the smaller batch
+            predicted = a + b * r["requests"]
+            ratio = (a + b * r["requests"] / chunks) / predicted if predicted else 1.0
+            processing = r["processing"] * ratio * chunks
+        sync = max(0.0, r["apply"] - r["lookups"] / r["concurrency"])
+        apply = sync + r["lookups"] / apply_concurrency
+
+        round_ttl = ttl
+        if adaptive and prev is not None and (prev[0] > slow_round or (prev[2] == "5m" and not prev[3])):
+            round_ttl = "1h"
+        hit = True
+        if prev is not None:
+            gap = prev[0] / 2 + prev[1] + r["submit"] + processing / chunks / 2
+            hit = gap <= TTL_SECONDS[prev[2]]
+        cost, reads, prompt = _round_cost(r["usage"], 1.0 if hit else 0.0, round_ttl)
+        sim["cost"] += cost
+        sim["reads"] += reads
+        sim["prompt"] += prompt
+        sim["wall"] += r["submit"] + processing + apply
+        sim["batches"] += chunks
+        sim["ttl_1h_rounds"] += round_ttl == "1h"
+        prev = (processing / chunks, apply, round_ttl, hit)
+
+    def summary(d: dict) -> dict:
+        return {"cost": round(d["cost"], 4),
+                "cache_hit_rate": f"{100 * d['reads'] / d['prompt']:.1f}%" if d["prompt"] else "n/a",
+                "wall_clock_s": round(d["wall"]),
+                **{k: d[k] for k in ("batches", "ttl_1h_rounds") if k in d}}
+    return {"rounds": len(rounds), "recorded": summary(actual), "simulated": summary(sim),
+            "turnaround_fit": f"{a:.0f}s + {b:.3f}s/request"}
+
+
+def _segment_words(run_id: str) -> tuple:
+    segments = list(store.tasks.find({"run_id": run_id, "kind": "phrases"}, {"segment": 1}))
+    return len(segments), sum(len(split_hebrew_text(s["segment"])) for s in segments)
+
+
+# For rounds recorded before usage was split by kind and model: each kind at its configured model.
+KIND_MODELS = {"phrases": config.PHRASE_MODEL, "vet": config.VETTING_MODEL, "resolve": config.DETERMINATION_MODEL}
+
+
+def _kind_costs(run_id: str) -> dict:
+    """Dollar cost per kind of a run's recorded usage, each priced at the model that served
+    it (a cascade's cheap turns at the cheap model)."""
+    out = {}
+    for r in store.rounds.find({"run_id": run_id, "usage": {"$ne": None}}, {"usage": 1}):
+        u = r["usage"]
+        rows = u.get("by_kind_model")
+        if rows is None:
+            rows = [{**totals, "kind": kind, "model": KIND_MODELS.get(kind, config.DETERMINATION_MODEL)}
+                    for kind, totals in u["by_kind"].items()]
+        for row in rows:
+            cost = store.usage_cost(row["model"], row, config.MODEL_PRICES, config.BATCH_DISCOUNT)
+            out[row["kind"]] = out.get(row["kind"], 0.0) + (cost or 0.0)
+    return out
+
+
+def estimate(run_id: str, reference_run_id: str) -> dict:
+    """Cost, rounds and wall clock of a seeded run, from a finished reference run's rates."""
+    ref_segments, ref_split = _segment_words(reference_run_id)
+    segments, split = _segment_words(run_id)
+    if not ref_segments or not ref_split:
+        raise ValueError(f"reference run {reference_run_id} has no seeded segments")
+    ref_words = store.tasks.count_documents({"run_id": reference_run_id, "kind": {"$in": ["vet", "resolve"]}})
+    words = split * ref_words / ref_split   # phrases add words; split words dedupe per segment
+
+    cost_per = {}
+    for kind, cost in _kind_costs(reference_run_id).items():
+        unit = ref_segments if kind == "phrases" else ref_words
+        cost_per[kind] = cost / unit if unit else 0.0
+    cost = segments * cost_per.get("phrases", 0.0) + words * (cost_per.get("vet", 0.0) + cost_per.get("resolve", 0.0))
+
+    turns = list(store.tasks.aggregate([
+        {"$match": {"run_id": reference_run_id, "kind": "resolve", "result.via": "determination"}},
+        {"$group": {"_id": None, "n": {"$sum": 1}, "turns": {"$sum": {"$add": ["$turn", 1]}}}}]))
+    rounds = recorded_rounds(reference_run_id)
+    scale = words / ref_words if ref_words else 1.0
+    a, b = _fit([(r["requests"], r["processing"]) for r in rounds])
+    wall = sum(r["submit"] + a + b * r["requests"] * scale + r["apply"] * scale for r in rounds)
+    return {
+        "segments": segments,
+        "words_estimated": round(words),
+        "resolution_mix": store.resolution_report(reference_run_id)["resolved_by"],
+        "mean_determination_turns": round(turns[0]["turns"] / turns[0]["n"], 2) if turns else None,
+        "cost_estimated": round(cost, 2),
+        "cost_per_segment": round(cost / segments, 4) if segments else None,
+        "rounds_estimated": len(rounds),
+        "wall_clock_estimated_s": round(wall),
+        "reference": {"run_id": reference_run_id, "segments": ref_segments, "words": ref_words},
+    }
@@ -2,53 +2,175 @@
 Mongo persistence for the batch driver.
 
 Collections (in the same `Lexicon` DB the cache and log already use):
-  batch_tasks  - one doc per unit of LLM work (phrase extraction / vet / resolve)
-  batch_rounds - one doc per submitted provider batch, for restart-safe polling
+  batch_tasks     - one doc per unit of LLM work (phrase extraction / vet / resolve)
+  batch_rounds    - one doc per submitted provider batch, for restart-safe polling
+  batch_templates - the static part of request params (model, system, tools, ...), interned
 
 Task lifecycle:
   pending -> in_batch -> (applied, back to pending for another turn | done | failed)
+
+Request params are stored split: the task's `params` holds a template reference plus
+per-task overrides (e.g. an escalated model), and the conversation lives in the task's
+`messages` array, which each turn extends with a $push. Full params are rebuilt with
+build_params() at submission, so a turn writes only its new messages.
+
+Bulky fields - prompt text and tool results in `messages`, vetting `candidates`, a
+completed task's `result.determination` - are stored compressed (compress.py) and
+decoded transparently by pending_tasks(), load_task() and build_params().
 """
 from __future__ import annotations
 import datetime
+import hashlib
+import json
 from typing import List, Optional
 
+import bson
 from bson import ObjectId
-from sefaria.system.database import client
-
-db = client["Lexicon"]
-tasks = db["batch_tasks"]
-rounds = db["batch_rounds"]
+from pymongo import UpdateOne
+from compress import pack, unpack, pack_messages, unpack_messages
+import compress
+import orm
 
-tasks.create_index([("run_id", 1), ("status", 1)])
-rounds.create_index([("run_id", 1), ("status", 1)])
+tasks = orm.collection("Lexicon", "batch_tasks", indexes=[([("run_id", 1), ("status", 1)], {})])
+rounds = orm.collection("Lexicon", "batch_rounds", indexes=[([("run_id", 1), ("status", 1)], {})])
+templates = orm.collection("Lexicon", "batch_templates")
+snapshots = orm.collection("Lexicon", "storage_snapshots")   # batch_tasks sizes before a compression change
 
 
 def now() -> datetime.datetime:
     return datetime.datetime.now(datetime.timezone.utc)
 
 
-def create_task(run_id: str, kind: str, ref: str, segment: str, word: Optional[str] = None,
-                params: Optional[dict] = None, extra: Optional[dict] = None) -> ObjectId:
+# BSON bytes moved by task reads/writes since the last take_io(), recorded per round.
+io = {"read": 0, "written": 0}
+
+
+def _wrote(doc: dict) -> None:
+    io["written"] += len(bson.encode(doc))
+
+
+def take_io() -> dict:
+    packed = compress.take_stats()
+    out = {**io, "compressed_raw": packed["raw"], "compressed": packed["packed"]}
+    io["read"] = io["written"] = 0
+    return out
+
+
+def _pack_fields(fields: Optional[dict]) -> dict:
+    fields = dict(fields or {})
+    if "candidates" in fields:
+        fields["candidates"] = pack(fields["candidates"])
+    return fields
+
+
+def _unpack_task(doc: dict) -> dict:
+    if "candidates" in doc:
+        doc["candidates"] = unpack(doc["candidates"])
+    if isinstance(doc.get("result"), dict) and "determination" in doc["result"]:
+        doc["result"]["determination"] = unpack(doc["result"]["determination"])
+    return doc
+
+
+# --- Request params: interned templates + append-only messages ------------------
+
+_template_cache = {}
+
+
+def intern_params(params: dict) -> tuple[dict, list]:
+    """Split request params into a template reference (interning the template) and messages."""
+    template = {k: v for k, v in params.items() if k != "messages"}
+    template_id = hashlib.sha1(json.dumps(template, sort_keys=True, ensure_ascii=False).encode()).hexdigest()
+    if template_id not in _template_cache:
+        templates.update_one({"_id": template_id}, {"$setOnInsert": template}, upsert=True)
+        _template_cache[template_id] = template
+    return {"template_id": template_id, "overrides": {}}, pack_messages(params.get("messages", []))
+
+
+def build_params(task: dict) -> Optional[dict]:
+    """Full request params for a task's next LLM call, or None if it has none yet. Raises
+    LookupError if its template is gone (batch_templates dropped or cleared)."""
+    ref = task.get("params")
+    if not ref or "template_id" not in ref:
+        return ref   # uninitialized, or stored whole before params were split
+    template = _template_cache.get(ref["template_id"])
+    if template is None:
+        template = templates.find_one({"_id": ref["template_id"]})
+        if template is None:
+            raise LookupError(f"request template {ref['template_id']} is missing")
+        template.pop("_id")
+        _template_cache[ref["template_id"]] = template
+    return {**template, **ref.get("overrides", {}), "messages": unpack_messages(task.get("messages") or [])}
+
+
+def set_params(task_id: ObjectId, params: dict, extra: Optional[dict] = None) -> None:
+    """Give a pending task fresh params (initialization, or conversion to another kind)."""
+    ref, messages = intern_params(params)
+    update = {"$set": {"params": ref, "messages": messages, "updated_at": now(), **_pack_fields(extra)}}
+    _wrote(update)
+    tasks.update_one({"_id": task_id}, update)
+
+
+def _task_doc(run_id: str, kind: str, ref: str, segment: str, word: Optional[str],
+              params: Optional[dict], extra: Optional[dict]) -> dict:
     doc = {
         "run_id": run_id,
         "kind": kind,              # "phrases" | "vet" | "resolve"
         "ref": ref,
         "segment": segment,
         "word": word,
-        "params": params,          # anthropic request params for the *next* LLM call
+        "params": None,            # template ref + overrides for the *next* LLM call
+        "messages": None,          # its conversation so far
         "status": "pending",
         "turn": 0,
         "attempts": 0,
         "created_at": now(),
         "updated_at": now(),
     }
+    if params:
+        doc["params"], doc["messages"] = intern_params(params)
     if extra:
-        doc.update(extra)
-    return tasks.insert_one(doc).inserted_id
+        doc.update(_pack_fields(extra))
+    _wrote(doc)
+    return doc
+
+
+def create_task(run_id: str, kind: str, ref: str, segment: str, word: Optional[str] = None,
+                params: Optional[dict] = None, extra: Optional[dict] = None) -> ObjectId:
+    return tasks.insert_one(_task_doc(run_id, kind, ref, segment, word, params, extra)).inserted_id
+
+
+def create_tasks(run_id: str, kind: str, rows: List[tuple], extra: Optional[dict] = None) -> int:
+    """One insert_many for many (ref, segment, params) tasks of a kind, e.g. a seeding chunk."""
+    docs = [_task_doc(run_id, kind, ref, segment, None, params, extra) for ref, segment, params in rows]
+    if docs:
+        tasks.insert_many(docs, ordered=False)
+    return len(docs)
+
+
+def seeded_refs(run_id: str) -> set:
+    """Segments the run already has a phrases task for; seeding skips them."""
+    return set(tasks.distinct("ref", {"run_id": run_id, "kind": "phrases"}))
+
+
+# What submission reads of a pending task: enough to build its request and custom_id.
+_SUBMIT_FIELDS = {"kind": 1, "turn": 1, "params": 1, "messages": 1, "deduped_chars": 1}
 
 
 def pending_tasks(run_id: str, limit: int) -> List[dict]:
-    return list(tasks.find({"run_id": run_id, "status": "pending"}).limit(limit))
+    """Up to ``limit`` submittable tasks. Uninitialized and held ones (no params yet) don't
+    take a slot: enough of them would fill every one and starve the tasks they wait on."""
+    docs = list(tasks.find({"run_id": run_id, "status": "pending", "params": {"$ne": None}},
+                           _SUBMIT_FIELDS).limit(limit))
+    io["read"] += sum(len(bson.encode(d)) for d in docs)
+    return [_unpack_task(d) for d in docs]
+
+
+def load_task(task_id: ObjectId) -> Optional[dict]:
+    doc = tasks.find_one({"_id": task_id})
+    if doc is not None:
+        io["read"] += len(bson.encode(doc))
+        _unpack_task(doc)
+    return doc
 
 
 def mark_in_batch(task_ids: List[ObjectId], batch_id: str) -> None:
@@ -56,22 +178,56 @@ def mark_in_batch(task_ids: List[ObjectId], batch_id: str) -> None:
                       {"$set": {"status": "in_batch", "batch_id": batch_id, "updated_at": now()}})
 
 
-def advance_task(task_id: ObjectId, expected_turn: int, new_params: dict) -> bool:
-    """Append-another-turn transition; idempotent via the turn guard."""
-    res = tasks.update_one(
-        {"_id": task_id, "turn": expected_turn, "status": "in_batch"},
-        {"$set": {"params": new_params, "status": "pending", "updated_at": now()},
-         "$inc": {"turn": 1}})
+def advance_task(task: dict, new_messages: list, overrides: Optional[dict] = None,
+                 extra: Optional[dict] = None) -> bool:
+    """Append-another-turn transition; idempotent via the turn guard. Pushes only the
+    turn's new messages; ``overrides`` replace template params (e.g. model) from now on."""
+    fields = {"status": "pending", "updated_at": now(), **(extra or {})}
+    if "template_id" in (task.get("params") or {}):
+        fields.update({f"params.overrides.{k}": v for k, v in (overrides or {}).items()})
+        update = {"$set": fields, "$inc": {"turn": 1}}
+        if new_messages:
+            update["$push"] = {"messages": {"$each": pack_messages(new_messages)}}
+    else:   # params stored whole: convert now
+        full = {**task["params"], **(overrides or {})}
+        full["messages"] = full["messages"] + new_messages
+        fields["params"], fields["messages"] = intern_params(full)
+        update = {"$set": fields, "$inc": {"turn": 1}}
+    _wrote(update)
+    res = tasks.update_one({"_id": task["_id"], "turn": task["turn"], "status": "in_batch"}, update)
     return res.modified_count == 1
 
 
+def _pack_result(result: dict) -> dict:
+    if "determination" in result:
+        return {**result, "determination": pack(result["determination"])}
+    return result
+
+
 def complete_task(task_id: ObjectId, expected_turn: int, result: dict) -> bool:
-    res = tasks.update_one(
-        {"_id": task_id, "turn": expected_turn, "status": "in_batch"},
-        {"$set": {"status": "done", "result": result, "params": None, "updated_at": now()}})
+    update = {"$set": {"status": "done", "result": _pack_result(result), "params": None, "messages": None,
+                       "updated_at": now()}}
+    _wrote(update)
+    res = tasks.update_one({"_id": task_id, "turn": expected_turn, "status": "in_batch"}, update)
     return res.modified_count == 1
 
 
+def complete_pending_task(task_id: ObjectId, result: dict) -> bool:
+    """Resolve a task locally, before it was ever submitted (e.g. from the memo)."""
+    update = {"$set": {"status": "done", "result": _pack_result(result), "params": None, "messages": None,
+                       "updated_at": now()}}
+    _wrote(update)
+    res = tasks.update_one({"_id": task_id, "status": "pending"}, update)
+    return res.modified_count == 1
+
+
+def force_pending(run_id: str) -> int:
+    """Mark a run's outstanding tasks to bypass the exact-context memo."""
+    res = tasks.update_many({"run_id": run_id, "status": {"$in": ["pending", "in_batch"]}},
+                            {"$set": {"force": True, "updated_at": now()}})
+    return res.modified_count
+
+
 def fail_task(task_id: ObjectId, reason: str) -> None:
     tasks.update_one({"_id": task_id},
                      {"$set": {"status": "failed", "error": reason, "updated_at": now()}})
@@ -90,13 +246,20 @@ def requeue_task(task_id: ObjectId, max_attempts: int) -> None:
 
 
 def create_round(run_id: str, batch_id: str, task_ids: List[ObjectId],
-                 payload: Optional[dict] = None) -> ObjectId:
+                 payload: Optional[dict] = None, models: Optional[List[dict]] = None,
+                 io: Optional[dict] = None, ttl: Optional[str] = None,
+                 metrics: Optional[dict] = None, settings: Optional[dict] = None) -> ObjectId:
     return rounds.insert_one({
         "run_id": run_id,
         "batch_id": batch_id,
         "task_ids": task_ids,
         "status": "submitted",
         "payload": payload,   # char-level attribution of the determination requests
+        "models": models,     # [{model, requests, chars}] for per-model cost
+        "submit_io": io,      # task BSON bytes read/written while preparing the round
+        "ttl": ttl,           # prompt-cache write TTL used for the determination requests
+        "submit_metrics": metrics,  # phase timings and counters of the submission (metrics.py)
+        "settings": settings, # driver settings the round ran under, for simulate.py
         "created_at": now(),
         "updated_at": now(),
     }).inserted_id
@@ -106,8 +269,132 @@ def open_rounds(run_id: str) -> List[dict]:
     return list(rounds.find({"run_id": run_id, "status": "submitted"}))
 
 
-def close_round(round_id: ObjectId) -> None:
-    rounds.update_one({"_id": round_id}, {"$set": {"status": "ended", "ended_at": now()}})
+def close_round(round_id: ObjectId, io: Optional[dict] = None, usage: Optional[dict] = None,
+                metrics: Optional[dict] = None) -> None:
+    """``io``: task BSON bytes read/written while applying the round's results.
+    ``usage``: the round's token usage from new_round_usage()/add_usage().
+    ``metrics``: phase timings and counters of the polling and application."""
+    if usage is not None:
+        usage = {**usage, "by_model": list(usage["by_model"].values()),
+                 "by_kind_model": list(usage["by_kind_model"].values())}
+    rounds.update_one({"_id": round_id}, {"$set": {"status": "ended", "ended_at": now(),
+                                                    "apply_io": io, "usage": usage,
+                                                    "apply_metrics": metrics}})
+
+
+# --- Token usage ---------------------------------------------------------------
+
+USAGE_FIELDS = ("input_tokens", "output_tokens", "cache_creation_input_tokens",
+                "cache_read_input_tokens", "cache_creation_1h_tokens")
+
+
+def new_round_usage() -> dict:
+    return {"by_kind": {}, "by_model": {}, "by_kind_model": {}, "followups": 0, "followup_hits": 0}
+
+
+def is_followup(task: dict) -> bool:
+    """Whether a resolve task's current turn replays a prefix its model has already been
+    sent: any determination turn after the first on that model. The first turn after
+    vetting, and the first on DETERMINATION_MODEL after a cascade escalation, write the
+    cache rather than read it."""
+    if task["kind"] != "resolve":
+        return False
+    cascade = task.get("cascade") or {}
+    first = task.get("determination_start", cascade.get("start_turn", 0))
+    if cascade.get("escalated") and task["turn"] >= cascade["start_turn"] + cascade["turns"]:
+        first = cascade["start_turn"] + cascade["turns"]
+    return task["turn"] > first
+
+
+def add_usage(acc: dict, kind: str, model: str, followup: bool, usage: dict) -> None:
+    """Fold one result's usage into a round's totals, per kind, per model, and per kind on
+    each model (a cascade's resolve turns run on two). Follow-up determination turns
+    (is_followup) are the ones that should read the replayed prefix from cache; their hit
+    count drives the adaptive TTL check."""
+    for bucket in (acc["by_kind"].setdefault(kind, {"requests": 0}),
+                   acc["by_model"].setdefault(model, {"model": model, "requests": 0}),
+                   acc["by_kind_model"].setdefault((kind, model), {"kind": kind, "model": model, "requests": 0})):
+        bucket["requests"] += 1
+        for f in USAGE_FIELDS:
+            bucket[f] = bucket.get(f, 0) + usage.get(f, 0)
+    if followup:
+        acc["followups"] += 1
+        acc["followup_hits"] += 1 if usage.get("cache_read_input_tokens") else 0
+
+
+def record_task_usage(task_usage: List[tuple]) -> None:
+    """Accumulate per-task token usage, as (task_id, usage) pairs, in one bulk write."""
+    if task_usage:
+        tasks.bulk_write([UpdateOne({"_id": task_id}, {"$inc": {f"usage.{f}": n for f, n in usage.items()}})
+                          for task_id, usage in task_usage], ordered=False)
+
+
+def last_round_cache(run_id: str) -> Optional[dict]:
+    """TTL and measured follow-up cache hit rate of the most recent round with usage."""
+    doc = rounds.find_one({"run_id": run_id, "status": "ended", "usage.followups": {"$gt": 0}},
+                          sort=[("ended_at", -1)])
+    if not doc:
+        return None
+    u = doc["usage"]
+    return {"ttl": doc.get("ttl"), "hit_rate": u["followup_hits"] / u["followups"]}
+
+
+def usage_cost(model: str, usage: dict, prices: dict, batch_discount: float) -> Optional[float]:
+    """Dollar cost of a usage total at batch pricing, or None for an unpriced model."""
+    if model not in prices:
+        return None
+    p_in, p_out = prices[model]
+    writes_1h = usage.get("cache_creation_1h_tokens", 0)
+    writes_5m = usage.get("cache_creation_input_tokens", 0) - writes_1h
+    dollars = (usage.get("input_tokens", 0) * p_in + usage.get("output_tokens", 0) * p_out
+               + writes_5m * p_in * 1.25 + writes_1h * p_in * 2 + usage.get("cache_read_input_tokens", 0) * p_in * 0.1)
+    return batch_discount * dollars / 1_000_000
+
+
+def usage_report(run_id: str, prices: dict, batch_discount: float) -> dict:
+    """Actual token usage for a run, from the rounds' recorded batch-result usage."""
+    by_kind, by_model = {}, {}
+    followups = hits = 0
+    for r in rounds.find({"run_id": run_id, "usage": {"$ne": None}}, {"usage": 1}):
+        u = r["usage"]
+        followups += u["followups"]
+        hits += u["followup_hits"]
+        for kind, totals in u["by_kind"].items():
+            agg = by_kind.setdefault(kind, {})
+            for f, n in totals.items():
+                agg[f] = agg.get(f, 0) + n
+        for totals in u["by_model"]:
+            agg = by_model.setdefault(totals["model"], {})
+            for f, n in totals.items():
+                if f != "model":
+                    agg[f] = agg.get(f, 0) + n
+
+    def total(agg: dict) -> int:
+        return sum(agg.get(f, 0) for f in ("input_tokens", "cache_creation_input_tokens", "cache_read_input_tokens"))
+
+    prompt = sum(total(a) for a in by_kind.values())
+    read = sum(a.get("cache_read_input_tokens", 0) for a in by_kind.values())
+    costs = {m: usage_cost(m, a, prices, batch_discount) for m, a in by_model.items()}
+    cost = sum(c for c in costs.values() if c is not None)
+    words = tasks.count_documents({"run_id": run_id, "kind": {"$in": ["vet", "resolve"]}, "status": "done"})
+    segments = tasks.count_documents({"run_id": run_id, "kind": "phrases"})
+    word_tokens = sum(total(by_kind.get(k, {})) + by_kind.get(k, {}).get("output_tokens", 0)
+                      for k in ("vet", "resolve"))
+    return {
+        "by_kind": by_kind,
+        "cache_hit_rate": f"{100 * read / prompt:.1f}%" if prompt else "n/a",
+        "followup_cache_hits": f"{hits}/{followups}",
+        "tokens_per_resolved_word": round(word_tokens / words) if words else None,
+        "cost_by_model": {m: round(c, 4) if c is not None else "unpriced" for m, c in costs.items()},
+        "cost": round(cost, 4),
+        "cost_per_segment": round(cost / segments, 4) if segments else None,
+    }
+
+
+def round_metrics(run_id: str) -> List[dict]:
+    """Per-round submit/apply metric snapshots, oldest first."""
+    return list(rounds.find({"run_id": run_id}, {"batch_id": 1, "submit_metrics": 1, "apply_metrics": 1})
+                .sort("created_at", 1))
 
 
 def last_round_turnaround(run_id: str) -> Optional[float]:
@@ -128,6 +415,232 @@ def run_status(run_id: str) -> dict:
     return dict(sorted(out.items()))
 
 
+def resolution_report(run_id: str) -> dict:
+    """
+    How the run's words were resolved: counts per source (memo, each pre-resolution rule,
+    vetting, determination), plus the share of resolved words answered without any model call.
+    """
+    pipeline = [{"$match": {"run_id": run_id, "kind": {"$in": ["vet", "resolve"]}}},
+                {"$group": {"_id": {"via": "$result.via", "rule": "$result.rule",
+                                    "imported": {"$gt": ["$result.candidate_source", None]}},
+                            "n": {"$sum": 1}}}]
+    by_source, words, resolved = {}, 0, 0
+    for row in tasks.aggregate(pipeline):
+        words += row["n"]
+        via = row["_id"].get("via")
+        if via is None:
+            continue   # not (yet) resolved
+        resolved += row["n"]
+        key = f"rule:{row['_id']['rule']}" if via == "rule" else via
+        if via == "vetting" and row["_id"].get("imported"):
+            key = "vetting:imported"   # accepted a warm-start candidate: a determination avoided
+        by_source[key] = by_source.get(key, 0) + row["n"]
+    local = sum(n for k, n in by_source.items() if k in ("memo", "similarity") or k.startswith("rule:"))
+    # Of the resolved words only: a pending or failed one hasn't saved or spent anything yet.
+    return {"words": words, "resolved": resolved, "resolved_by": dict(sorted(by_source.items())),
+            "model_requests_saved": f"{100 * local / resolved:.1f}%" if resolved else "n/a"}
+
+
+def cascade_report(run_id: str) -> Optional[dict]:
+    """
+    Cheap-first cascade outcomes for a run: how many determinations the cheap model settled,
+    why the rest escalated, average turns on each model, and request/char totals per model
+    (chars / ~2.6 = tokens) for cost. None if the run never used the cascade.
+    """
+    docs = list(tasks.find({"run_id": run_id, "cascade": {"$exists": True}},
+                           {"cascade": 1, "status": 1, "turn": 1}))
+    if not docs:
+        return None
+    settled = [d for d in docs if d["status"] == "done" and not d["cascade"].get("escalated")]
+    escalated = [d for d in docs if d["cascade"].get("escalated")]
+    reasons = {}
+    for d in escalated:
+        reasons[d["cascade"]["escalated"]] = reasons.get(d["cascade"]["escalated"], 0) + 1
+    cheap_turns = [d["cascade"].get("turns") or (d["turn"] - d["cascade"]["start_turn"] + 1) for d in docs]
+    full_turns = [d["turn"] - d["cascade"]["start_turn"] - d["cascade"]["turns"] + 1
+                  for d in escalated if d["status"] == "done"]
+
+    per_model = {}
+    for r in rounds.find({"run_id": run_id, "models": {"$ne": None}}, {"models": 1}):
+        for m in r["models"]:
+            agg = per_model.setdefault(m["model"], {"requests": 0, "chars": 0})
+            agg["requests"] += m["requests"]
+            agg["chars"] += m["chars"]
+
+    return {
+        "cheap_model": docs[0]["cascade"]["model"],
+        "tasks": len(docs),
+        "settled_by_cheap": f"{len(settled)} ({100 * len(settled) / len(docs):.1f}%)",
+        "escalated": dict(sorted(reasons.items())),
+        "avg_cheap_turns": round(sum(cheap_turns) / len(cheap_turns), 2),
+        "avg_turns_after_escalation": round(sum(full_turns) / len(full_turns), 2) if full_turns else None,
+        "per_model": per_model,
+    }
+
+
+def word_inventory(run_id: str) -> dict:
+    """Occurrence count of each (NFC-normalized) word form across the run's word tasks."""
+    pipeline = [{"$match": {"run_id": run_id, "kind": {"$in": ["vet", "resolve"]}}},
+                {"$group": {"_id": "$word", "n": {"$sum": 1}}}]
+    return {row["_id"]: row["n"] for row in tasks.aggregate(pipeline)}
+
+
+def words_in_determination(run_id: str) -> set:
+    """Words with a determination conversation underway (initialized, not yet finished)."""
+    return set(tasks.distinct("word", {"run_id": run_id, "kind": "resolve", "params": {"$ne": None},
+                                       "status": {"$in": ["pending", "in_batch"]}}))
+
+
+def hold_tasks(task_ids: List[ObjectId]) -> None:
+    """Flag tasks the frequency scheduler held back behind another occurrence's determination."""
+    tasks.update_many({"_id": {"$in": task_ids}, "held": {"$ne": True}},
+                      {"$set": {"held": True, "updated_at": now()}})
+
+
+def schedule_report(run_id: str, min_count: int = 2) -> Optional[dict]:
+    """
+    What frequency scheduling bought: of the occurrences held behind a representative
+    determination, how many finished without a determination of their own.
+    None if the run never held a task.
+    """
+    pipeline = [{"$match": {"run_id": run_id, "held": True}},
+                {"$group": {"_id": {"status": "$status", "via": "$result.via"}, "n": {"$sum": 1}}}]
+    rows = list(tasks.aggregate(pipeline))
+    if not rows:
+        return None
+    held = sum(r["n"] for r in rows)
+    finished = sum(r["n"] for r in rows if r["_id"]["status"] in ("done", "failed"))
+    determined = sum(r["n"] for r in rows if r["_id"].get("via") == "determination")
+    avoided = sum(r["n"] for r in rows
+                  if r["_id"]["status"] == "done" and r["_id"].get("via") != "determination")
+    inventory = word_inventory(run_id)
+    return {
+        "unique_words": len(inventory),
+        "frequent_words": sum(1 for n in inventory.values() if n >= min_count),
+        "held": held,
+        "finished": finished,
+        "determinations_avoided": avoided,
+        "determined_anyway": determined,
+    }
+
+
+def turns_report(run_id: str) -> dict:
+    """
+    Rounds and wall clock for the run, and average agent turns per determined word -
+    split by whether the initial prompt carried prefetched lookups - to measure the
+    effect of speculative prefetch.
+    """
+    pipeline = [{"$match": {"run_id": run_id, "kind": "resolve", "status": "done",
+                            "result.via": "determination"}},
+                {"$group": {"_id": {"$gt": [{"$ifNull": ["$prefetched", 0]}, 0]},
+                            "words": {"$sum": 1}, "turns": {"$avg": {"$add": ["$turn", 1]}}}}]
+    turns = {("prefetched" if row["_id"] else "no_prefetch"): {"words": row["words"],
+                                                               "avg_turns": round(row["turns"], 2)}
+             for row in tasks.aggregate(pipeline)}
+    first = rounds.find_one({"run_id": run_id}, sort=[("created_at", 1)])
+    last = rounds.find_one({"run_id": run_id, "ended_at": {"$exists": True}}, sort=[("ended_at", -1)])
+    wall = (last["ended_at"] - first["created_at"]).total_seconds() if first and last else None
+    return {"rounds": rounds.count_documents({"run_id": run_id}),
+            "wall_clock_s": round(wall) if wall is not None else None,
+            "determination_turns": turns}
+
+
+def lookup_report(run_id: str) -> dict:
+    """
+    Repeated-lookup handling across the run: duplicate lookups answered from the
+    conversation instead of re-run, and forced early conclusions after a run of empty
+    searches, with the turn budget they had left when forced - an upper bound on the agent
+    turns (each a batch round for that word) saved, not a measure of them.
+    """
+    pipeline = [{"$match": {"run_id": run_id, "kind": "resolve"}},
+                {"$group": {"_id": None,
+                            "duplicates": {"$sum": {"$ifNull": ["$duplicate_lookups", 0]}},
+                            "forced": {"$sum": {"$cond": [{"$ifNull": ["$forced_conclusion", False]}, 1, 0]}},
+                            "budget_left": {"$sum": {"$ifNull": ["$forced_conclusion.turns_left", 0]}}}}]
+    row = next(tasks.aggregate(pipeline), None) or {"duplicates": 0, "forced": 0, "budget_left": 0}
+    return {"duplicate_lookups_answered": row["duplicates"],
+            "forced_conclusions": row["forced"],
+            "turn_budget_remaining_at_force": row["budget_left"]}
+
+
+def dedup_report(run_id: str) -> List[dict]:
+    """Per round, determination tool_result chars as sent and as they would have been
+    without cross-turn entry deduplication (from each round's payload)."""
+    out = []
+    for r in rounds.find({"run_id": run_id, "payload.tool_result_deduped": {"$gt": 0}},
+                         {"batch_id": 1, "payload": 1}).sort("created_at", 1):
+        sent = r["payload"]["tool_result"]
+        before = sent + r["payload"]["tool_result_deduped"]
+        out.append({"batch_id": r["batch_id"], "tool_result_before": before, "tool_result_after": sent,
+                    "saved": f"{100 * (before - sent) / before:.1f}%"})
+    return out
+
+
+def prefilter_report(run_id: str) -> Optional[dict]:
+    """Vetting candidates cut by the similarity prefilter, and words it accepted outright.
+    None if it never acted in the run."""
+    cut = list(tasks.aggregate([
+        {"$match": {"run_id": run_id, "prefiltered": {"$exists": True}}},
+        {"$group": {"_id": None, "n": {"$sum": 1}, "from": {"$sum": "$prefiltered.from"},
+                    "kept": {"$sum": "$prefiltered.kept"}}}]))
+    accepted = tasks.count_documents({"run_id": run_id, "result.via": "similarity"})
+    if not cut and not accepted:
+        return None
+    c = cut[0] if cut else {"n": 0, "from": 0, "kept": 0}
+    return {"vet_tasks_prefiltered": c["n"], "candidates_before": c["from"], "candidates_sent": c["kept"],
+            "auto_accepted": accepted}
+
+
+def vetted_tasks(run_id: str) -> List[dict]:
+    """Word tasks that went through vetting (still vet, or rejected into resolve), unpacked."""
+    docs = tasks.find({"run_id": run_id, "candidates": {"$exists": True}},
+                      {"word": 1, "ref": 1, "segment": 1, "candidates": 1, "prefiltered": 1, "vetted": 1, "result": 1})
+    return [_unpack_task(d) for d in docs]
+
+
+def io_report(run_id: str) -> List[dict]:
+    """Per round, Mongo task bytes read and written while preparing and applying it."""
+    out = []
+    for r in rounds.find({"run_id": run_id}, {"batch_id": 1, "submit_io": 1, "apply_io": 1}).sort("created_at", 1):
+        submit, apply = r.get("submit_io") or {}, r.get("apply_io") or {}
+        raw = submit.get("compressed_raw", 0) + apply.get("compressed_raw", 0)
+        packed = submit.get("compressed", 0) + apply.get("compressed", 0)
+        out.append({"batch_id": r["batch_id"],
+                    "read_bytes": submit.get("read", 0) + apply.get("read", 0),
+                    "written_bytes": submit.get("written", 0) + apply.get("written", 0),
+                    "compressed": f"{raw} -> {packed}" if raw else None})
+    return out
+
+
+def _collection_sizes() -> dict:
+    st = tasks.database.command("collstats", "batch_tasks")
+    return {"count": st.get("count"), "avg_doc_bytes": st.get("avgObjSize"),
+            "size_bytes": st.get("size"), "storage_bytes": st.get("storageSize")}
+
+
+def record_storage_baseline(label: str) -> dict:
+    """Snapshot batch_tasks' sizes before a compression change (e.g. a new dictionary);
+    storage_report() reports against it from then on."""
+    snap = {**_collection_sizes(), "label": label, "recorded_at": now()}
+    snapshots.replace_one({"_id": "baseline"}, snap, upsert=True)
+    return snap
+
+
+def storage_report() -> dict:
+    """Size of batch_tasks as Mongo stores it: document count, data size, on-disk size, and
+    the change in each since the recorded baseline, if any. Compare avg_doc_bytes: the other
+    sizes also move with the number of tasks."""
+    out = {"batch_tasks": _collection_sizes()}
+    base = snapshots.find_one({"_id": "baseline"})
+    if base:
+        delta = {"baseline": f"{base['label']} at {base['recorded_at']:%Y-%m-%d %H:%M}"}
+        for k in ("count", "avg_doc_bytes", "size_bytes", "storage_bytes"):
+            before, after = base.get(k) or 0, out["batch_tasks"][k] or 0
+            delta[k] = f"{before} -> {after}" + (f" ({100 * (after - before) / before:+.1f}%)" if before else "")
+        out["since_baseline"] = delta
+    return out
+
+
 def has_work(run_id: str) -> bool:
     return tasks.count_documents({"run_id": run_id, "status": {"$in": ["pending", "in_batch"]}}, limit=1) > 0
 
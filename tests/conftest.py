@@ -0,0 +1,20 @@
+import importlib
+import os
+import sys
+
+import pytest
+
+# The modules live flat at the repo root.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope="session")
+def mongo():
+    """The Lexicon store on mongomock, the way bench.py runs it. Needs the Sefaria-Project
+    environment, like the driver; skipped without it."""
+    pytest.importorskip("mongomock")
+    pytest.importorskip("sefaria.system.database")
+    import bench
+    bench.patch_mongo(None)
+    import store
+    return importlib.reload(store)   # bind the patched client even if imported earlier
@@ -0,0 +1,56 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("bson")
+pytest.importorskip("pymongo")
+
+import config  # noqa: E402
+import resolver  # noqa: E402
+from models import WordDetermination  # noqa: E402
+
+
+def determination(confidence):
+    return WordDetermination(word="דין", reasoning="", entries_to_keep=[], entries_to_remove=[],
+                             entries_to_add=[], confidence=confidence)
+
+
+def test_low_confidence_escalates():
+    assert resolver.cascade_escalation("final", determination("Low")) == "low confidence"
+
+
+def test_missing_confidence_escalates():
+    assert resolver.cascade_escalation("final", determination(None)) == "no confidence"
+    assert resolver.cascade_escalation("final", determination("  ")) == "no confidence"
+
+
+def test_high_confidence_is_kept():
+    assert resolver.cascade_escalation("final", determination("high")) is None
+    assert resolver.cascade_escalation("lookups", []) is None
+
+
+def test_escalated_task_gets_full_turn_budget():
+    task = {"turn": 5, "cascade": {"start_turn": 0, "turns": 3, "escalated": "low confidence"}}
+    assert resolver.determination_turn(task) == 2
+
+
+def test_cheap_turn_budget_used_up_escalates(monkeypatch):
+    monkeypatch.setattr(config, "CASCADE_MAX_TURNS", 2)
+    monkeypatch.setattr(resolver, "interpret_determination_response", lambda blocks: ("lookups", []))
+
+    async def no_lookups(task, calls):
+        return [], {}
+    monkeypatch.setattr(resolver, "execute_lookups", no_lookups)
+    advanced = []
+    monkeypatch.setattr(resolver.store, "advance_task",
+                        lambda task, new_messages, overrides=None, extra=None:
+                        advanced.append((new_messages, overrides, extra)))
+
+    task = {"_id": 1, "ref": "Ref", "word": "דין", "turn": 1, "cascade": {"start_turn": 0}}
+    asyncio.run(resolver.apply_resolve_result("run", task, [{"type": "text", "text": "..."}]))
+
+    (new_messages, overrides, extra), = advanced
+    assert overrides["model"] == config.DETERMINATION_MODEL
+    assert extra["cascade.escalated"] == "out of turns"
+    assert extra["cascade.turns"] == 2
+    assert [m["role"] for m in new_messages] == ["assistant", "user"]
@@ -0,0 +1,42 @@
+import pytest
+
+pytest.importorskip("bson")
+
+import compress  # noqa: E402
+
+ENTRY = {"headword": "דִּין", "parent_lexicon": "Jastrow Dictionary",
+         "content": {"senses": [{"definition": f"judgment, law, sense {i}"} for i in range(40)]}}
+
+
+@pytest.fixture
+def dicts(monkeypatch):
+    """The trained dictionaries compress would load from Mongo, set directly."""
+    monkeypatch.setattr(compress, "_dicts", {})
+    monkeypatch.setattr(compress, "_current_dict_id", None)
+    monkeypatch.setattr(compress, "_loaded", True)
+    return compress._dicts
+
+
+def test_round_trip_without_dictionary(dicts):
+    packed = compress.pack(ENTRY)
+    assert compress.MARKER in packed and packed.get("dict") is None
+    assert len(packed["data"]) < len(str(ENTRY).encode("utf-8"))
+    assert compress.unpack(packed) == ENTRY
+
+
+def test_round_trip_with_dictionary(dicts, monkeypatch):
+    zstandard = pytest.importorskip("zstandard")
+    samples = [f'{{"headword": "ערך {i}", "content": "{"פירוש " * (i % 17)} sense {i}"}}'.encode("utf-8")
+               for i in range(500)]
+    dicts["trained"] = zstandard.train_dictionary(4096, samples)
+    monkeypatch.setattr(compress, "_current_dict_id", "trained")
+    packed = compress.pack(ENTRY)
+    assert packed[compress.MARKER] == "zstd" and packed["dict"] == "trained"
+    assert compress.unpack(packed) == ENTRY
+
+
+def test_small_and_unpacked_values_pass_through(dicts):
+    assert compress.pack("short") == "short"
+    assert compress.unpack(ENTRY) == ENTRY
+    messages = [{"role": "user", "content": [{"type": "tool_result", "content": ENTRY}]}]
+    assert compress.unpack_messages(compress.pack_messages(messages)) == messages
@@ -0,0 +1,28 @@
+from agent_core import SHOWN_EARLIER, dedupe_entries, entry_key
+
+
+def form_entry(headword, content="..."):
+    return {"headword": headword, "parent_lexicon": "Jastrow Dictionary", "content": content}
+
+
+def test_entry_shown_earlier_becomes_reference():
+    shown = set()
+    assert dedupe_entries([form_entry("דִּין")], shown) == [form_entry("דִּין")]
+    assert shown == {entry_key("דִּין", "Jastrow Dictionary")}
+    assert dedupe_entries([form_entry("דִּין"), form_entry("דַּיָּן")], shown) == [
+        form_entry("דִּין", SHOWN_EARLIER), form_entry("דַּיָּן")]
+
+
+def test_dictionary_hit_excerpt_does_not_count_as_shown():
+    shown = set()
+    hit = {"headword": "דִּין", "lexicon_name": "Jastrow Dictionary", "text": "judgment"}
+    assert dedupe_entries([hit], shown) == [hit]
+    assert not shown
+    shown.add(entry_key("דִּין", "Jastrow Dictionary"))
+    assert dedupe_entries([hit], shown) == [{**hit, "text": SHOWN_EARLIER}]
+
+
+def test_non_entries_pass_through():
+    shown = {entry_key("דִּין", "Jastrow Dictionary")}
+    assert dedupe_entries("no results", shown) == "no results"
+    assert dedupe_entries([{"ref": "x"}, "text"], shown) == [{"ref": "x"}, "text"]
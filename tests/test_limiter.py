@@ -0,0 +1,69 @@
+import asyncio
+import time
+
+from limiter import AdaptiveLimiter
+
+
+def limiter(**kw) -> AdaptiveLimiter:
+    args = dict(start=1, minimum=1, maximum=4, rate=100.0, tolerance=3.0)
+    args.update(kw)
+    return AdaptiveLimiter(**args)
+
+
+async def hold(lim: AdaptiveLimiter, seconds: float) -> None:
+    async with lim.call():
+        await asyncio.sleep(seconds)
+
+
+def test_cancelled_while_queued_frees_nothing_and_keeps_queue_moving():
+    async def main():
+        lim = limiter()
+        holder = asyncio.create_task(hold(lim, 0.05))
+        await asyncio.sleep(0)
+        queued = asyncio.create_task(hold(lim, 0))
+        await asyncio.sleep(0.01)
+        assert lim.stats()["queued"] == 1
+        queued.cancel()
+        await asyncio.gather(holder, queued, return_exceptions=True)
+        assert lim.in_flight == 0 and lim.stats()["queued"] == 0
+        await asyncio.wait_for(hold(lim, 0), 1)
+    asyncio.run(main())
+
+
+def test_woken_then_cancelled_hands_wakeup_on():
+    async def main():
+        lim = limiter(maximum=1)
+        lim.in_flight = 1   # a slot held elsewhere
+        first = asyncio.create_task(hold(lim, 0))
+        second = asyncio.create_task(hold(lim, 0))
+        await asyncio.sleep(0.01)
+        assert lim.stats()["queued"] == 2
+        lim._release()      # wakes `first`...
+        first.cancel()      # ...which is cancelled before it gets to run
+        await asyncio.wait_for(second, 1)
+        assert lim.in_flight == 0
+    asyncio.run(main())
+
+
+def test_cancelled_while_rate_limited_releases_slot():
+    async def main():
+        lim = limiter(start=4, rate=1.0)
+        results = await asyncio.gather(*[asyncio.wait_for(hold(lim, 0), 0.2) for _ in range(4)],
+                                       return_exceptions=True)
+        assert any(isinstance(r, asyncio.TimeoutError) for r in results)
+        assert lim.in_flight == 0
+    asyncio.run(main())
+
+
+def test_cancelled_during_retry_after_pause_releases_slot():
+    async def main():
+        lim = limiter(start=2)
+        lim._paused_until = time.monotonic() + 10
+        try:
+            await asyncio.wait_for(hold(lim, 0), 0.05)
+        except asyncio.TimeoutError:
+            pass
+        assert lim.in_flight == 0
+        lim._paused_until = 0.0
+        await asyncio.wait_for(hold(lim, 0), 1)
+    asyncio.run(main())
@@ -0,0 +1,48 @@
+from models import LexRef
+from morphology import candidates, headword_key, lookup_candidates, surface_variants
+
+
+def forms(word):
+    return [form for form, _ in candidates(word)]
+
+
+def test_consonantal_form_first_at_cost_zero():
+    assert candidates("וּבְדִינָא")[0] == ("ובדינא", 0)
+
+
+def test_prefixes_and_suffix_stripped():
+    assert "דינא" in forms("וּבְדִינָא")
+    assert "דין" in forms("וּבְדִינָא")
+    assert "אמר" in forms("דְּאָמַר")
+
+
+def test_final_letter_restored_after_suffix():
+    assert "מלך" in forms("מלכא")
+
+
+def test_phrase_is_not_split():
+    assert candidates("בית דין") == [("בית דין", 0)]
+
+
+def test_surface_variants_exclude_the_word():
+    assert "ובדינא" not in surface_variants("ובדינא", 5)
+    assert "ובדינא" not in surface_variants("וּבְדִינָא", 5)
+
+
+def test_headword_key_drops_homograph_number():
+    assert headword_key("אָמַר I") == "אמר"
+    assert headword_key("אָמַר II") == "אמר"
+    assert headword_key("בַּר 2") == "בר"
+    assert headword_key("עַם¹") == "עם"
+    assert headword_key("בֵּית דִּין") == "בית דין"
+
+
+def test_headword_itself_is_not_stripped():
+    index = {"בית": [LexRef(headword="בַּיִת", lexicon_name="Jastrow Dictionary")],
+             "ית": [LexRef(headword="יַת", lexicon_name="Jastrow Dictionary")]}
+    assert lookup_candidates("בית", 3, index) == [("בית", index["בית"])]
+
+
+def test_base_forms_when_word_is_not_a_headword():
+    index = {"אמר": [LexRef(headword="אָמַר I", lexicon_name="Jastrow Dictionary")]}
+    assert lookup_candidates("דְּאָמַר", 3, index) == [("אמר", index["אמר"])]
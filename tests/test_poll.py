@@ -0,0 +1,32 @@
+import pytest
+
+pytest.importorskip("bson")
+pytest.importorskip("pymongo")
+
+import config  # noqa: E402
+from resolver import poll_schedule  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def bounds(monkeypatch):
+    monkeypatch.setattr(config, "POLL_INTERVAL_SECONDS", 10)
+    monkeypatch.setattr(config, "POLL_MAX_INTERVAL_SECONDS", 60)
+
+
+def test_eta_from_completion_rate():
+    assert poll_schedule(10, rate=2.0, remaining=100, elapsed=0, expected=None) == (12.5, 50.0)
+
+
+def test_eta_falls_back_to_last_turnaround():
+    assert poll_schedule(10, rate=0.0, remaining=100, elapsed=60, expected=180) == (30.0, 120)
+
+
+def test_no_eta_backs_off():
+    assert poll_schedule(10, rate=0.0, remaining=100, elapsed=200, expected=180) == (15.0, None)
+    assert poll_schedule(20, rate=0.0, remaining=100, elapsed=0, expected=None) == (30.0, None)
+
+
+def test_interval_is_capped_and_floored():
+    assert poll_schedule(10, rate=0.01, remaining=100, elapsed=0, expected=None) == (60, 10000.0)
+    assert poll_schedule(50, rate=0.0, remaining=100, elapsed=0, expected=None) == (60, None)
+    assert poll_schedule(10, rate=100.0, remaining=100, elapsed=0, expected=None) == (10, 1.0)
@@ -0,0 +1,50 @@
+import pytest
+
+pytest.importorskip("numpy")
+
+import config  # noqa: E402
+from models import LexRef, LexiconAssociations  # noqa: E402
+from similarity import prefilter  # noqa: E402
+
+SEGMENT = "אמר רב יהודה אמר שמואל דינא דמלכותא דינא"
+TEXTS = {
+    "same": SEGMENT,
+    "close": "אמר רבא דינא דמלכותא דינא והלכתא כוותיה",
+    "far1": "תנו רבנן שלשה דברים צריך אדם לומר בתוך ביתו",
+    "far2": "מאימתי קורין את שמע בערבין משעה שהכהנים נכנסים",
+    "far3": "המפקיד פירות אצל חבירו אפילו הן אבודין לא יגע בהן",
+}
+
+
+def assoc(ref, headword="דִּין", source=None):
+    return LexiconAssociations(lexrefs=[LexRef(headword=headword, lexicon_name="Jastrow Dictionary")],
+                               refs=[ref], source=source)
+
+
+def test_keeps_top_k_in_cache_order():
+    cached = [assoc("far1"), assoc("close"), assoc("far2"), assoc("same"), assoc("far3")]
+    kept, info, auto = prefilter("דינא", SEGMENT, cached, TEXTS.get, top_k=2, auto_accept=0)
+    assert kept == [cached[1], cached[3]]
+    assert info["from"] == 5 and info["kept"] == 2
+    assert auto is None
+
+
+def test_nothing_ranked_under_top_k():
+    cached = [assoc("far1"), assoc("same")]
+    assert prefilter("דינא", SEGMENT, cached, TEXTS.get, top_k=4, auto_accept=0) == (cached, {}, None)
+
+
+def test_auto_accepts_clear_winner(monkeypatch):
+    monkeypatch.setattr(config, "VET_AUTO_MARGIN", 0.25)
+    cached = [assoc("far1"), assoc("same"), assoc("far2")]
+    kept, info, auto = prefilter("דינא", SEGMENT, cached, TEXTS.get, top_k=0, auto_accept=0.9)
+    assert auto is cached[1] and kept == cached
+    assert info["top_score"] == pytest.approx(1.0, abs=1e-3)
+
+
+def test_no_auto_accept_within_margin_or_for_imported_wordforms(monkeypatch):
+    monkeypatch.setattr(config, "VET_AUTO_MARGIN", 0.25)
+    tied = [assoc("same"), assoc("same", headword="דַּיָּן")]
+    assert prefilter("דינא", SEGMENT, tied, TEXTS.get, top_k=0, auto_accept=0.9)[2] is None
+    imported = [assoc("same", source="wordform:test"), assoc("far1")]
+    assert prefilter("דינא", SEGMENT, imported, TEXTS.get, top_k=0, auto_accept=0.9)[2] is None
@@ -0,0 +1,15 @@
+def test_held_tasks_take_no_submit_slots(mongo):
+    store = mongo
+    run_id = "test-held"
+    store.clear_run(run_id)
+    params = {"model": "m", "max_tokens": 10, "messages": [{"role": "user", "content": "x"}]}
+    # Held occurrences and uninitialized resolve tasks: pending, no params yet.
+    store.create_tasks(run_id, "resolve", [(f"Ref {i}", "text", None) for i in range(50)])
+    store.tasks.update_many({"run_id": run_id}, {"$set": {"held": True}})
+    store.create_task(run_id, "resolve", "Ref rep", "text", "word", params=params)
+    store.create_task(run_id, "vet", "Ref vet", "text", "word", params=params)
+
+    pending = store.pending_tasks(run_id, 10)
+    assert sorted(t["kind"] for t in pending) == ["resolve", "vet"]
+    assert all(t["params"] for t in pending)
+    store.clear_run(run_id)
@@ -1,13 +1,15 @@
 from __future__ import annotations
 import asyncio
 from typing import Tuple, List, Optional
-import aiohttp
 from util import prune_lexicon_entry
 from models import LexRef
-from config import SEFARIA_API_BASE
-import django
-django.setup()
-from sefaria.model import LexiconEntry
+from config import SEFARIA_API_BASE, MORPHOLOGY_MAX_BASES, COMPACT_ENTRIES
+import config
+import limiter
+import metrics
+import morphology
+import renderings
+import orm
 
 lexicon_map = {
     "Reference/Dictionary/Jastrow": 'Jastrow Dictionary',
@@ -23,21 +25,89 @@ lexicon_search_filters = list(lexicon_map.keys())
 
 RETRIES = 3
 
-
-async def _get_json(url: str) -> dict | list:
+# Shared by every Sefaria API call below; see limiter.py.
+sefaria_limiter = limiter.AdaptiveLimiter(
+    start=config.LOOKUP_CONCURRENCY_START, minimum=config.LOOKUP_CONCURRENCY_MIN,
+    maximum=config.LOOKUP_CONCURRENCY_MAX, rate=config.LOOKUP_RATE_LIMIT,
+    tolerance=config.LOOKUP_LATENCY_TOLERANCE)
+
+
+# Recent latencies per endpoint (for the hedge delay) and per agent tool (reported).
+endpoint_latency = {"words": limiter.LatencyWindow(), "search": limiter.LatencyWindow()}
+tool_latency = {}
+
+
+async def _attempt(method: str, url: str, **kwargs) -> dict | list:
+    import aiohttp   # on first lookup, not at import: status and friends never need it
+    async with sefaria_limiter.call():
+        timeout = aiohttp.ClientTimeout(total=config.HTTP_TIMEOUT_SECONDS)
+        async with aiohttp.ClientSession(timeout=timeout) as session:
+            async with session.request(method, url, **kwargs) as response:
+                response.raise_for_status()
+                return await response.json()
+
+
+async def _hedged(endpoint: str, method: str, url: str, **kwargs) -> dict | list:
+    """One attempt, plus a duplicate if the first is still running past the endpoint's p95
+    (both requests are reads). Not hedged while calls are queueing on the limiter: a hedge
+    then only adds load."""
+    window = endpoint_latency[endpoint]
+    started = asyncio.get_running_loop().time()
+    first = asyncio.ensure_future(_attempt(method, url, **kwargs))
+    tasks = [first]
+    try:
+        if config.HEDGE_LOOKUPS and len(window) >= config.HEDGE_MIN_SAMPLES:
+            delay = max(config.HEDGE_MIN_DELAY_SECONDS, window.percentile(0.95))
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done and not sefaria_limiter.stats()["queued"]:
+                metrics.count("sefaria_hedged")
+                tasks.append(asyncio.ensure_future(_attempt(method, url, **kwargs)))
+        pending, error = set(tasks), None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for t in done:
+                if t.exception() is None:
+                    if t is not first:
+                        metrics.count("sefaria_hedge_won")
+                    window.add(asyncio.get_running_loop().time() - started)
+                    return t.result()
+                error = t.exception()
+        raise error
+    finally:
+        for t in tasks:
+            if not t.done():
+                t.cancel()
+
+
+async def _request(endpoint: str, method: str, url: str, **kwargs) -> dict | list:
+    """JSON from a Sefaria API call, through the shared limiter, hedged. Retries back off
+    outside the limiter, for the server's Retry-After when it throttles, else 2 ** attempt."""
     last_exc = None
     for attempt in range(RETRIES):
+        if attempt:
+            metrics.count("sefaria_http_retries")
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url) as response:
-                    response.raise_for_status()
-                    return await response.json()
+            return await _hedged(endpoint, method, url, **kwargs)
         except Exception as e:
             last_exc = e
-            await asyncio.sleep(2 ** attempt)
+            wait = limiter.retry_after(e)
+            if wait is not None:
+                metrics.count("sefaria_http_throttled")
+            await asyncio.sleep(wait if wait is not None else 2 ** attempt)
     raise last_exc
 
 
+@metrics.instrument("sefaria_http")
+async def _get_json(url: str) -> dict | list:
+    return await _request("words", "GET", url)
+
+
+def render_entries(entries: List[dict]) -> List[dict]:
+    """Pruned entries as they go into prompts: compact renderings when COMPACT_ENTRIES is on."""
+    return renderings.compact_entries(entries) if COMPACT_ENTRIES else entries
+
+
+@metrics.instrument("tools_words_api")
 async def words_api(query: str, ref: str = None) -> Tuple[List[dict], List[dict]]:
     """
     Fetch dictionary entries for a given query.
@@ -57,17 +127,34 @@ async def words_api(query: str, ref: str = None) -> Tuple[List[dict], List[dict]
     if ref:
         possible_entries = [prune_lexicon_entry(d) for d in candidates if ref not in d.get("refs", [])]
         associated_entries = [prune_lexicon_entry(d) for d in candidates if ref in d.get("refs", [])]
-        return possible_entries, associated_entries
+        return render_entries(possible_entries), render_entries(associated_entries)
     else:
-        return [prune_lexicon_entry(d) for d in candidates], []
+        return render_entries([prune_lexicon_entry(d) for d in candidates]), []
 
 
+@metrics.instrument("tools_search_word_forms")
 async def search_word_forms(query: str) -> List[dict]:
-    """Given a word form as written, returns structured dictionary entries that match the word form"""
+    """Given a word form as written, returns structured dictionary entries that match the word form,
+    and the entries of its likely base forms (prefixes and suffixes stripped, spelling variants)"""
     possible, associated = await words_api(query)  # Since there is no ref passed, associated will be []
-    return possible
-
-
+    # Base forms only when the form as written matches nothing: a real match would otherwise
+    # be crowded by "bases" that are its root with letters stripped off (מלכא -> לכא, כא).
+    if not MORPHOLOGY_MAX_BASES or possible:
+        return possible
+    seen = {(d["headword"], d["parent_lexicon"]) for d in possible}
+    bases = []
+    for form, lexrefs in morphology.lookup_candidates(query, MORPHOLOGY_MAX_BASES):
+        for lexref in lexrefs:
+            if (lexref.headword, lexref.lexicon_name) in seen:
+                continue
+            entry = get_entry(lexref)
+            if entry:
+                bases.append(prune_lexicon_entry(entry.contents()))
+                seen.add((lexref.headword, lexref.lexicon_name))
+    return possible + render_entries(bases)
+
+
+@metrics.instrument("sefaria_search")
 async def _search(query, filters=None):
     """
     :param query:
@@ -97,20 +184,10 @@ async def _search(query, filters=None):
         "type": "text"
     }
     headers = {"Content-Type": "application/json"}
-
-    last_exc = None
-    for attempt in range(RETRIES):
-        try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(url, json=payload, headers=headers) as response:
-                    response.raise_for_status()
-                    return await response.json()
-        except Exception as e:
-            last_exc = e
-            await asyncio.sleep(2 ** attempt)
-    raise last_exc
+    return await _request("search", "POST", url, json=payload, headers=headers)
 
 
+@metrics.instrument("tools_search_dictionaries")
 async def search_dictionaries(query: str) -> List[dict]:
     """Given a text query, returns textual content of dictionary entries that match the query in any part of their entry"""
     response = await _search(query, filters=lexicon_search_filters)
@@ -127,11 +204,14 @@ async def search_dictionaries(query: str) -> List[dict]:
     ]
 
 
-def get_entry(lexref: LexRef) -> Optional[LexiconEntry]:
+@metrics.instrument("tools_get_entry")
+def get_entry(lexref: LexRef) -> Optional["LexiconEntry"]:
     """
     This uses the Sefaria code to directly connect to the DB.
     Ideally this would be an API, to match dependencies for the rest of this system, but no existing API fills this need.
     """
+    orm.setup()
+    from sefaria.model import LexiconEntry
     return LexiconEntry().load({"headword": lexref.headword, "parent_lexicon": lexref.lexicon_name})
 
 
@@ -139,7 +219,7 @@ def get_entry(lexref: LexRef) -> Optional[LexiconEntry]:
 
 SEARCH_WORD_FORMS_TOOL = {
     "name": "search_word_forms",
-    "description": "Given a word form as written, returns structured dictionary entries that match the word form",
+    "description": "Given a word form as written, returns structured dictionary entries that match the word form, including entries for its likely base forms (with prefixes or suffixes stripped)",
     "input_schema": {
         "type": "object",
         "properties": {
@@ -1,6 +1,8 @@
 from __future__ import annotations
+import hashlib
+import re
+import unicodedata
 from typing import Optional, List, Union, Dict, Any
-from bs4 import BeautifulSoup
 
 
 def strip_html(text: str, tags: Optional[List[str]] = None) -> str:
@@ -15,6 +17,7 @@ def strip_html(text: str, tags: Optional[List[str]] = None) -> str:
                  If None, all tags are stripped.
     :return: The processed text after the desired HTML tags have been stripped.
     """
+    from bs4 import BeautifulSoup   # only entry pruning needs it; keep light commands' startup fast
     soup = BeautifulSoup(text, "html.parser")
 
     if tags is None:
@@ -75,3 +78,12 @@ def split_hebrew_text(text: str) -> List[str]:
     # Eliminate duplicates.  Todo: Hint to the LLM to look at all meanings when it show more than once.
     cleaned_words = list(dict.fromkeys(cleaned_words))
     return cleaned_words
+
+
+def segment_hash(text: str) -> str:
+    """
+    Stable fingerprint of a segment's text: NFC-normalized with whitespace collapsed,
+    so the same passage quoted in another text (or re-seeded after a cleanup) matches.
+    """
+    normalized = re.sub(r"\s+", " ", unicodedata.normalize("NFC", text)).strip()
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()
@@ -0,0 +1,124 @@
+"""
+Warm-start Lexicon.assocs from the WordForms other generators have already written.
+
+On a new corpus the cache is empty, so every word gets a full determination even where a
+legacy word_form document already links the form to lexicon_map entries. import_wordforms()
+streams word_form (an aggregation sorted by form, so each form's documents arrive
+together) and adds each distinct set of lexicon_map entries as a cached association with
+``source="wordform:<generated_by>"``. They are vetting candidates only: the memo and the
+legacy_agrees_with_cache rule ignore them, they are offered after determined candidates,
+and one that vetting accepts is recorded as a new determined association.
+
+Idempotent: re-importing merges refs into the existing imported association and adds
+nothing already present as a determined association with the same entries.
+
+    python resolver.py warm-cache                          # import
+    python resolver.py warm-cache "Sanhedrin" --dry-run   # how many words would skip a determination
+"""
+from __future__ import annotations
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from pymongo import ReplaceOne
+
+from cache import cache_collection
+from db import LLM   # our own WordForms mirror the cache already: not imported
+from models import LexRef, LexiconAssociations, WordFormAssociations
+from util import split_hebrew_text
+
+
+def _wordform_groups(lexicon_names: List[str]) -> Iterator[Tuple[str, Dict[tuple, dict]]]:
+    """(form, {(source, frozenset(lexrefs)): {"lexrefs", "refs"}}) per form, streamed."""
+    from sefaria.system.database import db as sefaria_db
+    cursor = sefaria_db.word_form.aggregate([
+        {"$match": {"generated_by": {"$ne": LLM}, "lookups.parent_lexicon": {"$in": lexicon_names}}},
+        {"$project": {"_id": 0, "form": 1, "refs": 1, "lookups": 1, "generated_by": 1}},
+        {"$sort": {"form": 1}},
+    ], allowDiskUse=True, batchSize=1000)
+    form, groups = None, {}
+    for wf in cursor:
+        if wf["form"] != form:
+            if groups:
+                yield form, groups
+            form, groups = wf["form"], {}
+        lexrefs = list(dict.fromkeys(LexRef(headword=lk["headword"], lexicon_name=lk["parent_lexicon"])
+                                     for lk in wf.get("lookups", [])
+                                     if lk.get("parent_lexicon") in lexicon_names and lk.get("headword")))
+        if not lexrefs:
+            continue
+        source = f"wordform:{wf.get('generated_by') or 'unknown'}"
+        group = groups.setdefault((source, frozenset(lexrefs)), {"lexrefs": lexrefs, "refs": []})
+        group["refs"] += [r for r in wf.get("refs") or [] if r not in group["refs"]]
+    if groups:
+        yield form, groups
+
+
+def _merge(wfa: WordFormAssociations, groups: Dict[tuple, dict]) -> int:
+    """Add or extend the imported associations; returns how many changed."""
+    changed = 0
+    determined = {frozenset(a.lexrefs) for a in wfa.associations if a.source is None}
+    for (source, key), group in groups.items():
+        if key in determined:
+            continue
+        existing = next((a for a in wfa.associations if a.source == source and frozenset(a.lexrefs) == key), None)
+        if existing is None:
+            wfa.associations.append(LexiconAssociations(lexrefs=group["lexrefs"], refs=group["refs"], source=source))
+            changed += 1
+        else:
+            new_refs = [r for r in group["refs"] if r not in existing.refs]
+            if new_refs:
+                existing.refs += new_refs
+                changed += 1
+    return changed
+
+
+def import_wordforms(lexicon_names: List[str], dry_run: bool = False, batch: int = 500) -> Tuple[dict, set]:
+    """Import every legacy WordForm's lexicon_map links into the cache. Returns counts and
+    the forms that got (or, dry, would get) imported associations."""
+    stats = {"forms": 0, "forms_changed": 0, "associations_changed": 0, "forms_with_determinations": 0}
+    imported = set()
+    ops = []
+    pending: Dict[str, dict] = {}
+
+    def flush():
+        forms = list(pending)
+        existing = {d["word"]: d for d in cache_collection.find({"word": {"$in": forms}})}
+        for form in forms:
+            doc = existing.get(form)
+            wfa = WordFormAssociations(**doc) if doc else WordFormAssociations(word=form, associations=[])
+            if any(a.source is None for a in wfa.associations):
+                stats["forms_with_determinations"] += 1
+            n = _merge(wfa, pending[form])
+            if any(a.source is not None for a in wfa.associations):
+                imported.add(form)
+            if n:
+                stats["forms_changed"] += 1
+                stats["associations_changed"] += n
+                ops.append(ReplaceOne({"word": form}, wfa.model_dump(), upsert=True))
+        if ops and not dry_run:
+            cache_collection.bulk_write(ops, ordered=False)
+        ops.clear()
+        pending.clear()
+
+    for form, groups in _wordform_groups(lexicon_names):
+        stats["forms"] += 1
+        pending[form] = groups
+        if len(pending) >= batch:
+            flush()
+    flush()
+    return stats, imported
+
+
+def coverage(segments: List[str], imported: Optional[set] = None) -> dict:
+    """Of the distinct words in ``segments``: how many have a determined association (vet,
+    as before), how many only imported ones (vet instead of a full determination - the
+    determinations the warm start avoids), how many neither. ``imported``: forms a dry run
+    would have imported."""
+    words = {w for s in segments for w in split_hebrew_text(s)}
+    sources = {w: set() for w in words}
+    for doc in cache_collection.find({"word": {"$in": list(words)}}, {"word": 1, "associations.source": 1}):
+        sources[doc["word"]] |= {a.get("source") for a in doc.get("associations", [])}
+    determined = sum(1 for w in words if None in sources[w])
+    only_imported = sum(1 for w in words if None not in sources[w] and (sources[w] or w in (imported or ())))
+    return {"words": len(words), "with_determined_association": determined,
+            "determinations_avoided": only_imported,
+            "still_need_determination": len(words) - determined - only_imported}